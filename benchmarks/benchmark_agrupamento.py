@@ -0,0 +1,116 @@
+"""
+Compara o agrupamento por categorias em listas de dicionários, linha a linha (a implementação
+original de `transformar_em_formato`, copiada abaixo como referência), com o agrupamento direto no
+DataFrame (`agrupar_categorias`), em dados no formato da tabela de produção.
+
+Uso:
+    python -m benchmarks.benchmark_agrupamento
+    python -m benchmarks.benchmark_agrupamento --categorias 500 --produtos 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.services.funcionalidades_banco import gerar_registros
+from src.services.tratamento_dados_tabela import agrupar_categorias
+from src.services.tratamento_dados_tabela import dataframe_para_json
+from src.services.tratamento_dados_tabela import formato_longo
+from src.services.tratamento_dados_tabela import transformar_em_formato
+
+
+def transformar_em_formato_por_linha(json_dados, nome_coluna):
+    """Implementação original de `transformar_em_formato`, que percorre as linhas uma a uma.
+
+    Mantida aqui apenas como referência de desempenho.
+    """
+    result_json_formatado = []
+    categoria_atual = None
+    for item in json_dados:
+        if str(item[nome_coluna]).isupper() or str(item[nome_coluna]).upper() == 'SEM CLASSIFICACAO':
+            # Se o produto está em maiúsculo, é uma nova categoria
+            if categoria_atual:
+                # Se já havia uma categoria, adicionamos ela ao resultado
+                result_json_formatado.append(categoria_atual)
+
+            # Inicializa uma nova categoria
+            categoria_atual = item.copy()
+            categoria_atual[f'lista_{nome_coluna}'] = []
+        else:
+            # Adiciona o produto à lista de produtos da categoria atual
+            categoria_atual[f'lista_{nome_coluna}'].append(item)
+
+    if categoria_atual:
+        result_json_formatado.append(categoria_atual)
+
+    return result_json_formatado
+
+
+def gerar_producao(quantidade_categorias, produtos_por_categoria, quantidade_anos=54):
+    """Gera um DataFrame como o lido do arquivo de produção: categorias em maiúsculo seguidas de seus produtos.
+
+    Args:
+        quantidade_categorias (int): Quantidade de categorias.
+        produtos_por_categoria (int): Quantidade de produtos abaixo de cada categoria.
+        quantidade_anos (int, optional): Quantidade de colunas de anos. Defaults to 54.
+
+    Returns:
+        pd.DataFrame: O DataFrame sintético.
+    """
+    nomes = []
+    for c in range(quantidade_categorias):
+        nomes.append(f'CATEGORIA {c}')
+        nomes.extend(f'Produto {c}-{p}' for p in range(produtos_por_categoria))
+
+    gerador = np.random.default_rng(0)
+    df = pd.DataFrame({'id': np.arange(len(nomes)), 'produto': nomes})
+    anos = pd.DataFrame(
+        gerador.integers(0, 1_000_000, (len(nomes), quantidade_anos)),
+        columns=[str(1970 + i) for i in range(quantidade_anos)]
+    )
+    return pd.concat([df, anos], axis=1)
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--categorias', type=int, default=200, help='Quantidade de categorias.')
+    parser.add_argument('--produtos', type=int, default=25, help='Produtos por categoria.')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Repetições (é usado o menor tempo).')
+    args = parser.parse_args()
+
+    df = gerar_producao(args.categorias, args.produtos)
+
+    def listas_por_linha():
+        return transformar_em_formato_por_linha(dataframe_para_json(df), 'produto')
+
+    def listas():
+        return transformar_em_formato(dataframe_para_json(df), 'produto')
+
+    def listas_ate_registros():
+        return list(gerar_registros(listas_por_linha(), 'produto', 'producao'))
+
+    resultados = [
+        ('por linha (original)', medir(listas_por_linha, args.repeticoes)),
+        ('transformar_em_formato', medir(listas, args.repeticoes)),
+        ('agrupar_categorias', medir(lambda: agrupar_categorias(df, 'produto'), args.repeticoes)),
+        ('por linha + gerar_registros', medir(listas_ate_registros, args.repeticoes)),
+        ('formato_longo', medir(lambda: formato_longo(df, 'producao', 'produto'), args.repeticoes)),
+    ]
+
+    print(f'{len(df)} linhas, {df.shape[1] - 2} anos')
+    for descricao, duracao in resultados:
+        print(f'{descricao:<32}{duracao:>10.4f} s')
+
+
+if __name__ == '__main__':
+    main()
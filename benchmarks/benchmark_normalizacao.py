@@ -0,0 +1,80 @@
+"""
+Compara a normalização célula a célula (`df.map(corrigir_caracteres)`) com `normalizar_textos`.
+
+Uso:
+    python -m benchmarks.benchmark_normalizacao
+    python -m benchmarks.benchmark_normalizacao --linhas 100000 --repeticoes 3
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.dependencies.importacao_dados import corrigir_caracteres
+from src.dependencies.importacao_dados import normalizar_texto
+from src.dependencies.importacao_dados import normalizar_textos
+
+
+PAISES = ['África do Sul', 'Alemanha', 'Argentina', 'Bélgica', 'Canadá', 'Espanha', 'Estados Unidos',
+          'França', 'Itália', 'Japão', 'Paraguai', 'Portugal', 'Reino Unido', 'Suíça', 'Uruguai']
+CATEGORIAS = ['Vinho de Mesa', 'Espumantes', 'Uvas frescas', 'Uvas passas', 'Suco de uva']
+
+
+def gerar_dataframe(quantidade_linhas, quantidade_anos=54, semente=0):
+    """Gera um DataFrame no formato dos arquivos da EMBRAPA, com textos repetidos e colunas numéricas.
+
+    Args:
+        quantidade_linhas (int): Quantidade de linhas do DataFrame.
+        quantidade_anos (int, optional): Quantidade de colunas de anos. Defaults to 54.
+        semente (int, optional): Semente do gerador aleatório. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: O DataFrame sintético.
+    """
+    gerador = np.random.default_rng(semente)
+    nomes = [f'{pais} {i}' for pais in PAISES for i in range(20)]
+
+    df = pd.DataFrame({
+        'id': np.arange(quantidade_linhas),
+        'categoria': gerador.choice(CATEGORIAS, quantidade_linhas),
+        'pais': gerador.choice(nomes, quantidade_linhas),
+    })
+    anos = pd.DataFrame(
+        gerador.integers(0, 1_000_000, (quantidade_linhas, quantidade_anos)),
+        columns=[str(1970 + i) for i in range(quantidade_anos)]
+    )
+    return pd.concat([df, anos], axis=1)
+
+
+def medir(funcao, df, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        copia = df.copy()
+        normalizar_texto.cache_clear()
+        inicio = time.perf_counter()
+        funcao(copia)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=100_000, help='Quantidade de linhas do DataFrame.')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Repetições (é usado o menor tempo).')
+    args = parser.parse_args()
+
+    df = gerar_dataframe(args.linhas)
+    celulas = df.size
+
+    por_celula = medir(lambda copia: copia.map(corrigir_caracteres), df, args.repeticoes)
+    por_coluna = medir(normalizar_textos, df, args.repeticoes)
+
+    print(f'{args.linhas} linhas, {celulas} células')
+    print(f'{"df.map(corrigir_caracteres)":<32}{por_celula:>10.3f} s')
+    print(f'{"normalizar_textos":<32}{por_coluna:>10.3f} s')
+    print(f'{"ganho":<32}{por_celula / por_coluna:>10.1f} x')
+
+
+if __name__ == '__main__':
+    main()
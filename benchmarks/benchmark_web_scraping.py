@@ -0,0 +1,145 @@
+"""
+Compara a extração dos links CSV das 15 páginas da EMBRAPA montando a árvore completa do BeautifulSoup,
+apenas os links (`extrair_urls_csv`, com SoupStrainer) e reaproveitando o resultado de páginas
+inalteradas (`CacheUrlsCsv`).
+
+Uso:
+    python -m benchmarks.benchmark_web_scraping --capturar paginas_embrapa
+    python -m benchmarks.benchmark_web_scraping --paginas paginas_embrapa
+    python -m benchmarks.benchmark_web_scraping --linhas 600
+
+O --capturar salva as páginas atuais do site (uma vez, com acesso à rede). Sem --paginas são usadas
+páginas sintéticas com a mesma estrutura (menu, formulário de anos, tabela de dados e link de download).
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+from bs4 import BeautifulSoup
+
+from src.dependencies.cache_arquivos import CacheUrlsCsv
+from src.dependencies.web_scraping import URL_DOWNLOAD, extrair_urls_csv, montar_urls_paginas
+from src.routes.inicializacao_banco import CATEGORIAS, URL_BASE
+
+
+def nome_pagina(categoria, subcategoria):
+    return f'opt_{categoria}_subopt_{subcategoria or "00"}.html'
+
+
+def capturar(diretorio):
+    """Salva as páginas de todas as categorias e subcategorias do site da EMBRAPA.
+
+    Args:
+        diretorio (str): Diretório de destino.
+    """
+    diretorio = Path(diretorio)
+    diretorio.mkdir(parents=True, exist_ok=True)
+
+    for categoria, subcategoria, url in montar_urls_paginas(URL_BASE, CATEGORIAS):
+        resposta = requests.get(url)
+        resposta.raise_for_status()
+        (diretorio / nome_pagina(categoria, subcategoria)).write_bytes(resposta.content)
+
+
+def gerar_pagina(categoria, subcategoria, quantidade_linhas):
+    """Gera uma página com a estrutura das páginas da EMBRAPA.
+
+    Args:
+        categoria (str): Código da categoria.
+        subcategoria (str | None): Código da subcategoria.
+        quantidade_linhas (int): Linhas da tabela de dados.
+
+    Returns:
+        bytes: O HTML da página.
+    """
+    menu = ''.join(
+        f'<button type="submit" value="opt_{i:02d}" class="btn_opt">Opção {i}</button>' for i in range(1, 8)
+    )
+    subopcoes = ''.join(
+        f'<button type="submit" name="subopcao" value="subopt_{i:02d}" class="btn_sopt">Sub {i}</button>'
+        for i in range(1, 6)
+    )
+    anos = ''.join(f'<option value="{ano}">{ano}</option>' for ano in range(1970, 2024))
+    linhas = ''.join(
+        f'<tr><td class="tb_item">Produto {i}</td><td class="tb_item">{i * 1000:,}</td></tr>'
+        for i in range(quantidade_linhas)
+    )
+
+    return (
+        '<!DOCTYPE html><html><head><title>Banco de dados de uva, vinho e derivados</title>'
+        '<link rel="stylesheet" href="css/estilo.css"><script src="js/funcoes.js"></script></head><body>'
+        f'<table class="tb_menu"><tr><td><form>{menu}</form></td></tr></table>'
+        f'<form><p>{subopcoes}</p><label>Ano:</label><select name="ano">{anos}</select></form>'
+        '<table class="tb_base tb_dados"><thead><tr><th>Produto</th><th>Quantidade (L.)</th></tr></thead>'
+        f'<tbody>{linhas}</tbody><tfoot><tr><td>Total</td><td>0</td></tr></tfoot></table>'
+        f'<a href="download/Tabela_{categoria}_{subcategoria or "00"}.csv" class="footer_content">'
+        '<span>DOWNLOAD</span></a><a href="http://www.cnpuv.embrapa.br">Embrapa Uva e Vinho</a></body></html>'
+    ).encode()
+
+
+def extrair_arvore_completa(conteudo, url_download):
+    """Extração anterior ao SoupStrainer: monta a árvore da página inteira."""
+    soup = BeautifulSoup(conteudo, 'html.parser')
+    return [
+        href if href.startswith('http') else url_download + href
+        for href in (link['href'] for link in soup.find_all('a', href=True))
+        if href.endswith('.csv')
+    ]
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paginas', help='Diretório com as páginas salvas por --capturar.')
+    parser.add_argument('--capturar', help='Salva as páginas atuais do site neste diretório e encerra.')
+    parser.add_argument('--linhas', type=int, default=600, help='Linhas da tabela das páginas sintéticas.')
+    parser.add_argument('--repeticoes', type=int, default=5, help='Repetições (é usado o menor tempo).')
+    args = parser.parse_args()
+
+    if args.capturar:
+        capturar(args.capturar)
+        return
+
+    paginas = montar_urls_paginas(URL_BASE, CATEGORIAS)
+    if args.paginas:
+        conteudos = [(url, (Path(args.paginas) / nome_pagina(categoria, subcategoria)).read_bytes())
+                     for categoria, subcategoria, url in paginas]
+    else:
+        conteudos = [(url, gerar_pagina(categoria, subcategoria, args.linhas))
+                     for categoria, subcategoria, url in paginas]
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        cache = CacheUrlsCsv(Path(diretorio) / 'urls_csv.json')
+        for url, conteudo in conteudos:
+            cache.extrair(url, conteudo, lambda pagina: extrair_urls_csv(pagina, URL_DOWNLOAD))
+
+        resultados = [
+            ('árvore completa', medir(
+                lambda: [extrair_arvore_completa(conteudo, URL_DOWNLOAD) for _, conteudo in conteudos],
+                args.repeticoes)),
+            ('SoupStrainer (apenas links)', medir(
+                lambda: [extrair_urls_csv(conteudo, URL_DOWNLOAD) for _, conteudo in conteudos],
+                args.repeticoes)),
+            ('cache (páginas inalteradas)', medir(
+                lambda: [cache.extrair(url, conteudo, None) for url, conteudo in conteudos],
+                args.repeticoes)),
+        ]
+
+    tamanho = sum(len(conteudo) for _, conteudo in conteudos)
+    print(f'{len(conteudos)} páginas, {tamanho / 1024:.0f} KiB')
+    for descricao, duracao in resultados:
+        print(f'{descricao:<32}{duracao:>10.4f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ from src.dependencies.database import engine, SessionLocal
 from sqlalchemy.orm import Session
 
 from src.routes import comercializacao, importacao, producao, processamento, inicializacao_banco, users, exportacao
+from src.services.compressao import CompressaoMiddleware
 
 app = FastAPI(
     title='API-EMBRAPA',
@@ -14,6 +15,8 @@ app = FastAPI(
 )
 
 
+app.add_middleware(CompressaoMiddleware)
+
 models.Base.metadata.create_all(bind=engine)
 
 
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+# Validade do mapa de URLs dos arquivos CSV, em segundos
+VALIDADE_PADRAO_URLS = 24 * 60 * 60
+
+
+def escrever_atomico(caminho: Path, conteudo: bytes):
+    """Grava um arquivo por meio de um arquivo temporário no mesmo diretório, sem deixá-lo pela metade.
+
+    Args:
+        caminho (Path): O caminho do arquivo.
+        conteudo (bytes): O conteúdo a ser gravado.
+    """
+    descritor, caminho_temporario = tempfile.mkstemp(dir=caminho.parent, suffix='.tmp')
+
+    with os.fdopen(descritor, 'wb') as arquivo:
+        arquivo.write(conteudo)
+
+    os.replace(caminho_temporario, caminho)
+
+
+class CacheArquivos:
+    """
+    Cache local dos arquivos CSV baixados da EMBRAPA, endereçado pelo SHA-256 do conteúdo.
+
+    Para cada URL o índice guarda o ETag, o Last-Modified e o hash da última versão carregada
+    no banco, usados para montar requisições condicionais e decidir se a tabela precisa ser recarregada.
+
+    Attributes:
+        diretorio (Path): Diretório onde ficam o índice e os arquivos.
+        indice (dict): Metadados por URL ({'sha256', 'etag', 'last_modified'}).
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = Path(diretorio)
+        self.diretorio_arquivos = self.diretorio / 'arquivos'
+        self.caminho_indice = self.diretorio / 'indice.json'
+        self.trava = threading.Lock()
+
+        self.diretorio_arquivos.mkdir(parents=True, exist_ok=True)
+
+        if self.caminho_indice.exists():
+            self.indice = json.loads(self.caminho_indice.read_text(encoding='utf-8'))
+        else:
+            self.indice = {}
+
+    @staticmethod
+    def calcular_hash(conteudo: bytes) -> str:
+        """Calcula o SHA-256 do conteúdo de um arquivo.
+
+        Args:
+            conteudo (bytes): O conteúdo do arquivo.
+
+        Returns:
+            str: O hash em hexadecimal.
+        """
+        return hashlib.sha256(conteudo).hexdigest()
+
+    def caminho_arquivo(self, sha256: str) -> Path:
+        """Retorna o caminho onde o conteúdo com o hash informado é armazenado.
+
+        Args:
+            sha256 (str): O hash do conteúdo.
+
+        Returns:
+            Path: O caminho do arquivo no cache.
+        """
+        return self.diretorio_arquivos / f'{sha256}.csv'
+
+    def consultar(self, url: str):
+        """Retorna os metadados da última versão carregada de uma URL, se o arquivo ainda estiver no cache.
+
+        Args:
+            url (str): A URL do arquivo.
+
+        Returns:
+            dict | None: Os metadados ({'sha256', 'etag', 'last_modified'}) ou None.
+        """
+        entrada = self.indice.get(url)
+
+        if entrada is None or not self.caminho_arquivo(entrada['sha256']).exists():
+            return None
+
+        return entrada
+
+    def cabecalhos_condicionais(self, url: str) -> dict:
+        """Monta os cabeçalhos If-None-Match e If-Modified-Since de uma URL já carregada.
+
+        Args:
+            url (str): A URL do arquivo.
+
+        Returns:
+            dict: Os cabeçalhos da requisição condicional (vazio se a URL não estiver no cache).
+        """
+        entrada = self.consultar(url)
+        cabecalhos = {}
+
+        if entrada is not None:
+            if entrada.get('etag'):
+                cabecalhos['If-None-Match'] = entrada['etag']
+            if entrada.get('last_modified'):
+                cabecalhos['If-Modified-Since'] = entrada['last_modified']
+
+        return cabecalhos
+
+    def ler(self, sha256: str) -> bytes:
+        """Lê do cache o conteúdo com o hash informado.
+
+        Args:
+            sha256 (str): O hash do conteúdo.
+
+        Returns:
+            bytes: O conteúdo do arquivo.
+        """
+        return self.caminho_arquivo(sha256).read_bytes()
+
+    def salvar(self, conteudo: bytes) -> str:
+        """Armazena um conteúdo no cache, caso ainda não exista.
+
+        Args:
+            conteudo (bytes): O conteúdo do arquivo.
+
+        Returns:
+            str: O hash do conteúdo.
+        """
+        sha256 = self.calcular_hash(conteudo)
+        caminho = self.caminho_arquivo(sha256)
+
+        if not caminho.exists():
+            self._escrever_atomico(caminho, conteudo)
+
+        return sha256
+
+    def registrar(self, url: str, sha256: str, etag=None, last_modified=None):
+        """Grava no índice a versão de uma URL que acabou de ser carregada no banco.
+
+        Deve ser chamado apenas após a carga da tabela ter sido concluída, para que uma carga
+        com erro seja refeita na próxima execução.
+
+        Args:
+            url (str): A URL do arquivo.
+            sha256 (str): O hash do conteúdo carregado.
+            etag (str, optional): O ETag retornado pelo servidor. Defaults to None.
+            last_modified (str, optional): O Last-Modified retornado pelo servidor. Defaults to None.
+        """
+        with self.trava:
+            self.indice[url] = {'sha256': sha256, 'etag': etag, 'last_modified': last_modified}
+            conteudo = json.dumps(self.indice, indent=2, sort_keys=True).encode('utf-8')
+            self._escrever_atomico(self.caminho_indice, conteudo)
+
+    def _escrever_atomico(self, caminho: Path, conteudo: bytes):
+        escrever_atomico(caminho, conteudo)
+
+
+class CacheUrlsCsv:
+    """
+    Cache em disco das URLs de arquivos CSV encontradas em cada página do site da EMBRAPA.
+
+    Dentro da validade o mapa de URLs é reaproveitado sem buscar nenhuma página. Depois dela as
+    páginas são baixadas novamente, mas só são lidas (BeautifulSoup) aquelas cujo SHA-256 mudou.
+
+    Attributes:
+        caminho (Path): Arquivo JSON onde o cache é gravado.
+        validade (float): Tempo, em segundos, em que o mapa é reaproveitado sem buscar as páginas.
+        paginas (dict): URLs encontradas por página ({'sha256', 'urls'}).
+        atualizado_em (float | None): Momento (epoch) em que todas as páginas foram verificadas pela última vez.
+    """
+
+    def __init__(self, caminho, validade=VALIDADE_PADRAO_URLS):
+        self.caminho = Path(caminho)
+        self.validade = validade
+        self.trava = threading.Lock()
+
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+
+        if self.caminho.exists():
+            dados = json.loads(self.caminho.read_text(encoding='utf-8'))
+        else:
+            dados = {}
+
+        self.paginas = dados.get('paginas', {})
+        self.atualizado_em = dados.get('atualizado_em')
+
+    def consultar(self, urls_paginas):
+        """Retorna as URLs de arquivos CSV de cada página, se o cache ainda for válido para todas elas.
+
+        Args:
+            urls_paginas (list[str]): As URLs das páginas.
+
+        Returns:
+            list[list[str]] | None: As URLs encontradas em cada página, na mesma ordem, ou None se o
+                cache expirou ou não contém alguma das páginas.
+        """
+        with self.trava:
+            if self.atualizado_em is None or time.time() - self.atualizado_em >= self.validade:
+                return None
+
+            if any(url not in self.paginas for url in urls_paginas):
+                return None
+
+            return [list(self.paginas[url]['urls']) for url in urls_paginas]
+
+    def extrair(self, url, conteudo: bytes, extrair_urls):
+        """Retorna as URLs de arquivos CSV de uma página, lendo-a apenas se o conteúdo mudou.
+
+        Args:
+            url (str): A URL da página.
+            conteudo (bytes): O conteúdo HTML baixado.
+            extrair_urls (Callable[[bytes], list[str]]): Função que extrai as URLs do conteúdo.
+
+        Returns:
+            list[str]: As URLs de arquivos CSV da página.
+        """
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+
+        with self.trava:
+            entrada = self.paginas.get(url)
+            if entrada is not None and entrada['sha256'] == sha256:
+                return list(entrada['urls'])
+
+        urls = extrair_urls(conteudo)
+
+        # Uma página sem links (ex.: erro do site com status 200) é lida novamente na próxima vez
+        if urls:
+            with self.trava:
+                self.paginas[url] = {'sha256': sha256, 'urls': urls}
+
+        return list(urls)
+
+    def salvar(self):
+        """Marca todas as páginas como verificadas agora e grava o cache em disco."""
+        with self.trava:
+            self.atualizado_em = time.time()
+            conteudo = json.dumps(
+                {'atualizado_em': self.atualizado_em, 'paginas': self.paginas}, indent=2, sort_keys=True
+            ).encode('utf-8')
+            escrever_atomico(self.caminho, conteudo)
@@ -14,10 +14,13 @@ url_db = os.environ.get('URL_DB')
 port_db = os.environ.get('PORT_DB')
 schema_db = os.environ.get('SCHEMA_DB')
 
+# Permite que as cargas usem LOAD DATA LOCAL INFILE (o servidor também precisa de local_infile=1)
+LOCAL_INFILE_HABILITADO = os.environ.get('MYSQL_LOCAL_INFILE', '').lower() in ('1', 'true', 'sim')
+
 
 URL_DATABASE = f'mysql+pymysql://{user_db}:{password_db}@{url_db}:{port_db}/{schema_db}'
 
-engine = create_engine(URL_DATABASE)
+engine = create_engine(URL_DATABASE, connect_args={'local_infile': True} if LOCAL_INFILE_HABILITADO else {})
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
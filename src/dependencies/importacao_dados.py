@@ -1,10 +1,43 @@
 import io
 import logging
+from functools import lru_cache
 
 import pandas as pd
-import requests
 from unidecode import unidecode
 
+from src.dependencies.requisicao_embrapa import buscar
+from src.services.metricas_ingestao import medir_etapa
+
+
+# Sequências de UTF-8 lidas como cp1252 encontradas nos arquivos da EMBRAPA
+SUBSTITUICOES_MOJIBAKE = {"Ã¢": "â", "Ã§Ã£": "çã", "Ãª": "ê", "Ã£": "ã"}
+
+
+def corrigir_mojibake(texto: str) -> str:
+    """
+    Corrige acentos de um texto que foi codificado em UTF-8 duas vezes (ex: 'Ã§' no lugar de 'ç').
+
+    Args:
+        texto (str): O texto a ser corrigido.
+
+    Returns:
+        str: O texto com os acentos corrigidos.
+    """
+    if 'Ã' not in texto:
+        return texto
+
+    for codificacao in ('cp1252', 'latin-1'):
+        try:
+            return texto.encode(codificacao).decode('utf-8')
+        except UnicodeError:
+            pass
+
+    # Texto com trechos corretos e trechos corrompidos: corrige apenas as sequências conhecidas
+    for errado, correto in SUBSTITUICOES_MOJIBAKE.items():
+        texto = texto.replace(errado, correto)
+
+    return texto
+
 
 def corrigir_caracteres(valor):
     """
@@ -17,7 +50,7 @@ def corrigir_caracteres(valor):
         str: O valor com caracteres corrigidos.
     """
     if isinstance(valor, str):  # Verifica se o valor é uma 'string'
-        valor.replace("Ã¢", "â").replace("Ã§Ã£", "ç").replace("Ãª", "ê").replace("Ã£", "ã")
+        valor = corrigir_mojibake(valor)
         valor = unidecode(valor)
         return valor
 
@@ -25,10 +58,70 @@ def corrigir_caracteres(valor):
         return valor
 
 
+@lru_cache(maxsize=8192)
+def normalizar_texto(texto: str) -> str:
+    """
+    Remove acentos e caracteres especiais de um texto, memorizando o resultado.
+
+    Os nomes de produtos, países e categorias se repetem em todos os anos e arquivos,
+    então `unidecode` é executado uma única vez para cada valor distinto.
+
+    Args:
+        texto (str): O texto a ser normalizado.
+
+    Returns:
+        str: O texto normalizado.
+    """
+    return unidecode(texto)
+
+
+def decodificar_bytes(arquivo_bytes: bytes) -> str:
+    """
+    Decodifica o conteúdo de um arquivo CSV, corrigindo acentos corrompidos no arquivo inteiro de uma vez.
+
+    Args:
+        arquivo_bytes (bytes): O conteúdo do arquivo em bytes.
+
+    Returns:
+        str: O conteúdo do arquivo como texto.
+    """
+    return corrigir_mojibake(arquivo_bytes.decode('utf-8-sig'))
+
+
+def normalizar_textos(df: pd.DataFrame, corrigir_acentos: bool = False) -> pd.DataFrame:
+    """
+    Aplica `normalizar_texto` apenas nas colunas de texto, uma vez por valor distinto de cada coluna.
+
+    Args:
+        df (pd.DataFrame): O DataFrame a ser normalizado.
+        corrigir_acentos (bool, optional): Se True, aplica também `corrigir_mojibake` em cada valor,
+            para textos que não passaram por `decodificar_bytes`. Defaults to False.
+
+    Returns:
+        pd.DataFrame: O DataFrame com as colunas de texto normalizadas.
+    """
+    if corrigir_acentos:
+        def normalizar(texto):
+            return normalizar_texto(corrigir_mojibake(texto))
+    else:
+        normalizar = normalizar_texto
+
+    for coluna in df.select_dtypes(include='object').columns:
+        valores = df[coluna]
+        distintos = pd.unique(valores)
+        df[coluna] = valores.map({
+            valor: normalizar(valor) if isinstance(valor, str) else valor for valor in distintos
+        })
+
+    return df
+
+
 def download_tabela(url: str) -> bytes:
     """
     Faz o download de um arquivo de uma URL e retorna seu conteúdo em bytes.
 
+    A requisição tem timeouts, novas tentativas e respeita o prazo da carga (ver `buscar`).
+
     Args:
         url (str): A URL do arquivo a ser baixado.
 
@@ -37,9 +130,12 @@ def download_tabela(url: str) -> bytes:
 
     Raises:
         ConnectionError: Se houver um erro durante o download (status_code diferente de 200).
+        PrazoCargaExcedido: Se o prazo da carga terminar durante o download.
     """
 
-    resposta = requests.get(url)
+    with medir_etapa('download_tabela') as contagens:
+        resposta = buscar(url)
+        contagens['bytes'] = len(resposta.content)
 
     if resposta.status_code == 200:
         arquivo_baixado = resposta.content
@@ -52,6 +148,81 @@ def download_tabela(url: str) -> bytes:
     return arquivo_baixado
 
 
+def download_condicional(url: str, cache) -> dict:
+    """
+    Faz o download de um arquivo usando uma requisição condicional com os dados do cache local.
+
+    Se o servidor responder 304 (Not Modified), o conteúdo é lido do cache. Se responder 200, o
+    conteúdo é salvo no cache e comparado, pelo SHA-256, com a última versão carregada.
+
+    Args:
+        url (str): A URL do arquivo a ser baixado.
+        cache (CacheArquivos): O cache local dos arquivos.
+
+    Returns:
+        dict: {'url', 'conteudo', 'alterado', 'sha256', 'etag', 'last_modified'}, onde 'alterado'
+            indica se o conteúdo é diferente da última versão carregada.
+
+    Raises:
+        ConnectionError: Se houver um erro durante o download (status_code diferente de 200 e 304).
+        PrazoCargaExcedido: Se o prazo da carga terminar durante o download.
+    """
+
+    entrada = cache.consultar(url)
+
+    with medir_etapa('download_tabela') as contagens:
+        resposta = buscar(url, headers=cache.cabecalhos_condicionais(url))
+        contagens['bytes'] = len(resposta.content)
+
+    if resposta.status_code == 304 and entrada is not None:
+        return {
+            'url': url,
+            'conteudo': cache.ler(entrada['sha256']),
+            'alterado': False,
+            'sha256': entrada['sha256'],
+            'etag': entrada.get('etag'),
+            'last_modified': entrada.get('last_modified'),
+        }
+
+    if resposta.status_code != 200:
+        logging.info('Falha download')
+
+        raise ConnectionError(f'Erro download {resposta.status_code}')
+
+    sha256 = cache.salvar(resposta.content)
+
+    return {
+        'url': url,
+        'conteudo': resposta.content,
+        'alterado': entrada is None or entrada['sha256'] != sha256,
+        'sha256': sha256,
+        'etag': resposta.headers.get('ETag'),
+        'last_modified': resposta.headers.get('Last-Modified'),
+    }
+
+
+def leitura_arquivo(caminho) -> bytes:
+    """
+    Lê o conteúdo de um arquivo CSV da EMBRAPA salvo localmente, no lugar do download.
+
+    Args:
+        caminho (str | Path): O caminho do arquivo.
+
+    Returns:
+        bytes: O conteúdo do arquivo em bytes.
+
+    Raises:
+        FileNotFoundError: Se o arquivo não existir.
+    """
+
+    with medir_etapa('leitura_arquivo') as contagens:
+        with open(caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        contagens['bytes'] = len(conteudo)
+
+    return conteudo
+
+
 def limpar_titulos(titulo):
     """Limpa um título de coluna removendo acentos e caracteres especiais.
 
@@ -61,7 +232,7 @@ def limpar_titulos(titulo):
     Returns:
         str: O título limpo.
     """
-    return unidecode(titulo)
+    return normalizar_texto(titulo)
 
 
 def leitura_bytes(arquivo_bytes: bytes, separador: str, nome_tabela, skiprows=None) -> pd.DataFrame:
@@ -78,16 +249,84 @@ def leitura_bytes(arquivo_bytes: bytes, separador: str, nome_tabela, skiprows=No
         pd.DataFrame: O DataFrame com os dados do arquivo.
     """
 
-    buffer_bytes = io.BytesIO(arquivo_bytes)
+    with medir_etapa('leitura_bytes', bytes=len(arquivo_bytes)) as contagens:
+        buffer_texto = io.StringIO(decodificar_bytes(arquivo_bytes))
 
-    # Use pd.read_csv com o buffer de bytes
-    df = pd.read_csv(buffer_bytes, sep=separador, skiprows=skiprows)
+        # Use pd.read_csv com o texto já decodificado e corrigido
+        df = pd.read_csv(buffer_texto, sep=separador, skiprows=skiprows)
 
-    if nome_tabela == 'exportacao' or nome_tabela == 'importacao':
-        df.columns = [limpar_titulos(str(titulo).lower()) for titulo in df.columns]
+        if nome_tabela == 'exportacao' or nome_tabela == 'importacao':
+            df.columns = [limpar_titulos(str(titulo).lower()) for titulo in df.columns]
 
-    df = df.fillna(0)
+        df = df.fillna(0)
 
-    dataframe_corrigido = df.map(corrigir_caracteres)
+        dataframe_corrigido = normalizar_textos(df)
+        contagens['linhas_saida'] = len(dataframe_corrigido)
 
     return dataframe_corrigido
+
+
+# Memória ocupada durante a transformação e a inserção, por byte do arquivo CSV lido (medido com tracemalloc)
+FATOR_MEMORIA_POR_BYTE = 50
+
+
+def calcular_linhas_por_bloco(arquivo_bytes: bytes, orcamento_memoria: int) -> int:
+    """
+    Estima quantas linhas do arquivo podem ser processadas de cada vez sem ultrapassar o orçamento de memória.
+
+    Args:
+        arquivo_bytes (bytes): O conteúdo do arquivo em bytes.
+        orcamento_memoria (int): Memória máxima, em bytes, a ser usada no processamento de cada bloco.
+
+    Returns:
+        int: Quantidade de linhas por bloco (no mínimo 1).
+    """
+    quantidade_linhas = arquivo_bytes.count(b'\n') + 1
+    bytes_por_linha = len(arquivo_bytes) / quantidade_linhas
+
+    return max(1, int(orcamento_memoria // (bytes_por_linha * FATOR_MEMORIA_POR_BYTE)))
+
+
+def leitura_bytes_em_blocos(arquivo_bytes: bytes, separador: str, nome_tabela, linhas_por_bloco: int,
+                            skiprows=None):
+    """
+    Lê um arquivo em bytes em blocos de linhas, com o mesmo tratamento de `leitura_bytes`.
+
+    O arquivo é decodificado à medida que é lido, sem criar uma cópia do texto inteiro; por isso
+    os acentos corrompidos são corrigidos valor a valor (ver `normalizar_textos`).
+
+    Args:
+        arquivo_bytes (bytes): O conteúdo do arquivo em bytes.
+        separador (str): O caractere separador de colunas (ex: ',').
+        nome_tabela (str): O nome da tabela (usado para formatação de colunas).
+        linhas_por_bloco (int): Quantidade de linhas de cada bloco.
+        skiprows (int, optional): Número de linhas a serem puladas no início do arquivo. Defaults to None.
+
+    Yields:
+        pd.DataFrame: Um DataFrame para cada bloco de linhas do arquivo.
+    """
+
+    buffer_texto = io.TextIOWrapper(io.BytesIO(arquivo_bytes), encoding='utf-8-sig')
+
+    with pd.read_csv(buffer_texto, sep=separador, skiprows=skiprows, chunksize=linhas_por_bloco) as leitor:
+        bytes_lidos = len(arquivo_bytes)
+
+        while True:
+            # A leitura de cada bloco é medida separadamente, sem incluir o tempo de quem consome os blocos
+            with medir_etapa('leitura_bytes', bytes=bytes_lidos) as contagens:
+                df = next(leitor, None)
+
+                if df is not None:
+                    df.columns = [corrigir_mojibake(str(titulo)) for titulo in df.columns]
+
+                    if nome_tabela == 'exportacao' or nome_tabela == 'importacao':
+                        df.columns = [limpar_titulos(titulo.lower()) for titulo in df.columns]
+
+                    df = normalizar_textos(df.fillna(0), corrigir_acentos=True)
+                    contagens['linhas_saida'] = len(df)
+
+            if df is None:
+                return
+
+            bytes_lidos = 0
+            yield df
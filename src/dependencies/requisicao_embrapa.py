@@ -0,0 +1,469 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturoTimeoutError
+from contextlib import contextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from src.services.metricas_ingestao import medicao_atual, submeter_no_contexto
+
+
+TIMEOUT_CONEXAO = 5  # segundos para abrir a conexão
+TIMEOUT_LEITURA = 30  # segundos sem receber nenhum byte da resposta
+TENTATIVAS = 3
+ESPERA_INICIAL = 0.5  # segundos antes da segunda tentativa, dobrando a cada nova tentativa
+ESPERA_MAXIMA = 8
+TAMANHO_BLOCO = 64 * 1024
+
+# Respostas do servidor que indicam uma falha temporária
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+# Com HEDGE_DOWNLOADS=true, uma segunda requisição é feita quando a primeira passa do p95 das latências
+HEDGE_HABILITADO = os.environ.get('HEDGE_DOWNLOADS', '').lower() in ('1', 'true', 'sim')
+MINIMO_AMOSTRAS_HEDGE = 10
+EXECUTOR_HEDGE = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hedge')
+
+# Conexões mantidas abertas por host: downloads simultâneos do pipeline mais as requisições de hedge
+TAMANHO_POOL = 16
+
+_prazo_atual = contextvars.ContextVar('prazo_atual', default=None)
+_sessao_atual = contextvars.ContextVar('sessao_atual', default=None)
+
+
+class PrazoCargaExcedido(TimeoutError):
+    """O prazo da carga (ver `definir_prazo`) terminou antes de a requisição ser concluída."""
+
+
+class HistoricoLatencias:
+    """
+    Guarda as latências das últimas requisições bem-sucedidas, usadas para decidir quando fazer o hedge.
+
+    Attributes:
+        latencias (deque): As últimas latências, em segundos.
+    """
+
+    def __init__(self, tamanho=200):
+        self.latencias = deque(maxlen=tamanho)
+        self.trava = threading.Lock()
+
+    def registrar(self, latencia):
+        """Acrescenta a latência de uma requisição bem-sucedida.
+
+        Args:
+            latencia (float): A duração da requisição, em segundos.
+        """
+        with self.trava:
+            self.latencias.append(latencia)
+
+    def p95(self):
+        """Calcula o percentil 95 das latências registradas.
+
+        Returns:
+            float | None: O percentil 95, em segundos, ou None com menos de MINIMO_AMOSTRAS_HEDGE amostras.
+        """
+        with self.trava:
+            if len(self.latencias) < MINIMO_AMOSTRAS_HEDGE:
+                return None
+            ordenadas = sorted(self.latencias)
+
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+
+
+HISTORICO_LATENCIAS = HistoricoLatencias()
+
+
+class RespostaLida:
+    """
+    Resposta de `requisitar`, com o corpo já lido em blocos.
+
+    Os demais atributos (`status_code`, `headers`, `raise_for_status`, ...) são os da resposta do requests.
+
+    Attributes:
+        resposta (requests.Response): A resposta do requests, com a conexão já devolvida ao pool.
+        content (bytes): O corpo da resposta.
+    """
+
+    def __init__(self, resposta, content):
+        self.resposta = resposta
+        self.content = content
+
+    def __getattr__(self, nome):
+        return getattr(self.resposta, nome)
+
+
+class SessaoEmbrapa:
+    """
+    Sessão HTTP compartilhada por todas as requisições de uma carga ao site da EMBRAPA.
+
+    Mantém um pool de conexões keep-alive, pede as respostas comprimidas (o Accept-Encoding
+    padrão do requests, que inclui br e zstd quando os pacotes estão instalados) e contabiliza
+    as requisições, as conexões abertas e os bytes transferidos. Pode ser usada ao mesmo tempo por
+    várias threads.
+
+    Attributes:
+        sessao (requests.Session): A sessão do requests.
+        requisicoes (int): Requisições concluídas.
+        bytes_transferidos (int): Bytes recebidos pela rede (comprimidos, quando for o caso).
+        tempo_requisicoes (float): Soma da duração das requisições, em segundos.
+    """
+
+    def __init__(self, tamanho_pool=TAMANHO_POOL):
+        self.adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=tamanho_pool)
+        self.sessao = requests.Session()
+        self.sessao.mount('http://', self.adaptador)
+        self.sessao.mount('https://', self.adaptador)
+
+        self.requisicoes = 0
+        self.bytes_transferidos = 0
+        self.tempo_requisicoes = 0.0
+        self.conexoes_async = set()
+        self.conexoes_encerradas = None
+        self.trava = threading.Lock()
+
+    def registrar(self, bytes_transferidos, duracao, conexao_async=None):
+        """Contabiliza uma requisição concluída.
+
+        Args:
+            bytes_transferidos (int): Bytes recebidos pela rede.
+            duracao (float): Duração da requisição, em segundos.
+            conexao_async (object, optional): Conexão usada pelo cliente httpx. Defaults to None.
+        """
+        with self.trava:
+            self.requisicoes += 1
+            self.bytes_transferidos += bytes_transferidos
+            self.tempo_requisicoes += duracao
+            if conexao_async is not None:
+                self.conexoes_async.add(conexao_async)
+
+    def conexoes(self):
+        """Conta as conexões TCP abertas durante a carga.
+
+        Returns:
+            int: As conexões do pool do requests somadas às dos clientes httpx.
+        """
+        if self.conexoes_encerradas is not None:
+            return self.conexoes_encerradas
+
+        pools = self.adaptador.poolmanager.pools
+        with self.trava:
+            return sum(pools[chave].num_connections for chave in pools.keys()) + len(self.conexoes_async)
+
+    def fechar(self):
+        """Fecha as conexões do pool, mantendo a contagem de conexões abertas."""
+        self.conexoes_encerradas = self.conexoes()
+        self.sessao.close()
+
+
+@contextmanager
+def usar_sessao():
+    """Direciona para uma mesma `SessaoEmbrapa` as requisições feitas dentro do bloco e nas tarefas criadas a partir dele.
+
+    Ao final, se houver uma medição ativa (ver `MedicaoIngestao`), registra a etapa 'requisicoes_http'
+    com as requisições, as conexões abertas, os bytes transferidos e o tempo somado das requisições.
+
+    Yields:
+        SessaoEmbrapa: A sessão.
+    """
+    sessao = SessaoEmbrapa()
+    token = _sessao_atual.set(sessao)
+
+    try:
+        yield sessao
+    finally:
+        _sessao_atual.reset(token)
+        sessao.fechar()
+
+        medicao = medicao_atual()
+        if medicao is not None and sessao.requisicoes:
+            medicao.registrar(
+                'requisicoes_http', None,
+                tempo_total=sessao.tempo_requisicoes,
+                tempo_cpu=0.0,
+                bytes=sessao.bytes_transferidos,
+                chamadas=sessao.requisicoes,
+                conexoes=sessao.conexoes(),
+            )
+
+
+def sessao_atual():
+    """Retorna a sessão da carga em andamento (ver `usar_sessao`).
+
+    Returns:
+        SessaoEmbrapa | None: A sessão, ou None fora de uma carga.
+    """
+    return _sessao_atual.get()
+
+
+@contextmanager
+def definir_prazo(segundos):
+    """Limita o tempo total das requisições feitas dentro do bloco (e nas tarefas criadas a partir dele).
+
+    Ao fim do prazo as requisições em andamento e as seguintes levantam `PrazoCargaExcedido`.
+
+    Args:
+        segundos (float | None): O prazo, em segundos. Com None não há prazo.
+    """
+    if segundos is None:
+        yield
+        return
+
+    token = _prazo_atual.set(time.monotonic() + segundos)
+    try:
+        yield
+    finally:
+        _prazo_atual.reset(token)
+
+
+def tempo_restante():
+    """Retorna o tempo que falta para o fim do prazo da carga.
+
+    Returns:
+        float | None: Os segundos restantes, ou None se não houver prazo.
+    """
+    prazo = _prazo_atual.get()
+    return None if prazo is None else prazo - time.monotonic()
+
+
+def verificar_prazo():
+    """Levanta `PrazoCargaExcedido` se o prazo da carga já terminou."""
+    restante = tempo_restante()
+    if restante is not None and restante <= 0:
+        raise PrazoCargaExcedido('Prazo da carga excedido')
+
+
+def calcular_espera(tentativa, espera_inicial=ESPERA_INICIAL):
+    """Calcula a espera antes de uma nova tentativa (backoff exponencial com jitter).
+
+    Args:
+        tentativa (int): Número da tentativa que falhou, começando em 0.
+        espera_inicial (float, optional): Espera base, em segundos. Defaults to ESPERA_INICIAL.
+
+    Returns:
+        float: A espera, em segundos, entre zero e o limite da tentativa.
+    """
+    return random.uniform(0, min(ESPERA_MAXIMA, espera_inicial * 2 ** tentativa))
+
+
+def esperar(segundos):
+    """Aguarda antes de uma nova tentativa, sem ultrapassar o prazo da carga.
+
+    Args:
+        segundos (float): A espera, em segundos.
+
+    Raises:
+        PrazoCargaExcedido: Se o prazo terminar antes do fim da espera.
+    """
+    restante = tempo_restante()
+    if restante is not None and restante <= segundos:
+        raise PrazoCargaExcedido('Prazo da carga excedido')
+    time.sleep(segundos)
+
+
+def limitar_timeout(timeout):
+    """Reduz um timeout ao tempo que falta para o fim do prazo da carga.
+
+    Args:
+        timeout (float): O timeout desejado, em segundos.
+
+    Returns:
+        float: O menor valor entre o timeout e o tempo restante.
+    """
+    verificar_prazo()
+    restante = tempo_restante()
+    return timeout if restante is None else min(timeout, restante)
+
+
+def requisitar(url, headers=None, timeout_conexao=TIMEOUT_CONEXAO, timeout_leitura=TIMEOUT_LEITURA):
+    """Faz uma única requisição GET, lendo a resposta em blocos para respeitar o prazo da carga.
+
+    Args:
+        url (str): A URL.
+        headers (dict, optional): Cabeçalhos da requisição. Defaults to None.
+        timeout_conexao (float, optional): Timeout para abrir a conexão. Defaults to TIMEOUT_CONEXAO.
+        timeout_leitura (float, optional): Timeout entre dois blocos recebidos. Defaults to TIMEOUT_LEITURA.
+
+    Dentro de uma carga (ver `usar_sessao`) usa a sessão compartilhada.
+
+    Returns:
+        RespostaLida: A resposta, com o conteúdo já lido.
+
+    Raises:
+        PrazoCargaExcedido: Se o prazo da carga terminar durante a requisição.
+        requests.exceptions.RequestException: Em erros de conexão ou timeout.
+    """
+    sessao = sessao_atual()
+    cliente = sessao.sessao if sessao is not None else requests
+
+    inicio = time.perf_counter()
+    resposta = cliente.get(
+        url, headers=headers, stream=True,
+        timeout=(limitar_timeout(timeout_conexao), limitar_timeout(timeout_leitura))
+    )
+
+    # O read1 (urllib3 2) devolve os bytes à medida que chegam, permitindo verificar o prazo mesmo
+    # em respostas enviadas aos poucos; o iter_content espera completar cada bloco
+    ler_disponivel = getattr(resposta.raw, 'read1', None)
+    if ler_disponivel is None:
+        leitura = resposta.iter_content(TAMANHO_BLOCO)
+    else:
+        leitura = iter(lambda: ler_disponivel(TAMANHO_BLOCO, decode_content=True), b'')
+
+    try:
+        blocos = []
+        for bloco in leitura:
+            blocos.append(bloco)
+            verificar_prazo()
+    # Mesma conversão feita pelo iter_content do requests
+    except ReadTimeoutError as e:
+        raise requests.exceptions.ConnectionError(e)
+    except ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e)
+    finally:
+        resposta.close()
+
+    duracao = time.perf_counter() - inicio
+    if resposta.status_code < 500:
+        HISTORICO_LATENCIAS.registrar(duracao)
+    if sessao is not None:
+        sessao.registrar(resposta.raw.tell(), duracao)
+
+    return RespostaLida(resposta, b''.join(blocos))
+
+
+def requisitar_com_hedge(url, headers=None, historico=HISTORICO_LATENCIAS, **timeouts):
+    """Faz a requisição e, se ela passar do p95 das latências, dispara uma segunda e usa a que terminar antes.
+
+    Sem amostras suficientes no histórico, faz apenas uma requisição.
+
+    Args:
+        url (str): A URL.
+        headers (dict, optional): Cabeçalhos da requisição. Defaults to None.
+        historico (HistoricoLatencias, optional): Latências usadas no cálculo do p95. Defaults to HISTORICO_LATENCIAS.
+        **timeouts: `timeout_conexao` e `timeout_leitura` de `requisitar`.
+
+    Returns:
+        RespostaLida: A primeira resposta obtida.
+    """
+    atraso = historico.p95()
+    if atraso is None:
+        return requisitar(url, headers, **timeouts)
+
+    primeira = submeter_no_contexto(EXECUTOR_HEDGE, requisitar, url, headers, **timeouts)
+    try:
+        return primeira.result(timeout=atraso)
+    except FuturoTimeoutError:
+        pass
+
+    pendentes = {primeira, submeter_no_contexto(EXECUTOR_HEDGE, requisitar, url, headers, **timeouts)}
+    erro = None
+
+    # A requisição mais lenta não é interrompida, mas termina pelos próprios timeouts
+    while pendentes:
+        concluidas, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+        for futuro in concluidas:
+            if futuro.exception() is None:
+                return futuro.result()
+            erro = futuro.exception()
+
+    raise erro
+
+
+def buscar(url, headers=None, tentativas=TENTATIVAS, espera_inicial=ESPERA_INICIAL, hedge=None,
+           timeout_conexao=TIMEOUT_CONEXAO, timeout_leitura=TIMEOUT_LEITURA):
+    """Faz uma requisição GET ao site da EMBRAPA com timeouts, novas tentativas e, opcionalmente, hedge.
+
+    Erros de conexão, timeouts, respostas interrompidas e respostas 429/5xx são repetidos com backoff exponencial; as demais
+    respostas (incluindo 304 e 404) são retornadas de imediato. Todas as etapas respeitam o prazo
+    definido por `definir_prazo`.
+
+    Args:
+        url (str): A URL.
+        headers (dict, optional): Cabeçalhos da requisição. Defaults to None.
+        tentativas (int, optional): Número máximo de tentativas. Defaults to TENTATIVAS.
+        espera_inicial (float, optional): Espera base entre tentativas, em segundos. Defaults to ESPERA_INICIAL.
+        hedge (bool, optional): Se True, usa `requisitar_com_hedge`. Defaults to None (HEDGE_DOWNLOADS).
+        timeout_conexao (float, optional): Timeout para abrir a conexão. Defaults to TIMEOUT_CONEXAO.
+        timeout_leitura (float, optional): Timeout entre dois blocos recebidos. Defaults to TIMEOUT_LEITURA.
+
+    Returns:
+        RespostaLida: A resposta, com o conteúdo já lido (a última, se todas as tentativas falharam com 429/5xx).
+
+    Raises:
+        PrazoCargaExcedido: Se o prazo da carga terminar.
+        requests.exceptions.RequestException: Se a última tentativa falhar com erro de conexão ou timeout.
+    """
+    hedge = HEDGE_HABILITADO if hedge is None else hedge
+    requisicao = requisitar_com_hedge if hedge else requisitar
+
+    for tentativa in range(tentativas):
+        ultima = tentativa == tentativas - 1
+
+        try:
+            resposta = requisicao(url, headers, timeout_conexao=timeout_conexao, timeout_leitura=timeout_leitura)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError):
+            # Um timeout reduzido pelo prazo da carga é reportado como fim do prazo
+            verificar_prazo()
+            if ultima:
+                raise
+        else:
+            if resposta.status_code not in STATUS_REPETIVEIS or ultima:
+                return resposta
+
+        esperar(calcular_espera(tentativa, espera_inicial))
+
+
+async def buscar_async(cliente, url, tentativas=TENTATIVAS, espera_inicial=ESPERA_INICIAL):
+    """Versão assíncrona de `buscar` (sem hedge), com os timeouts configurados no cliente.
+
+    Args:
+        cliente (httpx.AsyncClient): Cliente HTTP compartilhado entre as requisições.
+        url (str): A URL.
+        tentativas (int, optional): Número máximo de tentativas. Defaults to TENTATIVAS.
+        espera_inicial (float, optional): Espera base entre tentativas, em segundos. Defaults to ESPERA_INICIAL.
+
+    Returns:
+        httpx.Response: A resposta (a última, se todas as tentativas falharam com 429/5xx).
+
+    Raises:
+        PrazoCargaExcedido: Se o prazo da carga terminar.
+        httpx.TransportError: Se a última tentativa falhar com erro de conexão ou timeout.
+    """
+    for tentativa in range(tentativas):
+        ultima = tentativa == tentativas - 1
+
+        try:
+            restante = tempo_restante()
+            verificar_prazo()
+            inicio = time.perf_counter()
+            resposta = await asyncio.wait_for(cliente.get(url), timeout=restante)
+        except asyncio.TimeoutError:
+            raise PrazoCargaExcedido('Prazo da carga excedido')
+        except httpx.TransportError:
+            if ultima:
+                raise
+        else:
+            sessao = sessao_atual()
+            if sessao is not None:
+                sessao.registrar(
+                    resposta.num_bytes_downloaded, time.perf_counter() - inicio,
+                    conexao_async=resposta.extensions.get('network_stream')
+                )
+
+            if resposta.status_code not in STATUS_REPETIVEIS or ultima:
+                return resposta
+
+        espera = calcular_espera(tentativa, espera_inicial)
+        restante = tempo_restante()
+        if restante is not None and restante <= espera:
+            raise PrazoCargaExcedido('Prazo da carga excedido')
+        await asyncio.sleep(espera)
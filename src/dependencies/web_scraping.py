@@ -1,72 +1,290 @@
+import asyncio
+
+import httpx
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+from src.dependencies.requisicao_embrapa import TIMEOUT_CONEXAO, TIMEOUT_LEITURA
+from src.dependencies.requisicao_embrapa import buscar, buscar_async
+from src.services.metricas_ingestao import medir_etapa
+
+
+URL_DOWNLOAD = 'http://vitibrasil.cnpuv.embrapa.br/'
+MAXIMO_CONEXOES_SIMULTANEAS = 8
+
+# Apenas os links são montados na árvore do BeautifulSoup; o restante da página é descartado durante a leitura
+APENAS_LINKS = SoupStrainer('a', href=True)
 
 
-def encontrar_urls_csv(url_base, categorias):
+def encontrar_urls_csv(url_base, categorias, cache=None):
     """
     Encontra URLs de arquivos CSV em diferentes categorias e subcategorias de um site.
 
     Args:
         url_base: A URL base do site.
         categorias: Um dicionário onde as chaves são os nomes das categorias e os valores são listas de subcategorias (ou None para nenhuma subcategoria).
+        cache (CacheUrlsCsv, optional): Cache das URLs encontradas (ver `CacheUrlsCsv`). Defaults to None.
 
     Returns:
         Um dicionário onde as chaves são os nomes das categorias e os valores são listas de URLs de arquivos CSV encontrados.
     """
 
-    urls_csv_por_categoria = {}
-    url_download = 'http://vitibrasil.cnpuv.embrapa.br/'
-    for categoria, subcategorias in categorias.items():
-        url_categoria = url_base + f"?opcao=opt_{categoria}"
+    with medir_etapa('encontrar_urls_csv') as contagens:
+        paginas = montar_urls_paginas(url_base, categorias)
+        resultados = cache.consultar([url for _, _, url in paginas]) if cache is not None else None
 
-        if subcategorias is None:
-            # Categoria sem subcategorias
-            urls_csv_por_categoria[categoria] = encontrar_urls_csv_na_pagina(url_categoria, url_download)
-        else:
-            # Categoria com subcategorias
-            urls_csv_por_categoria[categoria] = {}
-            for subcategoria in subcategorias:
-                url_subcategoria = url_categoria + f"&subopcao=subopt_{subcategoria}"
-                urls_csv_por_categoria[categoria][subcategoria] = encontrar_urls_csv_na_pagina(url_subcategoria,
-                                                                                               url_download)
+        if resultados is None:
+            resultados = [encontrar_urls_csv_na_pagina(url, URL_DOWNLOAD, cache) for _, _, url in paginas]
+            if cache is not None and paginas_completas(resultados):
+                cache.salvar()
+
+        urls_csv_por_categoria = montar_mapa_urls(paginas, resultados)
+        contagens['linhas_saida'] = contar_urls(urls_csv_por_categoria)
 
     return urls_csv_por_categoria
 
 
-def encontrar_urls_csv_na_pagina(url, url_download):
+def paginas_completas(resultados):
+    """
+    Indica se todas as páginas foram lidas e têm ao menos um arquivo CSV, condição para gravar o cache.
+
+    Uma página que falhou (ou que veio sem links) retorna uma lista vazia; gravar o cache nesse caso
+    renovaria a validade das demais páginas e manteria a lista vazia durante toda a validade.
+
+    Args:
+        resultados: As URLs encontradas em cada página.
+
+    Returns:
+        bool: True se todas as páginas tiverem URLs.
+    """
+
+    return all(resultados)
+
+
+def encontrar_urls_csv_na_pagina(url, url_download, cache=None):
     """
     Encontra URLs de arquivos CSV em uma única página.
 
     Args:
         url: A URL da página.
         url_download: A URL base do site (para construir URLs relativas se necessário).
+        cache (CacheUrlsCsv, optional): Se informado, a página só é lida novamente se o conteúdo mudou. Defaults to None.
 
     Returns:
         Uma lista de URLs de arquivos CSV encontrados.
     """
 
     try:
-        response = requests.get(url)
+        response = buscar(url)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-        urls_csv = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            if href.endswith('.csv'):
-                if href.startswith('http'):
-                    # URL absoluta
-                    urls_csv.append(href)
-                else:
-                    # URL relativa, construir a URL completa
-                    urls_csv.append(url_download + href)
-        return urls_csv
+        return extrair_urls_pagina(url, response.content, url_download, cache)
 
     except requests.exceptions.RequestException as e:
         print(f"Erro ao acessar a URL: {e}")
         return []
 
 
+def extrair_urls_csv(conteudo, url_download):
+    """
+    Extrai as URLs de arquivos CSV do conteúdo HTML de uma página.
+
+    Args:
+        conteudo: O conteúdo HTML da página (bytes ou str).
+        url_download: A URL base do site (para construir URLs relativas se necessário).
+
+    Returns:
+        Uma lista de URLs de arquivos CSV encontrados.
+    """
+
+    soup = BeautifulSoup(conteudo, 'html.parser', parse_only=APENAS_LINKS)
+    urls_csv = []
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        if href.endswith('.csv'):
+            if href.startswith('http'):
+                # URL absoluta
+                urls_csv.append(href)
+            else:
+                # URL relativa, construir a URL completa
+                urls_csv.append(url_download + href)
+    return urls_csv
+
+
+def extrair_urls_pagina(url, conteudo, url_download, cache=None):
+    """
+    Extrai as URLs de arquivos CSV de uma página baixada, reaproveitando as do cache se a página não mudou.
+
+    Args:
+        url: A URL da página.
+        conteudo: O conteúdo HTML da página (bytes).
+        url_download: A URL base do site (para construir URLs relativas se necessário).
+        cache (CacheUrlsCsv, optional): Cache das URLs encontradas. Defaults to None.
+
+    Returns:
+        Uma lista de URLs de arquivos CSV encontrados.
+    """
+
+    if cache is None:
+        return extrair_urls_csv(conteudo, url_download)
+
+    return cache.extrair(url, conteudo, lambda pagina: extrair_urls_csv(pagina, url_download))
+
+
+def montar_urls_paginas(url_base, categorias):
+    """
+    Monta a lista de páginas a serem visitadas para cada categoria e subcategoria.
+
+    Args:
+        url_base: A URL base do site.
+        categorias: Um dicionário onde as chaves são os nomes das categorias e os valores são listas de subcategorias (ou None para nenhuma subcategoria).
+
+    Returns:
+        Uma lista de tuplas (categoria, subcategoria, url), com subcategoria None para categorias sem subcategorias.
+    """
+
+    paginas = []
+    for categoria, subcategorias in categorias.items():
+        url_categoria = url_base + f"?opcao=opt_{categoria}"
+
+        if subcategorias is None:
+            paginas.append((categoria, None, url_categoria))
+        else:
+            for subcategoria in subcategorias:
+                paginas.append((categoria, subcategoria, url_categoria + f"&subopcao=subopt_{subcategoria}"))
+
+    return paginas
+
+
+def montar_mapa_urls(paginas, resultados):
+    """
+    Agrupa as URLs encontradas em cada página por categoria e subcategoria.
+
+    Args:
+        paginas: A lista retornada por `montar_urls_paginas`.
+        resultados: As URLs de arquivos CSV encontradas em cada página, na mesma ordem.
+
+    Returns:
+        Um dicionário onde as chaves são os nomes das categorias e os valores são listas de URLs de arquivos CSV encontrados.
+    """
+
+    urls_csv_por_categoria = {}
+    for (categoria, subcategoria, _), urls_csv in zip(paginas, resultados):
+        if subcategoria is None:
+            urls_csv_por_categoria[categoria] = urls_csv
+        else:
+            urls_csv_por_categoria.setdefault(categoria, {})[subcategoria] = urls_csv
+
+    return urls_csv_por_categoria
+
+
+async def encontrar_urls_csv_na_pagina_async(cliente, semaforo, url, url_download, cache=None):
+    """
+    Versão assíncrona de `encontrar_urls_csv_na_pagina`, limitada por um semáforo.
+
+    Args:
+        cliente (httpx.AsyncClient): Cliente HTTP compartilhado entre as requisições.
+        semaforo (asyncio.Semaphore): Semáforo que limita o número de requisições simultâneas.
+        url: A URL da página.
+        url_download: A URL base do site (para construir URLs relativas se necessário).
+        cache (CacheUrlsCsv, optional): Se informado, a página só é lida novamente se o conteúdo mudou. Defaults to None.
+
+    Returns:
+        Uma lista de URLs de arquivos CSV encontrados.
+    """
+
+    async with semaforo:
+        try:
+            response = await buscar_async(cliente, url)
+            response.raise_for_status()
+
+        except httpx.HTTPError as e:
+            print(f"Erro ao acessar a URL: {e}")
+            return []
+
+    return extrair_urls_pagina(url, response.content, url_download, cache)
+
+
+async def encontrar_urls_csv_async(url_base, categorias, max_conexoes=MAXIMO_CONEXOES_SIMULTANEAS,
+                                   url_download=URL_DOWNLOAD, cache=None):
+    """
+    Encontra URLs de arquivos CSV buscando todas as páginas de categorias e subcategorias em paralelo.
+
+    Retorna o mesmo formato de `encontrar_urls_csv`, consumido por `criar_lista_json`, mas o tempo
+    total passa a ser próximo ao da página mais lenta em vez da soma de todas elas.
+
+    Args:
+        url_base: A URL base do site.
+        categorias: Um dicionário onde as chaves são os nomes das categorias e os valores são listas de subcategorias (ou None para nenhuma subcategoria).
+        max_conexoes (int, optional): Número máximo de requisições simultâneas. Defaults to MAXIMO_CONEXOES_SIMULTANEAS.
+        url_download (str, optional): A URL base usada para montar URLs relativas. Defaults to URL_DOWNLOAD.
+        cache (CacheUrlsCsv, optional): Cache das URLs encontradas; dentro da validade nenhuma página é
+            buscada e, depois dela, apenas as páginas alteradas são lidas novamente. Defaults to None.
+
+    Returns:
+        Um dicionário onde as chaves são os nomes das categorias e os valores são listas de URLs de arquivos CSV encontrados.
+    """
+
+    with medir_etapa('encontrar_urls_csv') as contagens:
+        paginas = montar_urls_paginas(url_base, categorias)
+        resultados = cache.consultar([url for _, _, url in paginas]) if cache is not None else None
+
+        if resultados is None:
+            semaforo = asyncio.Semaphore(max_conexoes)
+            limites = httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes)
+            timeout = httpx.Timeout(TIMEOUT_LEITURA, connect=TIMEOUT_CONEXAO)
+
+            async with httpx.AsyncClient(limits=limites, timeout=timeout) as cliente:
+                resultados = await asyncio.gather(*[
+                    encontrar_urls_csv_na_pagina_async(cliente, semaforo, url, url_download, cache)
+                    for _, _, url in paginas
+                ])
+
+            if cache is not None and paginas_completas(resultados):
+                cache.salvar()
+
+        # Remonta o dicionário na mesma ordem e formato da versão sequencial
+        urls_csv_por_categoria = montar_mapa_urls(paginas, resultados)
+
+        contagens['linhas_saida'] = contar_urls(urls_csv_por_categoria)
+
+    return urls_csv_por_categoria
+
+
+def encontrar_urls_csv_concorrente(url_base, categorias, max_conexoes=MAXIMO_CONEXOES_SIMULTANEAS, cache=None):
+    """
+    Executa `encontrar_urls_csv_async` para chamadores síncronos (fora de um event loop).
+
+    Args:
+        url_base: A URL base do site.
+        categorias: Um dicionário onde as chaves são os nomes das categorias e os valores são listas de subcategorias (ou None para nenhuma subcategoria).
+        max_conexoes (int, optional): Número máximo de requisições simultâneas. Defaults to MAXIMO_CONEXOES_SIMULTANEAS.
+        cache (CacheUrlsCsv, optional): Cache das URLs encontradas. Defaults to None.
+
+    Returns:
+        Um dicionário onde as chaves são os nomes das categorias e os valores são listas de URLs de arquivos CSV encontrados.
+    """
+
+    return asyncio.run(encontrar_urls_csv_async(url_base, categorias, max_conexoes=max_conexoes, cache=cache))
+
+
+def contar_urls(urls_csv_por_categoria):
+    """
+    Conta as URLs de arquivos CSV retornadas por `encontrar_urls_csv`.
+
+    Args:
+        urls_csv_por_categoria: O dicionário de URLs por categoria (e subcategoria).
+
+    Returns:
+        int: A quantidade de URLs.
+    """
+
+    return sum(
+        contar_urls(urls) if isinstance(urls, dict) else len(urls)
+        for urls in urls_csv_por_categoria.values()
+    )
+
+
 def criar_lista_json(urls_encontradas):
     """
     Transforma o dicionário de URLs encontradas no formato JSON desejado.
@@ -0,0 +1,262 @@
+"""
+Carrega as tabelas a partir de um diretório com os arquivos CSV da EMBRAPA já baixados, sem acessar a rede.
+
+O diretório contém os arquivos e um manifesto (`manifesto.json`) no formato de `criar_lista_json`, em que
+cada link traz, na chave 'arquivo', o caminho do CSV relativo ao diretório. A carga é a mesma de
+`/inicializacao` (`Inicializacao.insercoes` ou `insercoes_em_pipeline`), e ao final são exibidos o
+resumo de cada tabela e as medições de cada etapa (ver `MedicaoIngestao`).
+
+Uso:
+    python -m src.ingest dados_embrapa --capturar
+    python -m src.ingest dados_embrapa
+    python -m src.ingest dados_embrapa --tabelas producao,exportacao --pipeline --processos 4
+    python -m src.ingest dados_embrapa --url sqlite:///embrapa.db --modo staging --tamanho-lote 5000
+
+O --capturar baixa os arquivos atuais do site e grava o manifesto, para que as cargas seguintes
+sejam repetidas sempre sobre os mesmos dados. Sem --url é usado o banco configurado no .env.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.orm import sessionmaker
+
+from src.dependencies.database import Base, LOCAL_INFILE_HABILITADO, SessionLocal
+from src.dependencies.importacao_dados import download_tabela
+from src.dependencies.requisicao_embrapa import usar_sessao
+from src.dependencies.web_scraping import criar_lista_json, encontrar_urls_csv_concorrente
+from src.routes.inicializacao_banco import CATEGORIAS, ERRO_DIFERENCIAL_COM_ORCAMENTO, URL_BASE, Inicializacao
+from src.services.funcionalidades_banco import TAMANHO_LOTE_PADRAO
+from src.services.metricas_ingestao import MedicaoIngestao, medir_etapa
+from src.services.pipeline_ingestao import MAXIMO_DOWNLOADS_SIMULTANEOS, insercoes_em_pipeline
+
+
+NOME_MANIFESTO = 'manifesto.json'
+
+
+def capturar(diretorio):
+    """Baixa os arquivos CSV atuais da EMBRAPA para um diretório e grava o manifesto correspondente.
+
+    Args:
+        diretorio (str | Path): Diretório de destino (criado se não existir).
+
+    Returns:
+        list[dict]: O manifesto gravado.
+    """
+    diretorio = Path(diretorio)
+    diretorio.mkdir(parents=True, exist_ok=True)
+
+    with usar_sessao():
+        manifesto = criar_lista_json(encontrar_urls_csv_concorrente(URL_BASE, CATEGORIAS))
+
+        for tabela in manifesto:
+            for link in tabela['lista_links']:
+                nome_arquivo = link['url'].rsplit('/', 1)[-1]
+                (diretorio / nome_arquivo).write_bytes(download_tabela(link['url']))
+                link['arquivo'] = nome_arquivo
+
+    (diretorio / NOME_MANIFESTO).write_text(json.dumps(manifesto, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    return manifesto
+
+
+def ler_manifesto(diretorio, caminho_manifesto=None, tabelas=None):
+    """Lê o manifesto de um diretório de arquivos, resolvendo o caminho local de cada link.
+
+    Links sem a chave 'arquivo' usam o nome do arquivo da URL.
+
+    Args:
+        diretorio (str | Path): Diretório com os arquivos CSV.
+        caminho_manifesto (str | Path, optional): Caminho do manifesto.
+            Defaults to None (`manifesto.json` do diretório).
+        tabelas (list[str], optional): Tabelas a serem mantidas, na ordem do manifesto. Defaults to None (todas).
+
+    Returns:
+        list[dict]: As tabelas no formato de `criar_lista_json`, com o caminho absoluto em 'arquivo'.
+
+    Raises:
+        FileNotFoundError: Se o manifesto ou algum dos arquivos não existir.
+        ValueError: Se alguma das tabelas informadas não estiver no manifesto.
+    """
+    diretorio = Path(diretorio)
+    caminho_manifesto = Path(caminho_manifesto) if caminho_manifesto else diretorio / NOME_MANIFESTO
+
+    manifesto = json.loads(caminho_manifesto.read_text(encoding='utf-8'))
+
+    if tabelas:
+        desconhecidas = set(tabelas) - {tabela['nome_tabela'] for tabela in manifesto}
+        if desconhecidas:
+            raise ValueError(f'Tabelas fora do manifesto: {", ".join(sorted(desconhecidas))}')
+        manifesto = [tabela for tabela in manifesto if tabela['nome_tabela'] in tabelas]
+
+    for tabela in manifesto:
+        for link in tabela['lista_links']:
+            caminho = diretorio / link.get('arquivo', link.get('url', '').rsplit('/', 1)[-1])
+            if not caminho.is_file():
+                raise FileNotFoundError(f'Arquivo da tabela {tabela["nome_tabela"]} não encontrado: {caminho}')
+            link['arquivo'] = str(caminho.resolve())
+
+    return manifesto
+
+
+def criar_sessao(url=None):
+    """Cria a fábrica de sessões do banco onde as tabelas serão carregadas.
+
+    Args:
+        url (str, optional): URL do banco (SQLAlchemy); as tabelas são criadas se não existirem.
+            Defaults to None (banco configurado no .env).
+
+    Returns:
+        tuple: A fábrica de sessões e se o `LOAD DATA LOCAL INFILE` está habilitado na conexão.
+    """
+    if url is None:
+        return SessionLocal, LOCAL_INFILE_HABILITADO
+
+    usa_local_infile = LOCAL_INFILE_HABILITADO and make_url(url).get_backend_name() == 'mysql'
+    engine = create_engine(url, connect_args={'local_infile': True} if usa_local_infile else {})
+    Base.metadata.create_all(bind=engine)
+
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine), usa_local_infile
+
+
+def executar(manifesto, sessao_local, pipeline=False, max_processos=None, max_downloads=MAXIMO_DOWNLOADS_SIMULTANEOS,
+             tamanho_lote=TAMANHO_LOTE_PADRAO, modo='truncate', orcamento_memoria_mb=None, load_data=False):
+    """Carrega as tabelas do manifesto, medindo cada etapa.
+
+    Args:
+        manifesto (list[dict]): Retorno de `ler_manifesto`.
+        sessao_local (sessionmaker): Fábrica de sessões do banco de dados.
+        pipeline (bool, optional): Se True, usa `insercoes_em_pipeline`. Defaults to False.
+        max_processos (int, optional): Processos de transformação do pipeline. Defaults to None (número de CPUs).
+        max_downloads (int, optional): Leituras de arquivos simultâneas do pipeline.
+            Defaults to MAXIMO_DOWNLOADS_SIMULTANEOS.
+        tamanho_lote (int, optional): Linhas por INSERT. Defaults to TAMANHO_LOTE_PADRAO.
+        modo (str, optional): 'truncate', 'diferencial' ou 'staging'. Defaults to 'truncate'.
+        orcamento_memoria_mb (int, optional): Ver `Inicializacao.orcamento_memoria`. Defaults to None.
+        load_data (bool, optional): Ver `Inicializacao.load_data`. Defaults to False.
+
+    Returns:
+        tuple: O resumo da carga de cada tabela e as medições (`MedicaoIngestao`).
+    """
+    iniciadores = [
+        Inicializacao(
+            nome_tabela=element['nome_tabela'],
+            nome_coluna=element['nome_coluna'],
+            drop_column=element['drop_table'],
+            lista_links=element['lista_links'],
+            separador=element['separador'],
+            tamanho_lote=tamanho_lote,
+            modo_carga=modo,
+            orcamento_memoria=orcamento_memoria_mb * 1024 * 1024 if orcamento_memoria_mb else None,
+            load_data=load_data,
+        )
+        for element in manifesto
+    ]
+
+    medicao = MedicaoIngestao()
+    db = sessao_local()
+
+    try:
+        with medicao.ativar(), medir_etapa('total'):
+            if pipeline:
+                resumos = insercoes_em_pipeline(
+                    iniciadores, db=db, max_downloads=max_downloads, max_processos=max_processos, forcar=True
+                )
+            else:
+                resumos = {iniciar.nome_tabela: iniciar.insercoes(db=db, forcar=True) for iniciar in iniciadores}
+    finally:
+        db.close()
+
+    return resumos, medicao
+
+
+def imprimir_relatorio(resumos, medicao, saida=None):
+    """Exibe o resumo de cada tabela e as medições de cada etapa.
+
+    Args:
+        resumos (dict): Resumo da carga de cada tabela.
+        medicao (MedicaoIngestao): As medições da carga.
+        saida (TextIO, optional): Onde o relatório é escrito. Defaults to None (sys.stdout).
+    """
+    saida = saida or sys.stdout
+
+    for tabela, resumo in resumos.items():
+        contagens = ', '.join(f'{chave}={valor}' for chave, valor in resumo.items() if chave != 'recarregada')
+        print(f'{tabela}: {contagens}', file=saida)
+
+    print(file=saida)
+    print(f'{"etapa":<28}{"tabela":<18}{"chamadas":>9}{"segundos":>11}{"cpu":>11}{"linhas":>11}', file=saida)
+    for medida in medicao.resumo():
+        print(
+            f'{medida["etapa"]:<28}{medida["tabela"] or "-":<18}{medida["chamadas"]:>9}'
+            f'{medida["tempo_total"]:>11.3f}{medida["tempo_cpu"]:>11.3f}{medida["linhas_saida"]:>11}',
+            file=saida
+        )
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m src.ingest', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('diretorio', help='Diretório com os arquivos CSV e o manifesto.')
+    parser.add_argument('--manifesto', help=f'Caminho do manifesto (padrão: <diretorio>/{NOME_MANIFESTO}).')
+    parser.add_argument('--capturar', action='store_true',
+                        help='Baixa os arquivos atuais da EMBRAPA para o diretório e grava o manifesto, sem carregar.')
+    parser.add_argument('--tabelas', help='Tabelas a serem carregadas, separadas por vírgula (padrão: todas).')
+    parser.add_argument('--pipeline', action='store_true', help='Sobrepõe leitura, transformação e inserção.')
+    parser.add_argument('--processos', type=int, help='Processos de transformação do --pipeline (padrão: CPUs).')
+    parser.add_argument('--downloads', type=int, default=MAXIMO_DOWNLOADS_SIMULTANEOS,
+                        help='Arquivos lidos simultaneamente no --pipeline.')
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_PADRAO, help='Linhas por INSERT.')
+    parser.add_argument('--modo', choices=['truncate', 'diferencial', 'staging'], default='truncate',
+                        help='Modo de carga das tabelas.')
+    parser.add_argument('--orcamento-memoria-mb', type=int,
+                        help='Lê e grava cada arquivo em blocos (em MB, sem contar o arquivo lido). '
+                             "Não pode ser usado com --modo diferencial.")
+    parser.add_argument('--url', help='URL do banco de dados (SQLAlchemy) (padrão: banco do .env).')
+    parser.add_argument('--salvar-medicoes', action='store_true',
+                        help="Grava as medições na tabela 'ingest_runs' do banco.")
+    args = parser.parse_args(argumentos)
+
+    if args.modo == 'diferencial' and args.orcamento_memoria_mb is not None:
+        parser.error(ERRO_DIFERENCIAL_COM_ORCAMENTO)
+
+    if args.capturar:
+        manifesto = capturar(args.diretorio)
+        arquivos = sum(len(tabela['lista_links']) for tabela in manifesto)
+        print(f'{arquivos} arquivos gravados em {os.path.abspath(args.diretorio)}')
+        return 0
+
+    tabelas = [tabela.strip() for tabela in args.tabelas.split(',')] if args.tabelas else None
+    manifesto = ler_manifesto(args.diretorio, args.manifesto, tabelas)
+    sessao_local, load_data = criar_sessao(args.url)
+
+    resumos, medicao = executar(
+        manifesto,
+        sessao_local,
+        pipeline=args.pipeline,
+        max_processos=args.processos,
+        max_downloads=args.downloads,
+        tamanho_lote=args.tamanho_lote,
+        modo=args.modo,
+        orcamento_memoria_mb=args.orcamento_memoria_mb,
+        load_data=load_data,
+    )
+
+    imprimir_relatorio(resumos, medicao)
+
+    if args.salvar_medicoes:
+        db = sessao_local()
+        try:
+            medicao.salvar(db, 'concluida')
+        finally:
+            db.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, Float
 from src.dependencies.database import Base
 
 
@@ -112,6 +112,63 @@ class Producao(Base):
     valor_producao = Column(Float(50, 2))
 
 
+class ExecucaoIngestao(Base):
+    """
+    Modelo de dados para a tabela 'ingest_runs', com as medições de cada etapa de uma carga do banco.
+
+    Cada carga gera uma linha por etapa e tabela (ver `MedicaoIngestao`).
+
+    Atributos:
+        id (int): ID único da entrada.
+        id_execucao (str): Identificador da carga.
+        iniciada_em (datetime): Início da carga.
+        status (str): Resultado da carga ('concluida' ou 'erro').
+        etapa (str): Nome da etapa medida (ex: 'download_tabela').
+        tabela (str): Tabela à qual a etapa pertence (vazio para etapas gerais).
+        chamadas (int): Quantidade de execuções da etapa.
+        tempo_total (float): Tempo decorrido, em segundos.
+        tempo_cpu (float): Tempo de CPU, em segundos.
+        bytes (int): Bytes processados.
+        linhas_entrada (int): Linhas recebidas pela etapa.
+        linhas_saida (int): Linhas produzidas pela etapa.
+        pico_memoria_etapa (int): Maior uso de memória (RSS) do processo durante a etapa, acima do
+            uso no seu início, em bytes (vazio fora do Linux).
+        conexoes (int): Conexões de rede abertas pela etapa (etapa 'requisicoes_http').
+    """
+
+    __tablename__ = 'ingest_runs'
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement='auto')
+    id_execucao = Column(String(32), index=True)
+    iniciada_em = Column(DateTime)
+    status = Column(String(20))
+    etapa = Column(String(50))
+    tabela = Column(String(50))
+    chamadas = Column(Integer)
+    tempo_total = Column(Float)
+    tempo_cpu = Column(Float)
+    bytes = Column(BigInteger)
+    linhas_entrada = Column(BigInteger)
+    linhas_saida = Column(BigInteger)
+    pico_memoria_etapa = Column(BigInteger)
+    conexoes = Column(Integer)
+
+
+class VersaoTabela(Base):
+    """
+    Modelo de dados para a tabela 'versoes_tabelas', com a versão atual dos dados de cada tabela (ver `versoes_tabelas`).
+
+    Atributos:
+        tabela (str): Nome da tabela.
+        versao (int): Versão dos dados, incrementada a cada escrita e a cada carga da tabela.
+    """
+
+    __tablename__ = 'versoes_tabelas'
+
+    tabela = Column(String(50), primary_key=True)
+    versao = Column(BigInteger, nullable=False, default=0)
+
+
 class User(Base):
     """
     Modelo de dados para a tabela 'comercializacao', representando dados de comercialização de produtos.
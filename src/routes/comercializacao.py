@@ -1,7 +1,7 @@
 from src.models import models_db as models
 import os
 
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import Annotated
 
@@ -9,6 +9,13 @@ from src.models.models_db import Comercializacao
 from src.dependencies.database import SessionLocal
 from src.models.api.model_comercializacao_api import ComercializacaoBase, ComercializacaoInsert
 from src.services.authentication import get_current_user
+from src.services.cache_consultas import CACHE_CONSULTAS, normalizar
+from src.services.listagens_materializadas import LISTAGENS_MATERIALIZADAS, resposta_materializada
+from src.services.paginacao import LIMITE_PADRAO, CursorPagina, LimitePagina
+from src.services.paginacao import consultar_pagina, decodificar_cursor, informar_proximo_cursor
+from src.services.projecao import CamposProjecao, campos_projecao, listar_projecao, projetar, serializar_projecao
+from src.services.respostas_streaming import CabecalhoAccept, formato_streaming, resposta_streaming
+from src.services.versoes_tabelas import atualizar_versoes, incrementar_versao, versionar
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -30,12 +37,14 @@ def get_db():
 
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[Session, Depends(get_current_user)]
+versao_dependency = Depends(versionar('comercializacao', get_db))
 
 
-@router.get('/comercializacao/{id_comercializacao}', status_code=status.HTTP_200_OK)
+@router.get('/comercializacao/{id_comercializacao}', status_code=status.HTTP_200_OK, dependencies=[versao_dependency])
 async def comercializacao_id(
         id_comercializacao: int,
-        db: db_dependency
+        db: db_dependency,
+        fields: CamposProjecao = None
 ):
     """
     Obtém um item da tabela de comercializacao pelo ID.
@@ -43,13 +52,20 @@ async def comercializacao_id(
     Args:
         id_comercializacao (int): O ID da comercializacao.
         db: Sessão do banco de dados.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
         Comercializacao: O objeto Comercializacao correspondente ao ID,
             ou gera HTTP_404_NOT_FOUND se não encontrado.
     """
 
-    comercializacao = db.query(models.Comercializacao).filter(models.Comercializacao.id == id_comercializacao).first()
+    campos = campos_projecao(models.Comercializacao, fields)
+
+    query = db.query(models.Comercializacao).filter(models.Comercializacao.id == id_comercializacao)
+    comercializacao = CACHE_CONSULTAS.consultar(
+        'comercializacao', 'item', normalizar(id=id_comercializacao, campos=campos),
+        lambda: serializar_projecao(projetar(query, models.Comercializacao, campos).first(), campos)
+    )
 
     if comercializacao is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Not found')
@@ -57,23 +73,63 @@ async def comercializacao_id(
     return comercializacao
 
 
-@router.get('/comercializacao', status_code=status.HTTP_200_OK)
-async def total_comercializacao(db: db_dependency):
+@router.get('/comercializacao', status_code=status.HTTP_200_OK, dependencies=[versao_dependency])
+async def total_comercializacao(
+        db: db_dependency,
+        response: Response,
+        limit: LimitePagina = LIMITE_PADRAO,
+        after: CursorPagina = None,
+        accept: CabecalhoAccept = None,
+        fields: CamposProjecao = None
+):
     """
-    Obtém todos os dados da tabela de comercializacao.
+    Obtém os dados da tabela de comercializacao, paginados pelo ID.
+
+    O cursor da próxima página é retornado no cabeçalho X-Proximo-Cursor, e deve ser
+    informado em `after` para obtê-la. Na última página o cabeçalho não é enviado.
+
+    Com `Accept: application/x-ndjson` ou `Accept: text/csv` a tabela inteira (a partir de `after`,
+    se informado) é enviada em streaming, lida e serializada em lotes.
+
+    As páginas da listagem padrão (sem `limit` e `fields`) são serializadas uma única vez por versão
+    da tabela e retornadas prontas (ver `ListagensMaterializadas`).
 
     Args:
         db: Sessão do banco de dados.
+        response (Response): A resposta, onde é informado o cursor da próxima página.
+        limit (int, optional): Quantidade máxima de linhas (até LIMITE_MAXIMO). Defaults to LIMITE_PADRAO.
+        after (str, optional): Cursor da página anterior. Defaults to None (primeira página).
+        accept (str, optional): O cabeçalho Accept da requisição. Defaults to None.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
-        list[Comercializacao]: Uma lista de objetos Comercializacao.
+        list[Comercializacao]: Uma lista de objetos Comercializacao, ordenada pelo ID,
+            ou StreamingResponse com a tabela em NDJSON ou CSV.
 
     Raises:
+        HTTPException: Com status code 400 se o cursor ou os campos forem inválidos.
         HTTPException: Com status code 500 se houver um erro ao obter os dados.
     """
+    ultimo_id = decodificar_cursor(after)
+    campos = campos_projecao(models.Comercializacao, fields)
+
+    formato = formato_streaming(accept)
+    if formato is not None:
+        return resposta_streaming(db, models.Comercializacao, formato, response, ultimo_id, campos)
+
     try:
-        # retorna todas as linhas da tabela
-        return db.query(models.Comercializacao).all()
+        # páginas da listagem padrão saem prontas, serializadas uma vez por versão da tabela
+        pagina = LISTAGENS_MATERIALIZADAS.pagina(db, models.Comercializacao, limit, ultimo_id, campos)
+        if pagina is not None:
+            return resposta_materializada(pagina, response)
+
+        # retorna uma página da tabela, a partir do último ID da página anterior
+        linhas, proximo_cursor = CACHE_CONSULTAS.consultar(
+            'comercializacao', 'pagina', normalizar(limite=limit, ultimo_id=ultimo_id, campos=campos),
+            lambda: consultar_pagina(db, models.Comercializacao, limit, ultimo_id, campos)
+        )
+        informar_proximo_cursor(response, proximo_cursor)
+        return linhas
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail="Erro ao obter os dados da tabela")
@@ -82,7 +138,8 @@ async def total_comercializacao(db: db_dependency):
 @router.post('/comercializacao/filtragem', status_code=status.HTTP_200_OK)
 async def filtrar_comercializacao(
         comercializacao: ComercializacaoBase,
-        db: db_dependency
+        db: db_dependency,
+        fields: CamposProjecao = None
 ):
     """
     Filtra dados da tabela de comercializacao com base nos critérios fornecidos.
@@ -97,14 +154,18 @@ async def filtrar_comercializacao(
             * ano (str, optional): Ano dos dados.
             * litros_comercializacao (float, optional): Quantidade de litros comercializados.
         db: Sessão do banco de dados.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
         list[Comercializacao]: Uma lista de objetos Comercializacao que correspondem aos filtros.
 
     Raises:
+        HTTPException: Com status code 400 se os campos forem inválidos.
         HTTPException: Com status code 500 se houver um erro ao filtrar os dados.
     """
 
+    campos = campos_projecao(models.Comercializacao, fields)
+
     try:
         query = db.query(models.Comercializacao)
 
@@ -128,8 +189,14 @@ async def filtrar_comercializacao(
         if comercializacao.litros_comercializacao is not None:
             query = query.filter(models.Comercializacao.litros_comercializacao == comercializacao.litros_comercializacao)
 
+        # As versões são relidas aqui, já que a filtragem não tem ETag (ver `versionar`)
+        atualizar_versoes(db)
+
         # Executa a consulta e retorna os resultados
-        return query.all()
+        return CACHE_CONSULTAS.consultar(
+            'comercializacao', 'filtragem', normalizar(filtros=comercializacao, campos=campos),
+            lambda: listar_projecao(query, models.Comercializacao, campos)
+        )
 
     except Exception as e:
         print(e)
@@ -169,6 +236,7 @@ async def insere_comercializacao(
     )
 
     db.add(create_comercializacao_model)
+    incrementar_versao('comercializacao', db)
     db.commit()
 
     db.refresh(create_comercializacao_model)
@@ -211,6 +279,8 @@ async def altera_comercializacao(
     comercializacao_model.ano = comercializacao.ano
     comercializacao_model.litros_comercializacao = comercializacao.litros_comercializacao
 
+    incrementar_versao('comercializacao', db)
+
     # Realiza o commit para persistir as alterações no banco de dados
     db.commit()
 
@@ -244,6 +314,8 @@ async def deleta_comercializacao(
 
     db.delete(comercializacao_model)
 
+    incrementar_versao('comercializacao', db)
+
     # Realiza o commit para persistir as alterações no banco de dados
     db.commit()
 
@@ -2,7 +2,7 @@ import os
 
 from src.models import models_db as models
 
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import Annotated
 
@@ -10,6 +10,13 @@ from src.models.models_db import Importacao
 from src.dependencies.database import SessionLocal
 from src.models.api.model_importacao_api import ImportacaoBase, ImportacaoInsert
 from src.services.authentication import get_current_user
+from src.services.cache_consultas import CACHE_CONSULTAS, normalizar
+from src.services.listagens_materializadas import LISTAGENS_MATERIALIZADAS, resposta_materializada
+from src.services.paginacao import LIMITE_PADRAO, CursorPagina, LimitePagina
+from src.services.paginacao import consultar_pagina, decodificar_cursor, informar_proximo_cursor
+from src.services.projecao import CamposProjecao, campos_projecao, listar_projecao, projetar, serializar_projecao
+from src.services.respostas_streaming import CabecalhoAccept, formato_streaming, resposta_streaming
+from src.services.versoes_tabelas import atualizar_versoes, incrementar_versao, versionar
 
 
 router = APIRouter(
@@ -29,12 +36,14 @@ def get_db():
 
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[Session, Depends(get_current_user)]
+versao_dependency = Depends(versionar('importacao', get_db))
 
 
-@router.get('/importacao/{id_importacao}', status_code=status.HTTP_200_OK)
+@router.get('/importacao/{id_importacao}', status_code=status.HTTP_200_OK, dependencies=[versao_dependency])
 async def importacao_id(
         id_importacao: int,
-        db: db_dependency
+        db: db_dependency,
+        fields: CamposProjecao = None
 ):
     """
     Obtém um item da tabela de importacao pelo ID.
@@ -42,13 +51,20 @@ async def importacao_id(
     Args:
         id_importacao (int): O ID da importacao.
         db: Sessão do banco de dados.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
         Exportação: O objeto Exportacao correspondente ao ID,
             ou gera HTTP_404_NOT_FOUND se não encontrado.
     """
 
-    importacao = db.query(models.Importacao).filter(models.Importacao.id == id_importacao).first()
+    campos = campos_projecao(models.Importacao, fields)
+
+    query = db.query(models.Importacao).filter(models.Importacao.id == id_importacao)
+    importacao = CACHE_CONSULTAS.consultar(
+        'importacao', 'item', normalizar(id=id_importacao, campos=campos),
+        lambda: serializar_projecao(projetar(query, models.Importacao, campos).first(), campos)
+    )
 
     if importacao is None:
         raise HTTPException(status_code=404, detail=os.environ.get('ERRO_404'))
@@ -56,26 +72,64 @@ async def importacao_id(
     return importacao
 
 
-@router.get('/importacao', status_code=status.HTTP_200_OK)
+@router.get('/importacao', status_code=status.HTTP_200_OK, dependencies=[versao_dependency])
 async def total_importacao(
-        db: db_dependency
+        db: db_dependency,
+        response: Response,
+        limit: LimitePagina = LIMITE_PADRAO,
+        after: CursorPagina = None,
+        accept: CabecalhoAccept = None,
+        fields: CamposProjecao = None
 ):
     """
-    Obtém todos os dados da tabela de importacao.
+    Obtém os dados da tabela de importacao, paginados pelo ID.
+
+    O cursor da próxima página é retornado no cabeçalho X-Proximo-Cursor, e deve ser
+    informado em `after` para obtê-la. Na última página o cabeçalho não é enviado.
+
+    Com `Accept: application/x-ndjson` ou `Accept: text/csv` a tabela inteira (a partir de `after`,
+    se informado) é enviada em streaming, lida e serializada em lotes.
+
+    As páginas da listagem padrão (sem `limit` e `fields`) são serializadas uma única vez por versão
+    da tabela e retornadas prontas (ver `ListagensMaterializadas`).
 
     Args:
         db: Sessão do banco de dados.
+        response (Response): A resposta, onde é informado o cursor da próxima página.
+        limit (int, optional): Quantidade máxima de linhas (até LIMITE_MAXIMO). Defaults to LIMITE_PADRAO.
+        after (str, optional): Cursor da página anterior. Defaults to None (primeira página).
+        accept (str, optional): O cabeçalho Accept da requisição. Defaults to None.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
-        list[Importacao]: Uma lista de objetos Importacao.
+        list[Importacao]: Uma lista de objetos Importacao, ordenada pelo ID,
+            ou StreamingResponse com a tabela em NDJSON ou CSV.
 
     Raises:
+        HTTPException: Com status code 400 se o cursor ou os campos forem inválidos.
         HTTPException: Com status code 500 se houver um erro ao obter os dados.
     """
 
+    ultimo_id = decodificar_cursor(after)
+    campos = campos_projecao(models.Importacao, fields)
+
+    formato = formato_streaming(accept)
+    if formato is not None:
+        return resposta_streaming(db, models.Importacao, formato, response, ultimo_id, campos)
+
     try:
-        # retorna todas as linhas da tabela
-        return db.query(models.Importacao).all()
+        # páginas da listagem padrão saem prontas, serializadas uma vez por versão da tabela
+        pagina = LISTAGENS_MATERIALIZADAS.pagina(db, models.Importacao, limit, ultimo_id, campos)
+        if pagina is not None:
+            return resposta_materializada(pagina, response)
+
+        # retorna uma página da tabela, a partir do último ID da página anterior
+        linhas, proximo_cursor = CACHE_CONSULTAS.consultar(
+            'importacao', 'pagina', normalizar(limite=limit, ultimo_id=ultimo_id, campos=campos),
+            lambda: consultar_pagina(db, models.Importacao, limit, ultimo_id, campos)
+        )
+        informar_proximo_cursor(response, proximo_cursor)
+        return linhas
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail="Erro ao obter os dados da tabela")
@@ -84,7 +138,8 @@ async def total_importacao(
 @router.post('/importacao/filtragem')
 async def filtrar_importacao(
         importacao: ImportacaoBase,
-        db: db_dependency
+        db: db_dependency,
+        fields: CamposProjecao = None
 ):
 
     """
@@ -101,14 +156,18 @@ async def filtrar_importacao(
             * quantidade (float, optional): Quantidade exportada.
             * valor (float, optional): Valor exportado.
         db: Sessão do banco de dados.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
         list[Importacao]: Uma lista de objetos Importacao que correspondem aos filtros.
 
     Raises:
+        HTTPException: Com status code 400 se os campos forem inválidos.
         HTTPException: Com status code 500 se houver um erro ao filtrar os dados.
     """
 
+    campos = campos_projecao(models.Importacao, fields)
+
     try:
         query = db.query(models.Importacao)
 
@@ -136,8 +195,14 @@ async def filtrar_importacao(
         if importacao.valor is not None:
             query = query.filter(models.Importacao.valor == importacao.valor)
 
+        # As versões são relidas aqui, já que a filtragem não tem ETag (ver `versionar`)
+        atualizar_versoes(db)
+
         # Executa a consulta e retorna os resultados
-        return query.all()
+        return CACHE_CONSULTAS.consultar(
+            'importacao', 'filtragem', normalizar(filtros=importacao, campos=campos),
+            lambda: listar_projecao(query, models.Importacao, campos)
+        )
 
     except Exception as e:
         print(e)
@@ -179,6 +244,7 @@ async def insere_importacao(
     )
 
     db.add(create_importacao_model)
+    incrementar_versao('importacao', db)
     db.commit()
 
     db.refresh(create_importacao_model)
@@ -225,6 +291,8 @@ async def altera_importacao(
     importacao_model.quantidade = importacao.quantidade
     importacao_model.valor = importacao.valor
 
+    incrementar_versao('importacao', db)
+
     # Realiza o commit para persistir as alterações no banco de dados
     db.commit()
 
@@ -258,6 +326,8 @@ async def deleta_importacao(
 
     db.delete(comercializacao_model)
 
+    incrementar_versao('importacao', db)
+
     # Realiza o commit para persistir as alterações no banco de dados
     db.commit()
 
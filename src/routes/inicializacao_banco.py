@@ -1,18 +1,33 @@
 from src.models import models_db as models
 import os
+from itertools import chain
 
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 
-from src.dependencies.database import SessionLocal
+import pandas as pd
+
+from src.dependencies.database import LOCAL_INFILE_HABILITADO, SessionLocal
 
 from src.services.authentication import get_current_user
-from src.services.funcionalidades_banco import insercao_dados, limpa_tabela
-from src.services.tratamento_dados_tabela import transformar_em_formato, dataframe_para_json
-from src.dependencies.importacao_dados import download_tabela, leitura_bytes
+from src.services.cache_consultas import CACHE_CONSULTAS
+from src.services.compressao import CACHE_COMPRESSAO
+from src.services.listagens_materializadas import LISTAGENS_MATERIALIZADAS
+from src.services.funcionalidades_banco import carga_diferencial, carga_staging, insercao_dados_em_lote
+from src.services.funcionalidades_banco import insercao_load_data, limpa_tabela
+from src.services.funcionalidades_banco import TAMANHO_LOTE_PADRAO
+from src.services.tratamento_dados_tabela import formato_longo, formato_longo_em_blocos
+from src.dependencies.cache_arquivos import VALIDADE_PADRAO_URLS, CacheArquivos, CacheUrlsCsv
+from src.dependencies.importacao_dados import download_condicional, download_tabela, leitura_arquivo, leitura_bytes
+from src.dependencies.importacao_dados import calcular_linhas_por_bloco, leitura_bytes_em_blocos
+from src.dependencies.requisicao_embrapa import definir_prazo, usar_sessao
 from src.services.tratamento_dados_tabela import trata_df_sem_colunas
-from src.dependencies.web_scraping import criar_lista_json, encontrar_urls_csv
+from src.services.pipeline_ingestao import insercoes_em_pipeline
+from src.services.metricas_ingestao import MedicaoIngestao, definir_tabela, listar_execucoes, medir_etapa
+from src.services.tarefas_inicializacao import iniciar_tarefa, obter_tarefa
+from src.services.versoes_tabelas import incrementar_versao
+from src.dependencies.web_scraping import criar_lista_json, encontrar_urls_csv_concorrente
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -35,6 +50,9 @@ def get_db():
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[Session, Depends(get_current_user)]
 
+# O modo diferencial compara a tabela inteira (inclusive para achar as linhas removidas)
+ERRO_DIFERENCIAL_COM_ORCAMENTO = "O modo 'diferencial' não pode ser usado com orçamento de memória"
+
 
 class Inicializacao:
     """
@@ -44,8 +62,26 @@ class Inicializacao:
         nome_tabela (str): Nome da tabela a ser inicializada.
         nome_coluna (str): Nome da coluna principal na tabela.
         drop_column (str, optional): Nome da coluna a ser removida, se houver.
-        lista_links (list[dict]): Lista de dicionários com URLs e super categorias (se aplicável).
+        lista_links (list[dict]): Lista de dicionários com URLs e super categorias (se aplicável). Um link
+            com a chave 'arquivo' é lido desse caminho local em vez de baixado (ver `src.ingest`).
         separador (str): Caractere separador usado nos arquivos CSV.
+        tamanho_lote (int): Quantidade de linhas enviadas em cada INSERT.
+        cache (CacheArquivos, optional): Cache local dos arquivos; com ele, tabelas cujos arquivos
+            não mudaram desde a última carga não são recarregadas.
+        modo_carga (str): 'truncate' (limpa a tabela e insere tudo), 'diferencial' (ver `carga_diferencial`)
+            ou 'staging' (ver `carga_staging`).
+        progresso (TarefaInicializacao, optional): Tarefa que recebe o andamento da carga.
+        orcamento_memoria (int, optional): Se informado, cada arquivo é lido e gravado em blocos de
+            linhas dimensionados para não ultrapassar essa memória, em bytes (ver `preparar_dados_em_blocos`).
+            O orçamento não inclui os arquivos baixados, que ficam inteiros em memória até a tabela ser
+            gravada. Não é usado por `insercoes_em_pipeline`, que transforma cada arquivo inteiro em outro
+            processo, e não pode ser usado no modo 'diferencial'.
+        load_data (bool): Se True, o modo 'truncate' insere os dados com `LOAD DATA LOCAL INFILE`
+            (ver `insercao_load_data`), quando a conexão permitir.
+
+    Raises:
+        ValueError: Se `orcamento_memoria` for informado no modo 'diferencial', que compara a tabela
+            inteira de uma vez.
     """
 
     def __init__(
@@ -55,15 +91,63 @@ class Inicializacao:
             drop_column,
             lista_links,
             separador,
+            tamanho_lote=TAMANHO_LOTE_PADRAO,
+            cache=None,
+            modo_carga='truncate',
+            progresso=None,
+            orcamento_memoria=None,
+            load_data=False,
     ):
         self.nome_tabela = nome_tabela
         self.nome_coluna = nome_coluna
         self.drop_column = drop_column
         self.lista_links = lista_links
         self.separador = separador
+        self.tamanho_lote = tamanho_lote
+        self.cache = cache
+        self.modo_carga = modo_carga
+        self.progresso = progresso
+        self.orcamento_memoria = orcamento_memoria
+        self.load_data = load_data
+
+        if modo_carga == 'diferencial' and orcamento_memoria is not None:
+            raise ValueError(ERRO_DIFERENCIAL_COM_ORCAMENTO)
+
+    def __getstate__(self):
+        # O cache e o progresso não são necessários (nem serializáveis) nos processos de transformação
+        estado = self.__dict__.copy()
+        estado['cache'] = None
+        estado['progresso'] = None
+        return estado
+
+    def reportar(self, etapa=None, linhas=0):
+        """Informa o andamento da carga da tabela, se houver uma tarefa acompanhando-a.
 
-    def insercoes(self, db):
-        """Realiza as inserções de dados na tabela.
+        Args:
+            etapa (str, optional): Nova etapa da tabela. Defaults to None.
+            linhas (int, optional): Linhas processadas desde a última chamada. Defaults to 0.
+        """
+
+        if self.progresso is not None:
+            self.progresso.atualizar(self.nome_tabela, etapa=etapa, linhas=linhas)
+
+    def acompanhar(self, dados_preparados):
+        """Repassa os dados preparados, contabilizando no progresso as linhas de cada um.
+
+        Args:
+            dados_preparados (Iterable[pd.DataFrame | None]): Retornos de `preparar_dados`.
+
+        Yields:
+            pd.DataFrame | None: Os mesmos dados recebidos.
+        """
+
+        for df_longo in dados_preparados:
+            if df_longo is not None:
+                self.reportar(linhas=len(df_longo))
+            yield df_longo
+
+    def limpar(self, db):
+        """Remove todos os dados da tabela antes de uma nova carga.
 
         Args:
             db: Sessão do banco de dados.
@@ -71,89 +155,527 @@ class Inicializacao:
 
         limpa_tabela(db, self.nome_tabela)
 
-        for link in self.lista_links:
-            df = leitura_bytes(
-                download_tabela(url=link['url']),
-                separador=self.separador,
-                nome_tabela=self.nome_tabela
+    def baixar(self, link):
+        """Faz o download do arquivo CSV de um dos links da tabela.
+
+        Com cache, o download é condicional (ver `download_condicional`). Links com um arquivo
+        local são sempre lidos do disco, sem passar pelo cache.
+
+        Args:
+            link (dict): Item de `lista_links` com a URL (ou o arquivo local) do arquivo.
+
+        Returns:
+            dict: {'url', 'conteudo', 'alterado', ...}, com 'alterado' sempre True quando não há cache.
+        """
+
+        if 'arquivo' in link:
+            conteudo = leitura_arquivo(link['arquivo'])
+            return {'url': link.get('url', link['arquivo']), 'conteudo': conteudo, 'alterado': True}
+
+        if self.cache is None:
+            return {'url': link['url'], 'conteudo': download_tabela(url=link['url']), 'alterado': True}
+
+        return download_condicional(url=link['url'], cache=self.cache)
+
+    def precisa_recarregar(self, arquivos, forcar=False):
+        """Indica se a tabela deve ser recarregada a partir dos arquivos baixados.
+
+        Args:
+            arquivos (list[dict]): Retornos de `baixar` para todos os links da tabela.
+            forcar (bool, optional): Se True, recarrega mesmo sem alterações. Defaults to False.
+
+        Returns:
+            bool: True se algum arquivo mudou desde a última carga (ou se `forcar`).
+        """
+
+        return forcar or any(arquivo['alterado'] for arquivo in arquivos)
+
+    def confirmar(self, arquivos):
+        """Registra no cache as versões dos arquivos que acabaram de ser carregados.
+
+        Args:
+            arquivos (list[dict]): Retornos de `baixar` para todos os links da tabela.
+        """
+
+        if self.cache is None:
+            return
+
+        for arquivo in arquivos:
+            self.cache.registrar(
+                arquivo['url'], arquivo['sha256'], etag=arquivo['etag'], last_modified=arquivo['last_modified']
+            )
+
+    def preparar_dados(self, arquivo_bytes, super_categoria=None):
+        """Lê e transforma o conteúdo de um arquivo CSV em uma linha por produto e ano.
+
+        Não acessa o banco de dados, podendo ser executado em outro processo.
+
+        Args:
+            arquivo_bytes (bytes): O conteúdo do arquivo CSV baixado.
+            super_categoria (str, optional): Super categoria do link de onde o arquivo foi obtido. Defaults to None.
+
+        Returns:
+            pd.DataFrame | None: Os dados no formato longo (ver `formato_longo`), ou None se o arquivo estiver vazio.
+        """
+
+        df = leitura_bytes(
+            arquivo_bytes,
+            separador=self.separador,
+            nome_tabela=self.nome_tabela
+        )
+
+        if df.empty:
+            return None
+
+        return formato_longo(
+            df=self.tratar(df),
+            nome_tabela=self.nome_tabela,
+            nome_coluna=self.nome_coluna,
+            super_categoria=super_categoria
+        )
+
+    def preparar_dados_em_blocos(self, arquivo_bytes, super_categoria=None):
+        """Versão de `preparar_dados` que lê e transforma o arquivo em blocos de linhas.
+
+        O tamanho dos blocos é calculado a partir de `orcamento_memoria`. Como os blocos são
+        gerados sob demanda, cada um pode ser gravado no banco antes de o próximo ser lido.
+
+        Args:
+            arquivo_bytes (bytes): O conteúdo do arquivo CSV baixado.
+            super_categoria (str, optional): Super categoria do link de onde o arquivo foi obtido. Defaults to None.
+
+        Yields:
+            pd.DataFrame: Os dados de cada bloco no formato longo (ver `formato_longo`).
+        """
+
+        blocos = leitura_bytes_em_blocos(
+            arquivo_bytes,
+            separador=self.separador,
+            nome_tabela=self.nome_tabela,
+            linhas_por_bloco=calcular_linhas_por_bloco(arquivo_bytes, self.orcamento_memoria)
+        )
+
+        blocos_tratados = (
+            self.tratar(df, primeiro_bloco=indice == 0) for indice, df in enumerate(blocos) if not df.empty
+        )
+
+        yield from formato_longo_em_blocos(
+            blocos_tratados,
+            nome_tabela=self.nome_tabela,
+            nome_coluna=self.nome_coluna,
+            super_categoria=super_categoria
+        )
+
+    def tratar(self, df, primeiro_bloco=True):
+        """Aplica os tratamentos específicos da tabela ao DataFrame lido do arquivo.
+
+        Args:
+            df (pd.DataFrame): O DataFrame retornado por `leitura_bytes` (ou um de seus blocos).
+            primeiro_bloco (bool, optional): Se o DataFrame começa na primeira linha do arquivo. Defaults to True.
+
+        Returns:
+            pd.DataFrame: O DataFrame tratado, no formato largo.
+        """
+
+        if self.drop_column is not None:
+            df.drop(columns=[self.drop_column], inplace=True)
+
+        if self.nome_tabela == 'processamento':
+            df.replace({'nd': 0, '*': 0}, inplace=True)
+
+        if self.nome_tabela == 'comercializacao':
+            novas_colunas = ['id', 'produto_lixo', 'produto']
+
+            df = trata_df_sem_colunas(
+                df=df,
+                novas_colunas=novas_colunas,
+                coluna_eliminar='produto_lixo',
+                coluna_principal=self.nome_coluna,
+                incluir_cabecalho=primeiro_bloco
             )
 
-            if not df.empty:
-                if self.drop_column is not None:
-                    df.drop(columns=[self.drop_column], inplace=True)
-
-                if self.nome_tabela == 'processamento':
-                    df.replace({'nd': 0, '*': 0}, inplace=True)
-
-                if self.nome_tabela == 'comercializacao':
-                    novas_colunas = ['id', 'produto_lixo', 'produto']
-
-                    df = trata_df_sem_colunas(
-                        df=df,
-                        novas_colunas=novas_colunas,
-                        coluna_eliminar='produto_lixo',
-                        coluna_principal=self.nome_coluna
-                    )
-
-                if self.nome_tabela == 'exportacao' or self.nome_tabela == 'importacao':
-                    dict_final = dataframe_para_json(dataframe=df)
-                else:
-                    dict_final = transformar_em_formato(
-                        json_dados=dataframe_para_json(dataframe=df),
-                        nome_coluna=self.nome_coluna
-                    )
-
-                insercao_dados(
-                    db=db,
-                    dict_final=dict_final,
-                    coluna=self.nome_coluna,
-                    tabela=self.nome_tabela,
-                    super_categoria=link['super_categoria']
+        return df
+
+    def inserir(self, db, df_longo):
+        """Insere na tabela os dados preparados de um dos links.
+
+        Args:
+            db: Sessão do banco de dados.
+            df_longo (pd.DataFrame): Dados retornados por `preparar_dados`.
+
+        Returns:
+            int: Quantidade de linhas inseridas.
+        """
+
+        insercao = insercao_load_data if self.load_data else insercao_dados_em_lote
+
+        return insercao(
+            db=db,
+            registros=df_longo.to_dict(orient='records'),
+            tabela=self.nome_tabela,
+            tamanho_lote=self.tamanho_lote
+        )
+
+    def carregar(self, db, dados_preparados):
+        """Grava na tabela os dados preparados de todos os links, conforme o modo de carga.
+
+        Args:
+            db: Sessão do banco de dados.
+            dados_preparados (Iterable[pd.DataFrame | None]): Retornos de `preparar_dados`, na ordem dos links.
+
+        Returns:
+            dict: Resumo da carga, com o modo e a quantidade de linhas afetadas.
+        """
+
+        try:
+            dados_preparados = self.acompanhar(dados_preparados)
+
+            if self.modo_carga == 'diferencial':
+                dfs_longos = [df_longo for df_longo in dados_preparados if df_longo is not None]
+                df_tabela = pd.concat(dfs_longos, ignore_index=True) if dfs_longos else pd.DataFrame()
+
+                resumo = carga_diferencial(db, df_tabela, self.nome_tabela, tamanho_lote=self.tamanho_lote)
+                return {'modo': self.modo_carga, **resumo}
+
+            if self.modo_carga == 'staging':
+                registros = chain.from_iterable(
+                    df_longo.to_dict(orient='records') for df_longo in dados_preparados if df_longo is not None
+                )
+                inseridas = carga_staging(db, registros, self.nome_tabela, tamanho_lote=self.tamanho_lote)
+                return {'modo': self.modo_carga, 'inseridas': inseridas}
+
+            self.limpar(db)
+
+            inseridas = 0
+            for df_longo in dados_preparados:
+                if df_longo is not None:
+                    inseridas += self.inserir(db, df_longo)
+
+            return {'modo': self.modo_carga, 'inseridas': inseridas}
+        finally:
+            # Mesmo uma carga interrompida pode ter alterado a tabela
+            self.registrar_versao(db)
+
+    def registrar_versao(self, db):
+        """Incrementa a versão da tabela ao final de uma carga (ver `versoes_tabelas`).
+
+        As inserções confirmam as próprias transações, então a versão é gravada em uma transação
+        separada, logo após a última delas.
+
+        Args:
+            db: Sessão do banco de dados.
+        """
+
+        db.rollback()
+        incrementar_versao(self.nome_tabela, db)
+        db.commit()
+
+    def insercoes(self, db, forcar=False):
+        """Realiza as inserções de dados na tabela.
+
+        Todos os arquivos são baixados antes de a tabela ser alterada; se nenhum deles mudou desde
+        a última carga, a tabela é mantida como está.
+
+        Args:
+            db: Sessão do banco de dados.
+            forcar (bool, optional): Se True, recarrega a tabela mesmo sem alterações. Defaults to False.
+
+        Returns:
+            dict: Resumo da carga (ver `carregar`), com 'recarregada' indicando se a tabela foi alterada.
+        """
+
+        with definir_tabela(self.nome_tabela):
+            self.reportar('baixando')
+            arquivos = [self.baixar(link) for link in self.lista_links]
+
+            if not self.precisa_recarregar(arquivos, forcar):
+                self.reportar('inalterada')
+                return {'recarregada': False}
+
+            self.reportar('processando')
+
+            if self.orcamento_memoria is None:
+                dados_preparados = (
+                    self.preparar_dados(arquivo['conteudo'], link['super_categoria'])
+                    for link, arquivo in zip(self.lista_links, arquivos)
+                )
+            else:
+                dados_preparados = chain.from_iterable(
+                    self.preparar_dados_em_blocos(arquivo['conteudo'], link['super_categoria'])
+                    for link, arquivo in zip(self.lista_links, arquivos)
                 )
 
+            resumo = self.carregar(db, dados_preparados)
+
+            self.confirmar(arquivos)
+            self.reportar('concluida')
+
+        return {'recarregada': True, **resumo}
+
+
+URL_BASE = "http://vitibrasil.cnpuv.embrapa.br/index.php"  # URL base do site
+
+CATEGORIAS = {
+    "02": None,  # Produção (sem subcategorias)
+    "03": ["01", "02", "03", "04"],  # Processamento (com subcategorias)
+    "04": None,  # Comercialização (sem subcategorias)
+    "05": ["01", "02", "03", "04", "05"],  # Importação (com subcategorias)
+    "06": ["01", "02", "03", "04"]  # Exportação (com subcategorias)
+}
+
+
+def carregar_tabelas(tarefa, pipeline, forcar, modo, orcamento_memoria_mb):
+    """
+    Busca os arquivos da EMBRAPA e carrega todas as tabelas, informando o andamento à tarefa.
+
+    Args:
+        tarefa (TarefaInicializacao): Tarefa que acompanha a carga.
+        pipeline (bool): Ver `total_processamento`.
+        forcar (bool): Ver `total_processamento`.
+        modo (str): Ver `total_processamento`.
+        orcamento_memoria_mb (int | None): Ver `total_processamento`.
+
+    Returns:
+        dict: Resumo da carga de cada tabela, com a quantidade de linhas afetadas.
+    """
+
+    diretorio_cache = os.environ.get('DIRETORIO_CACHE_CSV')
+    cache = CacheArquivos(diretorio_cache) if diretorio_cache else None
+    cache_urls = None
+
+    if diretorio_cache:
+        validade = float(os.environ.get('VALIDADE_CACHE_URLS', VALIDADE_PADRAO_URLS))
+        cache_urls = CacheUrlsCsv(os.path.join(diretorio_cache, 'urls_csv.json'), validade=validade)
+
+    urls_encontradas = encontrar_urls_csv_concorrente(URL_BASE, CATEGORIAS, cache=cache_urls)
+    lista_json_insercao = criar_lista_json(urls_encontradas)
+
+    iniciadores = [
+        Inicializacao(
+            nome_tabela=element['nome_tabela'],
+            nome_coluna=element['nome_coluna'],
+            drop_column=element['drop_table'],
+            lista_links=element['lista_links'],
+            separador=element['separador'],
+            cache=cache,
+            modo_carga=modo,
+            progresso=tarefa,
+            orcamento_memoria=orcamento_memoria_mb * 1024 * 1024 if orcamento_memoria_mb else None,
+            load_data=LOCAL_INFILE_HABILITADO,
+        )
+        for element in lista_json_insercao
+    ]
+
+    for iniciar in iniciadores:
+        iniciar.reportar()
+
+    db = SessionLocal()
+    try:
+        if pipeline:
+            resumo = insercoes_em_pipeline(iniciadores, db=db, forcar=forcar)
+        else:
+            resumo = {iniciar.nome_tabela: iniciar.insercoes(db=db, forcar=forcar) for iniciar in iniciadores}
+
+        materializar_listagens(db, [iniciar.nome_tabela for iniciar in iniciadores])
+        return resumo
+    finally:
+        db.close()
+
+
+MODELOS_TABELAS = {
+    modelo.__tablename__: modelo
+    for modelo in (models.Producao, models.Processamento, models.Comercializacao, models.Importacao, models.Exportacao)
+}
+
+
+def materializar_listagens(db, nomes_tabelas):
+    """
+    Serializa a listagem padrão das tabelas carregadas, para que as primeiras leituras já a encontrem pronta.
+
+    Tabelas cuja listagem já está montada para a versão atual (ex.: não recarregadas) são ignoradas.
+    Uma falha aqui não interrompe a carga: a listagem é montada na primeira leitura.
+
+    Args:
+        db: Sessão do banco de dados.
+        nomes_tabelas (list[str]): Nomes das tabelas carregadas.
+    """
+
+    if not LISTAGENS_MATERIALIZADAS.habilitado:
+        return
+
+    for nome_tabela in nomes_tabelas:
+        with definir_tabela(nome_tabela), medir_etapa('materializacao_listagem') as contagens:
+            try:
+                paginas = LISTAGENS_MATERIALIZADAS.materializar(db, MODELOS_TABELAS[nome_tabela])
+                if paginas is not None:
+                    contagens['bytes'] = sum(len(corpo) for corpo, _ in paginas.values())
+            except Exception as e:
+                print(e)
+                db.rollback()
+
+
+def salvar_medicao(medicao, status_carga):
+    """
+    Grava na tabela 'ingest_runs' as medições de uma carga, sem interromper a carga em caso de erro.
+
+    Args:
+        medicao (MedicaoIngestao): As medições da carga.
+        status_carga (str): Resultado da carga ('concluida' ou 'erro').
+    """
+
+    db = SessionLocal()
+    try:
+        medicao.salvar(db, status_carga)
+    except Exception as e:
+        print(e)
+        db.rollback()
+    finally:
+        db.close()
+
+
+def executar_inicializacao(tarefa, pipeline=False, forcar=False, modo='truncate', orcamento_memoria_mb=None,
+                           prazo_segundos=None):
+    """
+    Busca os arquivos da EMBRAPA e carrega todas as tabelas, informando o andamento à tarefa.
+
+    Executada em segundo plano, fora do event loop, com uma sessão própria do banco de dados.
+    O tempo, o uso de CPU e memória e as linhas de cada etapa são medidos (ver `MedicaoIngestao`)
+    e gravados na tabela 'ingest_runs' ao final, mesmo que a carga falhe. Todas as requisições ao
+    site da EMBRAPA compartilham as conexões de uma mesma sessão HTTP (ver `usar_sessao`).
+
+    Com prazo, as requisições ao site da EMBRAPA são interrompidas quando ele termina e a carga
+    falha com `PrazoCargaExcedido`. Como cada tabela só é alterada depois que todos os seus arquivos
+    foram baixados, a tabela em andamento e as seguintes mantêm os dados anteriores.
+
+    Args:
+        tarefa (TarefaInicializacao): Tarefa que acompanha a carga.
+        pipeline (bool, optional): Ver `total_processamento`. Defaults to False.
+        forcar (bool, optional): Ver `total_processamento`. Defaults to False.
+        modo (str, optional): Ver `total_processamento`. Defaults to 'truncate'.
+        orcamento_memoria_mb (int, optional): Ver `total_processamento`. Defaults to None.
+        prazo_segundos (float, optional): Ver `total_processamento`. Defaults to None.
+
+    Returns:
+        dict: Resumo da carga de cada tabela, com a quantidade de linhas afetadas.
+    """
+
+    medicao = MedicaoIngestao()
+    tarefa.medicao = medicao
+    status_carga = 'erro'
+
+    try:
+        with medicao.ativar(), medir_etapa('total'), definir_prazo(prazo_segundos), usar_sessao():
+            resultado = carregar_tabelas(tarefa, pipeline, forcar, modo, orcamento_memoria_mb)
+        status_carga = 'concluida'
+
+    finally:
+        salvar_medicao(medicao, status_carga)
+
+    return resultado
 
-@router.get('/inicializacao', status_code=status.HTTP_201_CREATED)
+
+@router.get('/inicializacao', status_code=status.HTTP_202_ACCEPTED)
 async def total_processamento(
-        db: db_dependency
+        pipeline: bool = False,
+        forcar: bool = False,
+        modo: Literal['truncate', 'diferencial', 'staging'] = 'truncate',
+        orcamento_memoria_mb: Annotated[Optional[int], Query(gt=0)] = None,
+        prazo_segundos: Annotated[Optional[int], Query(gt=0)] = None
 ):
     """
-    Inicializa as tabelas do banco de dados com dados de fontes externas.
+    Agenda a inicialização das tabelas do banco de dados com dados de fontes externas.
+
+    A carga é executada em segundo plano; o andamento pode ser consultado em `/inicializacao/{id_tarefa}`.
+
+    Args:
+        pipeline (bool, optional): Se True, sobrepõe downloads, leitura dos arquivos e inserções
+            (ver `insercoes_em_pipeline`). Defaults to False.
+        forcar (bool, optional): Se True, recarrega todas as tabelas mesmo que os arquivos da EMBRAPA
+            não tenham mudado desde a última carga (só tem efeito com DIRETORIO_CACHE_CSV). Defaults to False.
+        modo (str, optional): 'truncate' limpa e recarrega cada tabela; 'diferencial' aplica apenas as
+            inserções, alterações e remoções necessárias; 'staging' carrega uma cópia da tabela e a
+            troca pela original ao final, sem deixar a tabela vazia durante a carga. Defaults to 'truncate'.
+        orcamento_memoria_mb (int, optional): Se informado, cada arquivo é lido e gravado em blocos que
+            ocupam no máximo essa memória, em MB, sem contar os arquivos baixados. Não se aplica ao modo
+            pipeline e não pode ser usado no modo 'diferencial'. Defaults to None.
+        prazo_segundos (int, optional): Tempo máximo, em segundos, para as requisições ao site da EMBRAPA;
+            ao fim dele a carga é interrompida e as tabelas ainda não carregadas mantêm os dados
+            anteriores. Defaults to None (PRAZO_CARGA_SEGUNDOS, se configurada).
+
+    Returns:
+        dict: O identificador e o status da tarefa criada.
+
+    Raises:
+        HTTPException: Com status code 400 se `orcamento_memoria_mb` for informado no modo 'diferencial'.
+    """
+
+    if modo == 'diferencial' and orcamento_memoria_mb is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=ERRO_DIFERENCIAL_COM_ORCAMENTO)
+
+    if prazo_segundos is None and os.environ.get('PRAZO_CARGA_SEGUNDOS'):
+        prazo_segundos = float(os.environ['PRAZO_CARGA_SEGUNDOS'])
+
+    tarefa = iniciar_tarefa(
+        executar_inicializacao, pipeline=pipeline, forcar=forcar, modo=modo, orcamento_memoria_mb=orcamento_memoria_mb,
+        prazo_segundos=prazo_segundos
+    )
+
+    return {'id': tarefa.id, 'status': tarefa.status}
+
+
+@router.get('/inicializacao/execucoes', status_code=status.HTTP_200_OK)
+async def execucoes_inicializacao(db: db_dependency, limite: Annotated[int, Query(gt=0, le=500)] = 20):
+    """
+    Lista as medições das últimas cargas, gravadas na tabela 'ingest_runs'.
 
     Args:
         db: Sessão do banco de dados.
+        limite (int, optional): Quantidade máxima de cargas retornadas. Defaults to 20.
+
+    Returns:
+        list[dict]: Para cada carga, da mais recente para a mais antiga, o status e, por etapa e tabela,
+            o tempo total, o tempo de CPU, os bytes, as linhas de entrada e saída e o pico de memória.
+    """
+
+    return listar_execucoes(db, limite=limite)
+
+
+@router.get('/inicializacao/cache', status_code=status.HTTP_200_OK)
+async def estatisticas_cache():
+    """
+    Retorna os contadores dos caches das rotas de leitura das tabelas.
+
+    Returns:
+        dict: Em 'consultas', os acertos, falhas e itens do cache de consultas (`CacheConsultas`);
+            em 'compressao', os do cache das respostas comprimidas (`CacheCompressao`); em 'listagens',
+            as páginas serializadas de cada tabela (`ListagensMaterializadas`).
+    """
+
+    return {
+        'consultas': CACHE_CONSULTAS.estatisticas(),
+        'compressao': CACHE_COMPRESSAO.estatisticas(),
+        'listagens': LISTAGENS_MATERIALIZADAS.estatisticas(),
+    }
+
+
+@router.get('/inicializacao/{id_tarefa}', status_code=status.HTTP_200_OK)
+async def status_inicializacao(id_tarefa: str):
+    """
+    Consulta o andamento de uma inicialização agendada.
+
+    Args:
+        id_tarefa (str): Identificador retornado por `/inicializacao`.
+
+    Returns:
+        dict: Status da tarefa e, por tabela, a etapa, as linhas processadas e o tempo decorrido.
 
     Raises:
-        HTTPException: Com status code 500 se houver um erro durante a inicialização.
+        HTTPException: Com status code 404 se a tarefa não existir.
     """
 
-    try:
-        url_base = "http://vitibrasil.cnpuv.embrapa.br/index.php"  # URL base do site
-
-        categorias = {
-            "02": None,  # Produção (sem subcategorias)
-            "03": ["01", "02", "03", "04"],  # Processamento (com subcategorias)
-            "04": None,  # Comercialização (sem subcategorias)
-            "05": ["01", "02", "03", "04", "05"],  # Importação (com subcategorias)
-            "06": ["01", "02", "03", "04"]  # Exportação (com subcategorias)
-        }
-
-        urls_encontradas = encontrar_urls_csv(url_base, categorias)
-        lista_json_insercao = criar_lista_json(urls_encontradas)
-
-        for element in lista_json_insercao:
-            iniciar = Inicializacao(
-                nome_tabela=element['nome_tabela'],
-                nome_coluna=element['nome_coluna'],
-                drop_column=element['drop_table'],
-                lista_links=element['lista_links'],
-                separador=element['separador'],
-            )
+    tarefa = obter_tarefa(id_tarefa)
 
-            iniciar.insercoes(db=db)
+    if tarefa is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Tarefa não encontrada')
 
-    except Exception as e:
-        print(e)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Erro ao obter os dados ou inserir {e}"
-        )
+    return tarefa.para_dict()
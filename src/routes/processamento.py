@@ -1,5 +1,5 @@
 import os
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import Annotated
 
@@ -8,6 +8,13 @@ from src.models.models_db import Processamento
 from src.dependencies.database import SessionLocal
 from src.models.api.model_processamento_api import ProcessamentoBase, ProcessamentoInsert
 from src.services.authentication import get_current_user
+from src.services.cache_consultas import CACHE_CONSULTAS, normalizar
+from src.services.listagens_materializadas import LISTAGENS_MATERIALIZADAS, resposta_materializada
+from src.services.paginacao import LIMITE_PADRAO, CursorPagina, LimitePagina
+from src.services.paginacao import consultar_pagina, decodificar_cursor, informar_proximo_cursor
+from src.services.projecao import CamposProjecao, campos_projecao, listar_projecao, projetar, serializar_projecao
+from src.services.respostas_streaming import CabecalhoAccept, formato_streaming, resposta_streaming
+from src.services.versoes_tabelas import atualizar_versoes, incrementar_versao, versionar
 
 
 router = APIRouter(
@@ -27,12 +34,14 @@ def get_db():
 
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[Session, Depends(get_current_user)]
+versao_dependency = Depends(versionar('processamento', get_db))
 
 
-@router.get('/processamento/{id_process}', status_code=status.HTTP_200_OK)
+@router.get('/processamento/{id_process}', status_code=status.HTTP_200_OK, dependencies=[versao_dependency])
 async def processamento_id(
         id_process: int,
-        db: db_dependency
+        db: db_dependency,
+        fields: CamposProjecao = None
 ):
     """
     Obtém um item da tabela de processamento pelo ID.
@@ -40,13 +49,20 @@ async def processamento_id(
     Args:
         id_process (int): O ID do processamento.
         db: Sessão do banco de dados.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
         Exportação: O objeto Exportacao correspondente ao ID,
             ou gera HTTP_404_NOT_FOUND se não encontrado.
     """
 
-    processamento = db.query(models.Processamento).filter(models.Processamento.id == id_process).first()
+    campos = campos_projecao(models.Processamento, fields)
+
+    query = db.query(models.Processamento).filter(models.Processamento.id == id_process)
+    processamento = CACHE_CONSULTAS.consultar(
+        'processamento', 'item', normalizar(id=id_process, campos=campos),
+        lambda: serializar_projecao(projetar(query, models.Processamento, campos).first(), campos)
+    )
 
     if processamento is None:
         raise HTTPException(status_code=404, detail=os.environ.get('ERRO_404'))
@@ -54,26 +70,64 @@ async def processamento_id(
     return processamento
 
 
-@router.get('/processamento', status_code=status.HTTP_200_OK)
+@router.get('/processamento', status_code=status.HTTP_200_OK, dependencies=[versao_dependency])
 async def total_processamento(
-        db: db_dependency
+        db: db_dependency,
+        response: Response,
+        limit: LimitePagina = LIMITE_PADRAO,
+        after: CursorPagina = None,
+        accept: CabecalhoAccept = None,
+        fields: CamposProjecao = None
 ):
     """
-    Obtém todos os dados da tabela de processamento.
+    Obtém os dados da tabela de processamento, paginados pelo ID.
+
+    O cursor da próxima página é retornado no cabeçalho X-Proximo-Cursor, e deve ser
+    informado em `after` para obtê-la. Na última página o cabeçalho não é enviado.
+
+    Com `Accept: application/x-ndjson` ou `Accept: text/csv` a tabela inteira (a partir de `after`,
+    se informado) é enviada em streaming, lida e serializada em lotes.
+
+    As páginas da listagem padrão (sem `limit` e `fields`) são serializadas uma única vez por versão
+    da tabela e retornadas prontas (ver `ListagensMaterializadas`).
 
     Args:
         db: Sessão do banco de dados.
+        response (Response): A resposta, onde é informado o cursor da próxima página.
+        limit (int, optional): Quantidade máxima de linhas (até LIMITE_MAXIMO). Defaults to LIMITE_PADRAO.
+        after (str, optional): Cursor da página anterior. Defaults to None (primeira página).
+        accept (str, optional): O cabeçalho Accept da requisição. Defaults to None.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
-        list[Processamento]: Uma lista de objetos Processamento.
+        list[Processamento]: Uma lista de objetos Processamento, ordenada pelo ID,
+            ou StreamingResponse com a tabela em NDJSON ou CSV.
 
     Raises:
+        HTTPException: Com status code 400 se o cursor ou os campos forem inválidos.
         HTTPException: Com status code 500 se houver um erro ao obter os dados.
     """
 
+    ultimo_id = decodificar_cursor(after)
+    campos = campos_projecao(models.Processamento, fields)
+
+    formato = formato_streaming(accept)
+    if formato is not None:
+        return resposta_streaming(db, models.Processamento, formato, response, ultimo_id, campos)
+
     try:
-        # retorna todas as linhas da tabela
-        return db.query(models.Processamento).all()
+        # páginas da listagem padrão saem prontas, serializadas uma vez por versão da tabela
+        pagina = LISTAGENS_MATERIALIZADAS.pagina(db, models.Processamento, limit, ultimo_id, campos)
+        if pagina is not None:
+            return resposta_materializada(pagina, response)
+
+        # retorna uma página da tabela, a partir do último ID da página anterior
+        linhas, proximo_cursor = CACHE_CONSULTAS.consultar(
+            'processamento', 'pagina', normalizar(limite=limit, ultimo_id=ultimo_id, campos=campos),
+            lambda: consultar_pagina(db, models.Processamento, limit, ultimo_id, campos)
+        )
+        informar_proximo_cursor(response, proximo_cursor)
+        return linhas
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail="Erro ao obter os dados da tabela")
@@ -82,7 +136,8 @@ async def total_processamento(
 @router.post('/processamento/filtragem')
 async def filtrar_processamento(
         processamento: ProcessamentoBase,
-        db: db_dependency
+        db: db_dependency,
+        fields: CamposProjecao = None
 ):
     """
     Filtra dados da tabela de processamento com base nos critérios fornecidos.
@@ -98,14 +153,18 @@ async def filtrar_processamento(
             * ano (str, optional): Ano dos dados.
             * valor_processamento (float, optional): Valor processado.
         db: Sessão do banco de dados.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
         list[Processamento]: Uma lista de objetos Processamento que correspondem aos filtros.
 
     Raises:
+        HTTPException: Com status code 400 se os campos forem inválidos.
         HTTPException: Com status code 500 se houver um erro ao filtrar os dados.
     """
 
+    campos = campos_projecao(models.Processamento, fields)
+
     try:
         query = db.query(models.Processamento)
 
@@ -133,8 +192,14 @@ async def filtrar_processamento(
         if processamento.valor_producao is not None:
             query = query.filter(models.Processamento.valor_processamento == processamento.valor_processamento)
 
+        # As versões são relidas aqui, já que a filtragem não tem ETag (ver `versionar`)
+        atualizar_versoes(db)
+
         # Executa a consulta e retorna os resultados
-        return query.all()
+        return CACHE_CONSULTAS.consultar(
+            'processamento', 'filtragem', normalizar(filtros=processamento, campos=campos),
+            lambda: listar_projecao(query, models.Processamento, campos)
+        )
 
     except Exception as e:
         print(e)
@@ -176,6 +241,7 @@ async def insere_processamento(
     )
 
     db.add(create_processamento_model)
+    incrementar_versao('processamento', db)
     db.commit()
 
     db.refresh(create_processamento_model)
@@ -223,6 +289,8 @@ async def altera_processamento(
     processamento_model.ano = processamento.ano
     processamento_model.valor_processamento = processamento.valor_processamento
 
+    incrementar_versao('processamento', db)
+
     # Realiza o commit para persistir as alterações no banco de dados
     db.commit()
 
@@ -257,6 +325,8 @@ async def deleta_processamento(
 
     db.delete(comercializacao_model)
 
+    incrementar_versao('processamento', db)
+
     # Realiza o commit para persistir as alterações no banco de dados
     db.commit()
 
@@ -1,6 +1,6 @@
 import os
 
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import Annotated
 
@@ -9,6 +9,13 @@ from src.models.models_db import Producao
 from src.dependencies.database import SessionLocal
 from src.models.api.model_producao_api import ProducaoBase, ProducaoInsert
 from src.services.authentication import get_current_user
+from src.services.cache_consultas import CACHE_CONSULTAS, normalizar
+from src.services.listagens_materializadas import LISTAGENS_MATERIALIZADAS, resposta_materializada
+from src.services.paginacao import LIMITE_PADRAO, CursorPagina, LimitePagina
+from src.services.paginacao import consultar_pagina, decodificar_cursor, informar_proximo_cursor
+from src.services.projecao import CamposProjecao, campos_projecao, listar_projecao, projetar, serializar_projecao
+from src.services.respostas_streaming import CabecalhoAccept, formato_streaming, resposta_streaming
+from src.services.versoes_tabelas import atualizar_versoes, incrementar_versao, versionar
 
 
 router = APIRouter(
@@ -28,12 +35,14 @@ def get_db():
 
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[Session, Depends(get_current_user)]
+versao_dependency = Depends(versionar('producao', get_db))
 
 
-@router.get('/producao/{id_prod}', status_code=status.HTTP_200_OK)
+@router.get('/producao/{id_prod}', status_code=status.HTTP_200_OK, dependencies=[versao_dependency])
 async def producao_id(
         id_prod: int,
-        db: db_dependency
+        db: db_dependency,
+        fields: CamposProjecao = None
 ):
     """
     Obtém um item da tabela de producao pelo ID.
@@ -41,13 +50,20 @@ async def producao_id(
     Args:
         id_process (int): O ID de producao.
         db: Sessão do banco de dados.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
         Exportação: O objeto Exportacao correspondente ao ID,
             ou gera HTTP_404_NOT_FOUND se não encontrado.
     """
 
-    producao = db.query(models.Producao).filter(models.Producao.id == id_prod).first()
+    campos = campos_projecao(models.Producao, fields)
+
+    query = db.query(models.Producao).filter(models.Producao.id == id_prod)
+    producao = CACHE_CONSULTAS.consultar(
+        'producao', 'item', normalizar(id=id_prod, campos=campos),
+        lambda: serializar_projecao(projetar(query, models.Producao, campos).first(), campos)
+    )
 
     if producao is None:
         raise HTTPException(status_code=404, detail=os.environ.get('ERRO_404'))
@@ -55,27 +71,64 @@ async def producao_id(
     return producao
 
 
-@router.get('/producao', status_code=status.HTTP_200_OK)
+@router.get('/producao', status_code=status.HTTP_200_OK, dependencies=[versao_dependency])
 async def total_producao(
-        db: db_dependency
+        db: db_dependency,
+        response: Response,
+        limit: LimitePagina = LIMITE_PADRAO,
+        after: CursorPagina = None,
+        accept: CabecalhoAccept = None,
+        fields: CamposProjecao = None
 ):
     """
-    Obtém todos os dados da tabela de producao.
+    Obtém os dados da tabela de producao, paginados pelo ID.
+
+    O cursor da próxima página é retornado no cabeçalho X-Proximo-Cursor, e deve ser
+    informado em `after` para obtê-la. Na última página o cabeçalho não é enviado.
+
+    Com `Accept: application/x-ndjson` ou `Accept: text/csv` a tabela inteira (a partir de `after`,
+    se informado) é enviada em streaming, lida e serializada em lotes.
+
+    As páginas da listagem padrão (sem `limit` e `fields`) são serializadas uma única vez por versão
+    da tabela e retornadas prontas (ver `ListagensMaterializadas`).
 
     Args:
         db: Sessão do banco de dados.
+        response (Response): A resposta, onde é informado o cursor da próxima página.
+        limit (int, optional): Quantidade máxima de linhas (até LIMITE_MAXIMO). Defaults to LIMITE_PADRAO.
+        after (str, optional): Cursor da página anterior. Defaults to None (primeira página).
+        accept (str, optional): O cabeçalho Accept da requisição. Defaults to None.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
-        list[Producao]: Uma lista de objetos Producao.
+        list[Producao]: Uma lista de objetos Producao, ordenada pelo ID,
+            ou StreamingResponse com a tabela em NDJSON ou CSV.
 
     Raises:
+        HTTPException: Com status code 400 se o cursor ou os campos forem inválidos.
         HTTPException: Com status code 500 se houver um erro ao obter os dados.
     """
 
+    ultimo_id = decodificar_cursor(after)
+    campos = campos_projecao(models.Producao, fields)
+
+    formato = formato_streaming(accept)
+    if formato is not None:
+        return resposta_streaming(db, models.Producao, formato, response, ultimo_id, campos)
+
     try:
-        # retorna todas as linhas da tabela
-        producoes = db.query(models.Producao).all()
-        return producoes
+        # páginas da listagem padrão saem prontas, serializadas uma vez por versão da tabela
+        pagina = LISTAGENS_MATERIALIZADAS.pagina(db, models.Producao, limit, ultimo_id, campos)
+        if pagina is not None:
+            return resposta_materializada(pagina, response)
+
+        # retorna uma página da tabela, a partir do último ID da página anterior
+        linhas, proximo_cursor = CACHE_CONSULTAS.consultar(
+            'producao', 'pagina', normalizar(limite=limit, ultimo_id=ultimo_id, campos=campos),
+            lambda: consultar_pagina(db, models.Producao, limit, ultimo_id, campos)
+        )
+        informar_proximo_cursor(response, proximo_cursor)
+        return linhas
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail="Erro ao obter os dados da tabela")
@@ -84,7 +137,8 @@ async def total_producao(
 @router.post('/producao/filtragem')
 async def filtrar_producao(
         producao: ProducaoBase,
-        db: db_dependency
+        db: db_dependency,
+        fields: CamposProjecao = None
 ):
     """
     Filtra dados da tabela de producao com base nos critérios fornecidos.
@@ -99,14 +153,18 @@ async def filtrar_producao(
             * ano (str, optional): Ano dos dados.
             * valor_producao (float, optional): Valor de producao.
         db: Sessão do banco de dados.
+        fields (str, optional): Colunas retornadas, separadas por vírgula. Defaults to None (todas).
 
     Returns:
         list[Producao]: Uma lista de objetos Producao que correspondem aos filtros.
 
     Raises:
+        HTTPException: Com status code 400 se os campos forem inválidos.
         HTTPException: Com status code 500 se houver um erro ao filtrar os dados.
     """
 
+    campos = campos_projecao(models.Producao, fields)
+
     try:
         query = db.query(models.Producao)
 
@@ -130,8 +188,14 @@ async def filtrar_producao(
         if producao.valor_producao is not None:
             query = query.filter(models.Producao.valor_producao == producao.valor_producao)
 
+        # As versões são relidas aqui, já que a filtragem não tem ETag (ver `versionar`)
+        atualizar_versoes(db)
+
         # Executa a consulta e retorna os resultados
-        return query.all()
+        return CACHE_CONSULTAS.consultar(
+            'producao', 'filtragem', normalizar(filtros=producao, campos=campos),
+            lambda: listar_projecao(query, models.Producao, campos)
+        )
 
     except Exception as e:
         print(e)
@@ -171,6 +235,7 @@ async def insere_producao(
     )
 
     db.add(create_producao_model)
+    incrementar_versao('producao', db)
     db.commit()
 
     db.refresh(create_producao_model)
@@ -215,6 +280,8 @@ async def altera_producao(
     producao_model.ano = producao.ano
     producao_model.valor_producao = producao.valor_producao
 
+    incrementar_versao('producao', db)
+
     # Realiza o commit para persistir as alterações no banco de dados
     db.commit()
 
@@ -248,6 +315,8 @@ async def deleta_producao(
 
     db.delete(comercializacao_model)
 
+    incrementar_versao('producao', db)
+
     # Realiza o commit para persistir as alterações no banco de dados
     db.commit()
 
@@ -0,0 +1,195 @@
+"""
+Cache, na memória do processo, das consultas das rotas de leitura das tabelas.
+
+As tabelas da EMBRAPA mudam apenas nas cargas e nas rotas de escrita, então o resultado de uma
+consulta pode ser reaproveitado enquanto a versão da tabela (ver `versoes_tabelas`) não mudar. Cada
+item é identificado pela tabela, pela versão, pela operação ('item', 'pagina' ou 'filtragem') e pelos
+parâmetros normalizados; ao mudar a versão, os itens da tabela deixam de ser usados e são descartados.
+O tamanho é limitado pelo total de linhas guardadas (os menos usados saem primeiro) e cada item
+expira após `TTL_CACHE_CONSULTAS` segundos (0 desativa o cache).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+
+from src.services.versoes_tabelas import versao_tabela
+
+
+TTL_CACHE_CONSULTAS = float(os.environ.get('TTL_CACHE_CONSULTAS', 300))
+MAXIMO_LINHAS_CACHE_CONSULTAS = int(os.environ.get('MAXIMO_LINHAS_CACHE_CONSULTAS', 200_000))
+
+# Distingue um item ausente de um resultado None guardado (ex.: ID inexistente)
+AUSENTE = object()
+
+
+def contar_linhas(valor):
+    """Peso de um item do cache: a quantidade de linhas guardadas (no mínimo 1)."""
+    if isinstance(valor, list):
+        # Resultado de uma página: [linhas, próximo cursor]
+        if len(valor) == 2 and isinstance(valor[0], list):
+            return max(len(valor[0]), 1)
+        return max(len(valor), 1)
+    return 1
+
+
+class CacheConsultas:
+    """
+    Cache LRU com expiração (TTL) dos resultados das consultas às tabelas.
+
+    Attributes:
+        acertos (int): Consultas respondidas pelo cache.
+        falhas (int): Consultas que precisaram ir ao banco.
+        descartes (int): Itens removidos por tamanho, expiração ou mudança de versão.
+    """
+
+    def __init__(self, ttl: float = TTL_CACHE_CONSULTAS, maximo_linhas: int = MAXIMO_LINHAS_CACHE_CONSULTAS,
+                 relogio=time.monotonic):
+        self.ttl = ttl
+        self.maximo_linhas = maximo_linhas
+        self.relogio = relogio
+        self.itens = OrderedDict()
+        self.chaves_tabela = {}
+        self.versoes_vistas = {}
+        self.total_linhas = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+        self.trava = threading.Lock()
+
+    @property
+    def habilitado(self):
+        return self.ttl > 0 and self.maximo_linhas > 0
+
+    def _remover(self, chave):
+        _, linhas, _ = self.itens.pop(chave)
+        self.chaves_tabela[chave[0]].discard(chave)
+        self.total_linhas -= linhas
+        self.descartes += 1
+
+    def _descartar_versoes_antigas(self, tabela, versao):
+        if self.versoes_vistas.get(tabela) == versao:
+            return
+        for chave in list(self.chaves_tabela.get(tabela, ())):
+            if chave[1] != versao:
+                self._remover(chave)
+        self.versoes_vistas[tabela] = versao
+
+    def obter(self, chave):
+        """Retorna o valor guardado para a chave, ou AUSENTE se não houver (ou tiver expirado)."""
+        tabela, versao = chave[0], chave[1]
+
+        with self.trava:
+            self._descartar_versoes_antigas(tabela, versao)
+
+            item = self.itens.get(chave)
+            if item is None or item[2] <= self.relogio():
+                if item is not None:
+                    self._remover(chave)
+                self.falhas += 1
+                return AUSENTE
+
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def guardar(self, chave, valor):
+        linhas = contar_linhas(valor)
+        if linhas > self.maximo_linhas:
+            return
+
+        with self.trava:
+            # Não guarda resultados de uma versão que já foi substituída durante a consulta
+            if chave[1] != versao_tabela(chave[0]):
+                return
+
+            if chave in self.itens:
+                self._remover(chave)
+
+            self.itens[chave] = (valor, linhas, self.relogio() + self.ttl)
+            self.chaves_tabela.setdefault(chave[0], set()).add(chave)
+            self.total_linhas += linhas
+
+            while self.total_linhas > self.maximo_linhas:
+                self._remover(next(iter(self.itens)))
+
+    def consultar(self, tabela, operacao, parametros, consulta):
+        """Retorna o resultado de uma consulta, buscando no banco apenas se ele não estiver no cache.
+
+        O resultado é guardado já convertido por `jsonable_encoder` (dicionários, listas e valores
+        simples), de modo que nenhum objeto ORM é compartilhado entre requisições.
+
+        Args:
+            tabela (str): Nome da tabela consultada.
+            operacao (str): Tipo da consulta ('item', 'pagina' ou 'filtragem').
+            parametros (tuple): Parâmetros da consulta, normalizados (ver `normalizar`).
+            consulta (Callable): Executa a consulta no banco.
+
+        Returns:
+            O resultado da consulta, convertido por `jsonable_encoder`.
+        """
+        if not self.habilitado:
+            return jsonable_encoder(consulta())
+
+        # A versão é lida antes da consulta: se a tabela mudar durante a leitura, o item já nasce antigo
+        chave = (tabela, versao_tabela(tabela), operacao, parametros)
+
+        valor = self.obter(chave)
+        if valor is AUSENTE:
+            valor = jsonable_encoder(consulta())
+            self.guardar(chave, valor)
+
+        return valor
+
+    def estatisticas(self):
+        """Retorna os contadores do cache.
+
+        Returns:
+            dict: Acertos, falhas, taxa de acertos, descartes, itens e linhas guardadas.
+        """
+        with self.trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'habilitado': self.habilitado,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acertos': round(self.acertos / consultas, 4) if consultas else None,
+                'descartes': self.descartes,
+                'itens': len(self.itens),
+                'linhas': self.total_linhas,
+                'maximo_linhas': self.maximo_linhas,
+                'ttl_segundos': self.ttl,
+            }
+
+    def limpar(self):
+        with self.trava:
+            self.itens.clear()
+            self.chaves_tabela.clear()
+            self.versoes_vistas.clear()
+            self.total_linhas = 0
+
+
+CACHE_CONSULTAS = CacheConsultas()
+
+
+def normalizar(**parametros):
+    """Normaliza os parâmetros de uma consulta para uso na chave do cache.
+
+    Valores None são ignorados, listas viram tuplas e modelos pydantic viram os seus campos
+    preenchidos, de modo que consultas equivalentes tenham a mesma chave.
+
+    Returns:
+        tuple: Os pares (nome, valor), ordenados pelo nome.
+    """
+    normalizados = []
+    for nome, valor in sorted(parametros.items()):
+        if hasattr(valor, 'dict'):
+            valor = normalizar(**valor.dict())
+        elif isinstance(valor, list):
+            valor = tuple(valor)
+        if valor is not None and valor != ():
+            normalizados.append((nome, valor))
+
+    return tuple(normalizados)
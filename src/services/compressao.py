@@ -0,0 +1,331 @@
+"""
+Compressão negociada (Accept-Encoding) das respostas da API.
+
+As listagens das tabelas são muito repetitivas (países, categorias e anos) e costumam encolher mais de
+10 vezes. São usados zstd e brotli quando os pacotes `zstandard` e `brotli` estão instalados, e gzip
+sempre. Respostas menores que `TAMANHO_MINIMO_COMPRESSAO` são enviadas sem compressão, e corpos
+maiores que `LIMITE_COMPRESSAO_NO_LOOP` são comprimidos em uma thread, sem bloquear o event loop.
+"""
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from anyio.to_thread import run_sync
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # dependência opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # dependência opcional
+    zstandard = None
+
+
+TAMANHO_MINIMO_COMPRESSAO = int(os.environ.get('TAMANHO_MINIMO_COMPRESSAO', 1024))
+LIMITE_COMPRESSAO_NO_LOOP = 64 * 1024
+MAXIMO_BYTES_CACHE_COMPRESSAO = int(os.environ.get('MAXIMO_BYTES_CACHE_COMPRESSAO', 64 * 1024 * 1024))
+
+NIVEL_GZIP = 6
+NIVEL_BROTLI = 5
+NIVEL_ZSTD = 6
+
+TIPOS_COMPRESSIVEIS = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def codificacoes_disponiveis():
+    """Retorna as codificações suportadas, da preferida para a menos preferida.
+
+    Returns:
+        list[str]: Entre 'zstd', 'br' e 'gzip', conforme os pacotes instalados.
+    """
+    return [
+        codificacao for codificacao, disponivel in (('zstd', zstandard), ('br', brotli), ('gzip', True)) if disponivel
+    ]
+
+
+def escolher_codificacao(accept_encoding: Optional[str], disponiveis=None) -> Optional[str]:
+    """Escolhe a codificação da resposta a partir do cabeçalho Accept-Encoding.
+
+    Vence a codificação com o maior `q` informado pelo cliente; em caso de empate, a preferida
+    do servidor (ver `codificacoes_disponiveis`). Codificações com `q=0` nunca são usadas.
+
+    Args:
+        accept_encoding (str | None): O cabeçalho Accept-Encoding da requisição.
+        disponiveis (list[str], optional): Codificações suportadas. Defaults to None (`codificacoes_disponiveis`).
+
+    Returns:
+        str | None: A codificação escolhida, ou None para enviar a resposta sem compressão.
+    """
+    disponiveis = codificacoes_disponiveis() if disponiveis is None else disponiveis
+
+    pesos = {}
+    for item in (accept_encoding or '').split(','):
+        nome, _, parametros = item.strip().partition(';')
+        nome = nome.strip().lower()
+        peso = 1.0
+        parametros = parametros.strip().lower()
+        if parametros.startswith('q='):
+            try:
+                peso = float(parametros[2:])
+            except ValueError:
+                peso = 0.0
+        if nome:
+            pesos[nome] = peso
+
+    candidatas = [
+        (pesos.get(codificacao, pesos.get('*', 0.0)), -ordem, codificacao)
+        for ordem, codificacao in enumerate(disponiveis)
+    ]
+    candidatas = [candidata for candidata in candidatas if candidata[0] > 0]
+
+    return max(candidatas)[2] if candidatas else None
+
+
+def comprimir(corpo: bytes, codificacao: str) -> bytes:
+    """Comprime um corpo inteiro.
+
+    Args:
+        corpo (bytes): O corpo da resposta.
+        codificacao (str): 'zstd', 'br' ou 'gzip'.
+
+    Returns:
+        bytes: O corpo comprimido.
+    """
+    if codificacao == 'zstd':
+        return zstandard.ZstdCompressor(level=NIVEL_ZSTD).compress(corpo)
+    if codificacao == 'br':
+        return brotli.compress(corpo, quality=NIVEL_BROTLI)
+
+    compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+    return compressor.compress(corpo) + compressor.flush()
+
+
+class CompressorIncremental:
+    """
+    Comprime uma resposta em streaming, bloco a bloco.
+
+    Cada bloco é descarregado (flush) assim que é comprimido, para que o cliente receba as
+    linhas sem esperar o fim da resposta.
+    """
+
+    def __init__(self, codificacao: str):
+        self.codificacao = codificacao
+
+        if codificacao == 'zstd':
+            self.compressor = zstandard.ZstdCompressor(level=NIVEL_ZSTD).compressobj()
+        elif codificacao == 'br':
+            self.compressor = brotli.Compressor(quality=NIVEL_BROTLI)
+        else:
+            self.compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+
+    def comprimir(self, bloco: bytes) -> bytes:
+        if self.codificacao == 'zstd':
+            return self.compressor.compress(bloco) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.codificacao == 'br':
+            return self.compressor.process(bloco) + self.compressor.flush()
+        return self.compressor.compress(bloco) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self) -> bytes:
+        if self.codificacao == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+class CacheCompressao:
+    """
+    Guarda os corpos já comprimidos das respostas identificadas por um ETag.
+
+    Uma resposta com ETag forte tem sempre os mesmos bytes para a mesma URL, então o resultado da
+    compressão pode ser reaproveitado até o ETag mudar (ex.: quando a versão dos dados da tabela
+    muda). Os itens menos usados são descartados quando o total ultrapassa `maximo_bytes`.
+    """
+
+    def __init__(self, maximo_bytes: int = MAXIMO_BYTES_CACHE_COMPRESSAO):
+        self.maximo_bytes = maximo_bytes
+        self.itens = OrderedDict()
+        self.total_bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.trava = threading.Lock()
+
+    def obter(self, chave):
+        with self.trava:
+            corpo = self.itens.get(chave)
+            if corpo is None:
+                self.falhas += 1
+                return None
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return corpo
+
+    def guardar(self, chave, corpo: bytes):
+        if len(corpo) > self.maximo_bytes:
+            return
+
+        with self.trava:
+            anterior = self.itens.pop(chave, None)
+            if anterior is not None:
+                self.total_bytes -= len(anterior)
+
+            self.itens[chave] = corpo
+            self.total_bytes += len(corpo)
+
+            while self.total_bytes > self.maximo_bytes:
+                _, removido = self.itens.popitem(last=False)
+                self.total_bytes -= len(removido)
+
+    def estatisticas(self):
+        """Retorna os contadores do cache.
+
+        Returns:
+            dict: Acertos, falhas, itens e bytes guardados.
+        """
+        with self.trava:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'itens': len(self.itens),
+                'bytes': self.total_bytes,
+                'maximo_bytes': self.maximo_bytes,
+            }
+
+    def limpar(self):
+        with self.trava:
+            self.itens.clear()
+            self.total_bytes = 0
+
+
+CACHE_COMPRESSAO = CacheCompressao()
+
+
+def compressivel(cabecalhos: Headers) -> bool:
+    """Indica se a resposta pode ser comprimida, pelo tipo do conteúdo e pela ausência de Content-Encoding."""
+    tipo = cabecalhos.get('content-type', '')
+    return 'content-encoding' not in cabecalhos and tipo.startswith(TIPOS_COMPRESSIVEIS)
+
+
+class CompressaoMiddleware:
+    """
+    Middleware ASGI que comprime as respostas conforme o Accept-Encoding da requisição.
+
+    Respostas completas são comprimidas de uma vez, e as com ETag forte têm o resultado guardado em
+    `CacheCompressao`; respostas em streaming (`StreamingResponse`) são comprimidas bloco a bloco.
+    Ao comprimir, o ETag passa a ser fraco (`W/"..."`), já que os bytes enviados mudam com a codificação.
+    """
+
+    def __init__(self, app, tamanho_minimo: int = TAMANHO_MINIMO_COMPRESSAO,
+                 limite_no_loop: int = LIMITE_COMPRESSAO_NO_LOOP, cache: CacheCompressao = CACHE_COMPRESSAO):
+        self.app = app
+        self.tamanho_minimo = tamanho_minimo
+        self.limite_no_loop = limite_no_loop
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        codificacao = escolher_codificacao(Headers(scope=scope).get('accept-encoding'))
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+
+        await RespostaComprimida(self, scope, codificacao)(receive, send)
+
+
+class RespostaComprimida:
+    """Estado da compressão de uma resposta (ver `CompressaoMiddleware`)."""
+
+    def __init__(self, middleware: CompressaoMiddleware, scope, codificacao: str):
+        self.middleware = middleware
+        self.scope = scope
+        self.codificacao = codificacao
+        self.send = None
+        self.mensagem_inicial = None
+        self.repassar = False
+        self.compressor = None
+
+    async def __call__(self, receive, send):
+        self.send = send
+        await self.middleware.app(self.scope, receive, self.enviar)
+
+    async def executar(self, funcao, corpo, *args):
+        """Executa a compressão em uma thread quando o corpo é grande."""
+        if len(corpo) > self.middleware.limite_no_loop:
+            return await run_sync(funcao, corpo, *args)
+        return funcao(corpo, *args)
+
+    def ajustar_cabecalhos(self, tamanho=None):
+        cabecalhos = MutableHeaders(raw=self.mensagem_inicial['headers'])
+        cabecalhos['Content-Encoding'] = self.codificacao
+        cabecalhos.add_vary_header('Accept-Encoding')
+
+        if tamanho is None:
+            del cabecalhos['Content-Length']
+        else:
+            cabecalhos['Content-Length'] = str(tamanho)
+
+        etag = cabecalhos.get('etag')
+        if etag and not etag.startswith('W/'):
+            cabecalhos['ETag'] = f'W/{etag}'
+
+    async def enviar(self, mensagem):
+        if mensagem['type'] == 'http.response.start':
+            # Os cabeçalhos só são enviados quando se sabe se o corpo será comprimido
+            self.mensagem_inicial = mensagem
+            cabecalhos = Headers(raw=mensagem['headers'])
+            self.repassar = mensagem['status'] in (204, 304) or not compressivel(cabecalhos)
+            return
+
+        if mensagem['type'] != 'http.response.body' or self.repassar:
+            if self.mensagem_inicial is not None:
+                await self.send(self.mensagem_inicial)
+                self.mensagem_inicial = None
+            await self.send(mensagem)
+            return
+
+        corpo = mensagem.get('body', b'')
+        continua = mensagem.get('more_body', False)
+
+        if self.compressor is None and not continua:
+            await self.enviar_completa(mensagem, corpo)
+            return
+
+        if self.compressor is None:
+            # Primeiro bloco de uma resposta em streaming
+            self.compressor = CompressorIncremental(self.codificacao)
+            self.ajustar_cabecalhos()
+            await self.send(self.mensagem_inicial)
+            self.mensagem_inicial = None
+
+        bloco = await self.executar(self.compressor.comprimir, corpo)
+        if not continua:
+            bloco += self.compressor.finalizar()
+
+        await self.send({'type': 'http.response.body', 'body': bloco, 'more_body': continua})
+
+    async def enviar_completa(self, mensagem, corpo):
+        if len(corpo) < self.middleware.tamanho_minimo:
+            await self.send(self.mensagem_inicial)
+            await self.send(mensagem)
+            return
+
+        etag = Headers(raw=self.mensagem_inicial['headers']).get('etag')
+        chave = None
+        if etag and not etag.startswith('W/'):
+            chave = (self.scope['path'], self.scope.get('query_string', b''), etag, self.codificacao)
+
+        comprimido = self.middleware.cache.obter(chave) if chave else None
+        if comprimido is None:
+            comprimido = await self.executar(comprimir, corpo, self.codificacao)
+            if chave:
+                self.middleware.cache.guardar(chave, comprimido)
+
+        self.ajustar_cabecalhos(len(comprimido))
+        await self.send(self.mensagem_inicial)
+        await self.send({'type': 'http.response.body', 'body': comprimido, 'more_body': False})
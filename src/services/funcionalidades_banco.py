@@ -1,5 +1,16 @@
+import math
+import os
+import tempfile
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from pymysql.constants import CLIENT
+
 from src.models import models_db as models
-from sqlalchemy import text
+from src.services.metricas_ingestao import medir_etapa
+from sqlalchemy import Index, MetaData, bindparam, delete, inspect, insert, select, text, update
 
 
 def limpa_tabela(db, tabela):
@@ -9,10 +20,99 @@ def limpa_tabela(db, tabela):
         db: Objeto de sessão do banco de dados.
         tabela (str): O nome da tabela a ser limpa.
     """
-    db.execute(text(f"TRUNCATE TABLE {tabela}"))
+    if db.get_bind().dialect.name == 'sqlite':
+        # O SQLite (usado por `src.ingest` e pelos benchmarks) não possui TRUNCATE
+        db.execute(text(f"DELETE FROM {tabela}"))
+    else:
+        db.execute(text(f"TRUNCATE TABLE {tabela}"))
     db.commit()
 
 
+TAMANHO_LOTE_PADRAO = 1000
+
+MODELOS_TABELAS = {
+    'producao': models.Producao,
+    'processamento': models.Processamento,
+    'comercializacao': models.Comercializacao,
+    'exportacao': models.Exportacao,
+    'importacao': models.Importacao,
+}
+
+
+def gerar_registros(dict_final, coluna, tabela, super_categoria=None):
+    """Gera, a partir de um dicionário, as linhas a serem inseridas em uma tabela especificada.
+
+    Args:
+        dict_final (dict): Dicionário contendo os dados a serem inseridos.
+        coluna (str): Nome da coluna que identifica o produto ou categoria.
+        tabela (str): Nome da tabela onde os dados serão inseridos.
+        super_categoria (str, optional): Nome da super categoria (usado para tabelas com subcategorias). Defaults to None.
+
+    Yields:
+        dict: Valores de uma linha da tabela, indexados pelo nome da coluna.
+    """
+    if tabela == 'exportacao' or tabela == 'importacao':
+        for elemento in dict_final:
+            elemento_sem_id = elemento.copy()  # Copia o dicionário para evitar modificar o original
+            elemento_sem_id.pop('id', None)
+            nome_produto = elemento_sem_id.pop(coluna, None)  # Obtém o nome do produto
+
+            anos = []
+            quantidades = []
+            valores = []
+
+            for chave, valor in elemento_sem_id.items():
+                if '.' in chave:
+                    valores.append(float(valor))
+                else:
+                    anos.append(chave)
+                    quantidades.append(int(valor))
+
+            # Cria o dicionário com as informações coletadas
+            for ano, quantidade, valor in zip(anos, quantidades, valores):
+                yield {
+                    'categoria': str(super_categoria).strip(),
+                    'nome': str(nome_produto).strip(),
+                    'ano': ano,
+                    'quantidade': quantidade,
+                    'valor': valor
+                }
+
+    else:
+
+        for categorias in dict_final:
+
+            nome_categoria = categorias[coluna]
+
+            for elemento_lista in categorias[f'lista_{coluna}']:
+                elemento_lista.pop('id', None)
+                nome_produto = elemento_lista[f'{coluna}']
+                for ano, valor in elemento_lista.items():
+                    if ano != coluna:
+                        if tabela == 'producao':
+                            yield {
+                                'categoria': str(nome_categoria).strip(),
+                                'nome': str(nome_produto).strip(),
+                                'ano': ano,
+                                'valor_producao': float(valor)
+                            }
+                        elif tabela == 'processamento':
+                            yield {
+                                'categoria': str(super_categoria).strip(),
+                                'sub_categoria': str(nome_categoria).strip(),
+                                'nome': str(nome_produto).strip(),
+                                'ano': ano,
+                                'valor_processamento': float(valor)
+                            }
+                        elif tabela == 'comercializacao':
+                            yield {
+                                'categoria': str(nome_categoria).strip(),
+                                'nome': str(nome_produto).strip(),
+                                'ano': ano,
+                                'litros_comercializacao': float(valor)
+                            }
+
+
 def insercao_dados(db, dict_final, coluna, tabela, super_categoria=None):
     """Insere dados em uma tabela especificada a partir de um dicionário.
 
@@ -25,82 +125,16 @@ def insercao_dados(db, dict_final, coluna, tabela, super_categoria=None):
     """
     try:
         # faz a inserção de todos os dados na tabela
-        if tabela == 'exportacao' or tabela == 'importacao':
-            for elemento in dict_final:
-                elemento_sem_id = elemento.copy()  # Copia o dicionário para evitar modificar o original
-                elemento_sem_id.pop('id', None)
-                nome_produto = elemento_sem_id.pop(coluna, None)  # Obtém o nome do produto
-
-                anos = []
-                quantidades = []
-                valores = []
-
-                for chave, valor in elemento_sem_id.items():
-                    if '.' in chave:
-                        valores.append(float(valor))
-                    else:
-                        anos.append(chave)
-                        quantidades.append(int(valor))
-
-                # Cria o dicionário com as informações coletadas
-                if tabela == 'exportacao':
-                    for ano, quantidade, valor in zip(anos, quantidades, valores):
-
-                        item = models.Exportacao(
-                            categoria=str(super_categoria).strip(),
-                            nome=str(nome_produto).strip(),
-                            ano=ano,
-                            quantidade=quantidade,
-                            valor=valor
-                        )
-                        db.add(item)
-                else:
-                    for ano, quantidade, valor in zip(anos, quantidades, valores):
-                        item = models.Importacao(
-                            categoria=str(super_categoria).strip(),
-                            nome=str(nome_produto).strip(),
-                            ano=ano,
-                            quantidade=quantidade,
-                            valor=valor
-                        )
-                        db.add(item)
-
-        else:
-
-            for categorias in dict_final:
-
-                nome_categoria = categorias[coluna]
-
-                for elemento_lista in categorias[f'lista_{coluna}']:
-                    elemento_lista.pop('id', None)
-                    nome_produto = elemento_lista[f'{coluna}']
-                    for ano, valor in elemento_lista.items():
-                        if ano != coluna:
-                            if tabela == 'producao':
-                                item = models.Producao(
-                                    categoria=str(nome_categoria).strip(),
-                                    nome=str(nome_produto).strip(),
-                                    ano=ano,
-                                    valor_producao=float(valor)
-                                )
-                            elif tabela == 'processamento':
-                                item = models.Processamento(
-                                    categoria=str(super_categoria).strip(),
-                                    sub_categoria=str(nome_categoria).strip(),
-                                    nome=str(nome_produto).strip(),
-                                    ano=ano,
-                                    valor_processamento=float(valor)
-                                )
-                            elif tabela == 'comercializacao':
-                                item = models.Comercializacao(
-                                    categoria=str(nome_categoria).strip(),
-                                    nome=str(nome_produto).strip(),
-                                    ano=ano,
-                                    litros_comercializacao=float(valor)
-                                )
-                            db.add(item)
+        modelo = MODELOS_TABELAS[tabela]
 
-        db.commit()
+        with medir_etapa('insercao_dados') as contagens:
+            contagens['linhas_saida'] = 0
+
+            for registro in gerar_registros(dict_final, coluna, tabela, super_categoria):
+                db.add(modelo(**registro))
+                contagens['linhas_saida'] += 1
+
+            db.commit()
 
     except Exception as e:
         print(e)
@@ -108,3 +142,392 @@ def insercao_dados(db, dict_final, coluna, tabela, super_categoria=None):
     finally:
         db.close()
 
+
+def dividir_em_lotes(registros, tamanho_lote):
+    """Agrupa um iterável de registros em listas de no máximo `tamanho_lote` itens.
+
+    Args:
+        registros (Iterable[dict]): Registros a serem agrupados.
+        tamanho_lote (int): Quantidade máxima de registros por lote.
+
+    Yields:
+        list[dict]: Um lote de registros.
+    """
+    iterador = iter(registros)
+
+    while lote := list(islice(iterador, tamanho_lote)):
+        yield lote
+
+
+def insercao_dados_em_lote(db, registros, tabela, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """Insere registros em uma tabela com INSERTs de múltiplas linhas, sem criar objetos ORM.
+
+    Cada lote é enviado em um único `executemany` do `insert()` do SQLAlchemy Core, que o
+    pymysql converte em um INSERT com várias linhas em VALUES. A transação é confirmada uma
+    única vez ao final.
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+        registros (Iterable[dict]): Linhas a serem inseridas (ex: saída de `gerar_registros`).
+        tabela (str): Nome da tabela onde os dados serão inseridos.
+        tamanho_lote (int, optional): Quantidade de linhas por INSERT. Defaults to TAMANHO_LOTE_PADRAO.
+
+    Returns:
+        int: Quantidade de linhas inseridas.
+
+    Raises:
+        Exception: Repassa o erro do banco de dados após desfazer a transação.
+    """
+    comando = insert(MODELOS_TABELAS[tabela].__table__)
+    total_linhas = 0
+
+    try:
+        with medir_etapa('insercao_dados_em_lote') as contagens:
+            for lote in dividir_em_lotes(registros, tamanho_lote):
+                db.execute(comando, lote)
+                total_linhas += len(lote)
+
+            db.commit()
+            contagens['linhas_saida'] = total_linhas
+
+    except Exception as e:
+        print(e)
+        db.rollback()
+        raise
+
+    return total_linhas
+
+
+CHAVE_NATURAL = ['categoria', 'sub_categoria', 'nome', 'ano']
+
+
+def carga_diferencial(db, df_novo, tabela, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """Atualiza uma tabela aplicando apenas as diferenças em relação aos dados recém-lidos.
+
+    As linhas são comparadas pela chave natural (categoria, sub_categoria, nome e ano, conforme
+    as colunas da tabela). Chaves repetidas são pareadas pela ordem de ocorrência. Linhas novas
+    são inseridas, linhas com valores diferentes são atualizadas e linhas que deixaram de existir
+    são removidas, tudo em lotes e em uma única transação, sem deixar a tabela vazia em nenhum momento.
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+        df_novo (pd.DataFrame): Todos os dados da tabela no formato longo (ver `formato_longo`).
+        tabela (str): Nome da tabela a ser atualizada.
+        tamanho_lote (int, optional): Quantidade de linhas por comando. Defaults to TAMANHO_LOTE_PADRAO.
+
+    Returns:
+        dict: Quantidade de linhas 'inseridas', 'atualizadas', 'removidas' e 'inalteradas'.
+
+    Raises:
+        Exception: Repassa o erro do banco de dados após desfazer a transação.
+    """
+    tabela_db = MODELOS_TABELAS[tabela].__table__
+    colunas_chave = [coluna for coluna in CHAVE_NATURAL if coluna in tabela_db.c]
+    colunas_valor = [coluna.name for coluna in tabela_db.c if coluna.name not in colunas_chave + ['id']]
+
+    consulta = select(tabela_db.c.id, *[tabela_db.c[coluna] for coluna in colunas_chave + colunas_valor])
+    df_atual = pd.DataFrame(db.execute(consulta.order_by(tabela_db.c.id)).all(),
+                            columns=['id'] + colunas_chave + colunas_valor)
+
+    df_novo = df_novo.reindex(columns=colunas_chave + colunas_valor).reset_index(drop=True)
+    df_novo['_ocorrencia'] = df_novo.groupby(colunas_chave, dropna=False).cumcount()
+    df_atual['_ocorrencia'] = df_atual.groupby(colunas_chave, dropna=False).cumcount()
+
+    comparacao = df_novo.merge(df_atual, on=colunas_chave + ['_ocorrencia'], how='outer',
+                               suffixes=('', '_atual'), indicator=True)
+
+    novas = comparacao[comparacao['_merge'] == 'left_only']
+    removidas = comparacao[comparacao['_merge'] == 'right_only']
+    em_ambas = comparacao[comparacao['_merge'] == 'both']
+
+    alteradas = np.zeros(len(em_ambas), dtype=bool)
+    for coluna in colunas_valor:
+        valor_novo = pd.to_numeric(em_ambas[coluna]).astype('float64').to_numpy()
+        valor_atual = pd.to_numeric(em_ambas[f'{coluna}_atual']).astype('float64').to_numpy()
+        alteradas |= ~np.isclose(valor_novo, valor_atual, rtol=1e-9, atol=1e-9, equal_nan=True)
+    atualizadas = em_ambas[alteradas]
+
+    comando_update = (
+        update(tabela_db)
+        .where(tabela_db.c.id == bindparam('_id'))
+        .values({coluna: bindparam(f'_{coluna}') for coluna in colunas_valor})
+    )
+
+    try:
+        with medir_etapa('carga_diferencial', linhas_entrada=len(df_novo)) as contagens:
+            registros_novos = novas[colunas_chave + colunas_valor].to_dict(orient='records')
+            for lote in dividir_em_lotes(registros_novos, tamanho_lote):
+                db.execute(insert(tabela_db), lote)
+
+            registros_update = pd.DataFrame({'_id': atualizadas['id'].astype('int64')})
+            for coluna in colunas_valor:
+                registros_update[f'_{coluna}'] = atualizadas[coluna]
+
+            for lote in dividir_em_lotes(registros_update.to_dict(orient='records'), tamanho_lote):
+                db.execute(comando_update, lote)
+
+            for lote in dividir_em_lotes(removidas['id'].astype('int64').tolist(), tamanho_lote):
+                db.execute(delete(tabela_db).where(tabela_db.c.id.in_(lote)))
+
+            db.commit()
+            contagens['linhas_saida'] = len(novas) + len(atualizadas) + len(removidas)
+
+    except Exception as e:
+        print(e)
+        db.rollback()
+        raise
+
+    return {
+        'inseridas': len(novas),
+        'atualizadas': len(atualizadas),
+        'removidas': len(removidas),
+        'inalteradas': len(em_ambas) - len(atualizadas),
+    }
+
+
+SUFIXO_STAGING = '__staging'
+SUFIXO_ANTIGA = '__antiga'
+
+
+def criar_tabela_staging(db, tabela):
+    """Cria (ou recria, se sobrou de uma carga anterior) a tabela de staging de uma tabela, ainda sem índices.
+
+    A tabela de staging tem as mesmas colunas e chave primária da tabela original e o nome
+    `<tabela>__staging`. Os índices secundários são criados só depois da carga (ver `criar_indices_staging`).
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+        tabela (str): Nome da tabela original.
+
+    Returns:
+        Table: A tabela de staging.
+    """
+    tabela_db = MODELOS_TABELAS[tabela].__table__
+    tabela_staging = tabela_db.to_metadata(MetaData(), name=f'{tabela}{SUFIXO_STAGING}')
+    tabela_staging.indexes.clear()
+
+    conexao = db.connection()
+    tabela_staging.drop(bind=conexao, checkfirst=True)
+    tabela_staging.create(bind=conexao)
+
+    return tabela_staging
+
+
+def criar_indices_staging(db, tabela, tabela_staging):
+    """Cria na tabela de staging os mesmos índices da tabela original.
+
+    No MySQL os nomes de índices são por tabela e os nomes originais são mantidos. Em bancos
+    com nomes globais (ex: SQLite), é usado um nome alternativo quando o original já existe.
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+        tabela (str): Nome da tabela original.
+        tabela_staging (Table): Tabela retornada por `criar_tabela_staging`.
+    """
+    conexao = db.connection()
+    nomes_em_uso = set()
+    if conexao.dialect.name != 'mysql':
+        nomes_em_uso = {indice['name'] for indice in inspect(conexao).get_indexes(tabela)}
+
+    for indice in MODELOS_TABELAS[tabela].__table__.indexes:
+        nome = indice.name if indice.name not in nomes_em_uso else f'{indice.name}{SUFIXO_STAGING}'
+        colunas = [tabela_staging.c[coluna.name] for coluna in indice.columns]
+        Index(nome, *colunas, unique=indice.unique).create(bind=conexao)
+
+
+def trocar_tabela_staging(db, tabela):
+    """Coloca a tabela de staging no lugar da tabela original e descarta a versão anterior.
+
+    No MySQL a troca é feita com um único `RENAME TABLE`, que é atômico: as consultas veem
+    a versão anterior completa ou a nova completa, nunca uma tabela vazia ou parcial.
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+        tabela (str): Nome da tabela original.
+    """
+    conexao = db.connection()
+    quote = conexao.dialect.identifier_preparer.quote
+    original = quote(tabela)
+    staging = quote(f'{tabela}{SUFIXO_STAGING}')
+    antiga = quote(f'{tabela}{SUFIXO_ANTIGA}')
+
+    db.execute(text(f'DROP TABLE IF EXISTS {antiga}'))
+
+    if conexao.dialect.name == 'mysql':
+        db.execute(text(f'RENAME TABLE {original} TO {antiga}, {staging} TO {original}'))
+    else:
+        db.execute(text(f'ALTER TABLE {original} RENAME TO {antiga}'))
+        db.execute(text(f'ALTER TABLE {staging} RENAME TO {original}'))
+
+    db.execute(text(f'DROP TABLE {antiga}'))
+    db.commit()
+
+
+def carga_staging(db, registros, tabela, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """Recarrega uma tabela inteira sem que as consultas vejam a tabela vazia ou parcialmente carregada.
+
+    Os registros são inseridos em `<tabela>__staging`, os índices são criados e só então a
+    tabela de staging é trocada pela original (ver `trocar_tabela_staging`). Em caso de erro,
+    a tabela de staging é descartada e a tabela original continua com os dados anteriores.
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+        registros (Iterable[dict]): Todas as linhas da tabela.
+        tabela (str): Nome da tabela a ser recarregada.
+        tamanho_lote (int, optional): Quantidade de linhas por INSERT. Defaults to TAMANHO_LOTE_PADRAO.
+
+    Returns:
+        int: Quantidade de linhas carregadas.
+
+    Raises:
+        Exception: Repassa o erro do banco de dados após descartar a tabela de staging.
+    """
+    quote = db.get_bind().dialect.identifier_preparer.quote
+    total_linhas = 0
+
+    try:
+        with medir_etapa('carga_staging') as contagens:
+            tabela_staging = criar_tabela_staging(db, tabela)
+            comando = insert(tabela_staging)
+
+            for lote in dividir_em_lotes(registros, tamanho_lote):
+                db.execute(comando, lote)
+                total_linhas += len(lote)
+
+            db.commit()
+
+            criar_indices_staging(db, tabela, tabela_staging)
+            trocar_tabela_staging(db, tabela)
+            contagens['linhas_saida'] = total_linhas
+
+    except Exception as e:
+        print(e)
+        db.rollback()
+        db.execute(text(f'DROP TABLE IF EXISTS {quote(tabela + SUFIXO_STAGING)}'))
+        db.commit()
+        raise
+
+    return total_linhas
+
+
+def load_data_disponivel(db):
+    """Indica se a conexão permite carregar arquivos com `LOAD DATA LOCAL INFILE`.
+
+    É necessário que o banco seja MySQL, que o cliente (pymysql) tenha sido criado com
+    `local_infile=True` (ver `MYSQL_LOCAL_INFILE` em `database.py`) e que o servidor
+    tenha a variável `local_infile` habilitada. O pymysql não expõe a opção `local_infile`,
+    mas com ela adiciona `CLIENT.LOCAL_FILES` às flags enviadas ao servidor (`client_flag`).
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+
+    Returns:
+        bool: True se o `LOAD DATA LOCAL INFILE` pode ser usado.
+    """
+    conexao = db.connection()
+
+    if conexao.dialect.name != 'mysql':
+        return False
+
+    if not getattr(conexao.connection.dbapi_connection, 'client_flag', 0) & CLIENT.LOCAL_FILES:
+        return False
+
+    return bool(db.execute(text('SELECT @@GLOBAL.local_infile')).scalar())
+
+
+def formatar_valor_tsv(valor):
+    """Formata um valor no formato de campo esperado pelo `LOAD DATA` (campos separados por tabulação).
+
+    Args:
+        valor: O valor a ser formatado.
+
+    Returns:
+        str: O valor formatado, com `\\N` para nulos e barras, tabulações e quebras de linha escapadas.
+    """
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return '\\N'
+
+    return (
+        str(valor)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def escrever_tsv(arquivo, registros, colunas):
+    """Grava registros em um arquivo texto, uma linha por registro e campos separados por tabulação.
+
+    Args:
+        arquivo: Arquivo texto aberto para escrita.
+        registros (Iterable[dict]): Linhas a serem gravadas.
+        colunas (list[str]): Colunas a serem gravadas, na ordem do arquivo.
+
+    Returns:
+        int: Quantidade de linhas gravadas.
+    """
+    total_linhas = 0
+
+    for registro in registros:
+        arquivo.write('\t'.join(formatar_valor_tsv(registro.get(coluna)) for coluna in colunas))
+        arquivo.write('\n')
+        total_linhas += 1
+
+    return total_linhas
+
+
+def insercao_load_data(db, registros, tabela, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """Insere registros em uma tabela gravando-os em um TSV temporário carregado com `LOAD DATA LOCAL INFILE`.
+
+    O servidor lê o arquivo inteiro de uma vez, sem interpretar um comando SQL por linha. Se a
+    conexão não permitir `LOAD DATA LOCAL INFILE` (ver `load_data_disponivel`), os registros são
+    inseridos com `insercao_dados_em_lote`.
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+        registros (Iterable[dict]): Linhas a serem inseridas (ex: saída de `gerar_registros`).
+        tabela (str): Nome da tabela onde os dados serão inseridos.
+        tamanho_lote (int, optional): Quantidade de linhas por INSERT, caso os INSERTs em lote
+            sejam usados. Defaults to TAMANHO_LOTE_PADRAO.
+
+    Returns:
+        int: Quantidade de linhas inseridas.
+
+    Raises:
+        Exception: Repassa o erro do banco de dados após desfazer a transação.
+    """
+    if not load_data_disponivel(db):
+        return insercao_dados_em_lote(db, registros, tabela, tamanho_lote=tamanho_lote)
+
+    tabela_db = MODELOS_TABELAS[tabela].__table__
+    colunas = [coluna.name for coluna in tabela_db.c if coluna.name != 'id']
+    quote = db.get_bind().dialect.identifier_preparer.quote
+
+    descritor, caminho = tempfile.mkstemp(suffix='.tsv')
+
+    try:
+        with medir_etapa('insercao_load_data') as contagens:
+            with os.fdopen(descritor, 'w', encoding='utf-8', newline='') as arquivo:
+                total_linhas = escrever_tsv(arquivo, registros, colunas)
+
+            contagens['bytes'] = os.path.getsize(caminho)
+
+            comando = text(
+                f"LOAD DATA LOCAL INFILE :caminho INTO TABLE {quote(tabela)} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(quote(coluna) for coluna in colunas)})"
+            )
+            db.execute(comando, {'caminho': caminho})
+            db.commit()
+            contagens['linhas_saida'] = total_linhas
+
+    except Exception as e:
+        print(e)
+        db.rollback()
+        raise
+
+    finally:
+        os.remove(caminho)
+
+    return total_linhas
@@ -0,0 +1,289 @@
+"""
+Listagens das tabelas serializadas uma única vez por versão dos dados e devolvidas como bytes prontos.
+
+Mesmo com o cache de consultas, cada leitura da listagem passava pelo `jsonable_encoder` e pelo
+`json.dumps` do FastAPI para milhares de linhas. Aqui a listagem padrão de uma tabela (páginas de
+`LIMITE_PADRAO` linhas, todas as colunas) é lida de uma vez, serializada com o orjson (ou com o
+`json` da biblioteca padrão, se ele não estiver instalado) e guardada como bytes, página a página.
+Enquanto a versão da tabela (ver `versoes_tabelas`) não mudar, a rota devolve esses bytes
+diretamente em uma `Response`, sem consultar o banco nem serializar nada.
+
+As listagens são montadas ao final de cada carga (`carregar_tabelas`). Depois de uma escrita, ou quando a
+listagem passa de `TTL_CACHE_CONSULTAS` segundos (a mesma validade do cache de consultas, que cobre
+alterações que não passam pelas versões), a leitura seguinte agenda a remontagem em `EXECUTOR_LISTAGENS`,
+fora do event loop, e é respondida pela consulta normal, como todas as leituras até a listagem nova ficar
+pronta. As versões comprimidas dos bytes ficam no cache da compressão (`CacheCompressao`), que as
+reaproveita pelo ETag da resposta.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.services.cache_consultas import TTL_CACHE_CONSULTAS
+from src.services.paginacao import LIMITE_PADRAO, codificar_cursor, informar_proximo_cursor
+from src.services.versoes_tabelas import versao_tabela
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - o orjson é opcional
+    orjson = None
+
+
+MAXIMO_BYTES_LISTAGENS = int(os.environ.get('MAXIMO_BYTES_LISTAGENS', 256 * 1024 * 1024))
+
+# Executor das remontagens disparadas pelas leituras, fora do event loop do servidor
+EXECUTOR_LISTAGENS = ThreadPoolExecutor(max_workers=1, thread_name_prefix='listagens')
+
+
+def converter(valor):
+    """Converte os valores Decimal das colunas `Float(50, 2)` em float, como na resposta JSON."""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f'Tipo não serializável: {type(valor).__name__}')
+
+
+def serializar_json(valor) -> bytes:
+    """Serializa um valor em JSON compacto (UTF-8), no mesmo formato da `JSONResponse` do FastAPI.
+
+    Args:
+        valor: Listas, dicionários e valores simples (Decimal é convertido em float).
+
+    Returns:
+        bytes: O JSON serializado.
+    """
+    if orjson is not None:
+        return orjson.dumps(valor, default=converter)
+
+    return json.dumps(valor, default=converter, ensure_ascii=False, allow_nan=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class ListagensMaterializadas:
+    """
+    Páginas da listagem padrão de cada tabela, já serializadas, para a versão atual dos dados.
+
+    Attributes:
+        acertos (int): Páginas respondidas com os bytes guardados.
+        materializacoes (int): Vezes em que a listagem de uma tabela foi montada.
+        remontando (set[str]): Tabelas com uma remontagem agendada.
+        falhas (dict): Erro da última remontagem de cada tabela que falhou, até uma remontagem dela dar certo.
+    """
+
+    def __init__(self, limite: int = LIMITE_PADRAO, maximo_bytes: int = MAXIMO_BYTES_LISTAGENS,
+                 ttl: float = TTL_CACHE_CONSULTAS, relogio=time.monotonic, executor=EXECUTOR_LISTAGENS):
+        self.limite = limite
+        self.maximo_bytes = maximo_bytes
+        self.ttl = ttl
+        self.relogio = relogio
+        self.executor = executor
+        # tabela -> (versão, {último ID da página anterior: (bytes, próximo cursor)} ou None se não coube, validade)
+        self.listagens = {}
+        self.travas_tabelas = {}
+        self.remontando = set()
+        self.falhas = {}
+        self.acertos = 0
+        self.materializacoes = 0
+        self.trava = threading.Lock()
+
+    @property
+    def habilitado(self):
+        return self.maximo_bytes > 0 and self.ttl > 0
+
+    def _trava_tabela(self, tabela):
+        with self.trava:
+            return self.travas_tabelas.setdefault(tabela, threading.Lock())
+
+    def _valida(self, listagem, versao):
+        return listagem is not None and listagem[0] == versao and listagem[2] > self.relogio()
+
+    def _serializar(self, db, modelo):
+        colunas = [coluna.name for coluna in modelo.__table__.columns]
+        query = select(modelo.__table__).order_by(modelo.id)
+        resultado = db.execute(query.execution_options(yield_per=self.limite))
+
+        # (último ID da página anterior, bytes, último ID da página), na ordem das páginas
+        serializadas = []
+        total_bytes = 0
+        ultimo_id = None
+        for linhas in resultado.partitions():
+            corpo = serializar_json([dict(zip(colunas, linha)) for linha in linhas])
+            total_bytes += len(corpo)
+            if total_bytes > self.maximo_bytes:
+                resultado.close()
+                return None
+
+            serializadas.append((ultimo_id, corpo, linhas[-1].id))
+            ultimo_id = linhas[-1].id
+
+        # Tabela vazia: a primeira página é uma lista vazia
+        if not serializadas:
+            return {None: (serializar_json([]), None)}
+
+        # Só a última página não tem cursor para a próxima
+        paginas = {anterior: (corpo, codificar_cursor(ultimo)) for anterior, corpo, ultimo in serializadas[:-1]}
+        anterior, corpo, _ = serializadas[-1]
+        paginas[anterior] = (corpo, None)
+
+        return paginas
+
+    def materializar(self, db, modelo):
+        """Monta a listagem da tabela para a versão atual, se ela ainda não estiver montada e válida.
+
+        Montagens simultâneas da mesma tabela (ao final de uma carga e em segundo plano) aguardam uma única montagem.
+
+        Args:
+            db: Sessão do banco de dados.
+            modelo: O modelo ORM da tabela.
+
+        Returns:
+            dict | None: As páginas serializadas, pelo último ID da página anterior (None para a
+                primeira), ou None se a listagem passar de `maximo_bytes`.
+        """
+        tabela = modelo.__tablename__
+
+        with self._trava_tabela(tabela):
+            # A versão é lida antes da consulta: se a tabela mudar durante a leitura, a listagem já nasce antiga
+            versao = versao_tabela(tabela)
+            atual = self.listagens.get(tabela)
+            if self._valida(atual, versao):
+                return atual[1]
+
+            paginas = self._serializar(db, modelo)
+            with self.trava:
+                self.listagens[tabela] = (versao, paginas, self.relogio() + self.ttl)
+                self.materializacoes += 1
+
+            return paginas
+
+    def _remontar(self, engine, modelo):
+        tabela = modelo.__tablename__
+        try:
+            with Session(bind=engine) as db:
+                self.materializar(db, modelo)
+        except Exception as e:
+            logging.exception('Falha ao remontar a listagem da tabela %s', tabela)
+            with self.trava:
+                self.falhas[tabela] = f'{type(e).__name__}: {e}'
+        else:
+            with self.trava:
+                self.falhas.pop(tabela, None)
+        finally:
+            with self.trava:
+                self.remontando.discard(tabela)
+
+    def agendar(self, db, modelo):
+        """Agenda a remontagem da listagem da tabela em `executor`, com uma sessão própria.
+
+        Não faz nada se já houver uma remontagem agendada para a tabela.
+
+        Args:
+            db: Sessão do banco de dados da requisição (apenas a conexão dela é reaproveitada).
+            modelo: O modelo ORM da tabela.
+        """
+        tabela = modelo.__tablename__
+
+        with self.trava:
+            if tabela in self.remontando:
+                return
+            self.remontando.add(tabela)
+
+        self.executor.submit(self._remontar, db.get_bind(), modelo)
+
+    def pagina(self, db, modelo, limite: int, ultimo_id: Optional[int] = None, campos: Optional[list[str]] = None):
+        """Retorna uma página da listagem serializada, se ela fizer parte da listagem padrão.
+
+        Apenas páginas com `LIMITE_PADRAO` linhas, todas as colunas e um cursor recebido da própria
+        listagem são materializadas; as demais devem ser consultadas normalmente. Se a listagem da
+        tabela estiver desatualizada ou vencida, a remontagem é agendada (ver `agendar`) e a página
+        também deve ser consultada normalmente.
+
+        Args:
+            db: Sessão do banco de dados.
+            modelo: O modelo ORM da tabela.
+            limite (int): Quantidade máxima de linhas da página.
+            ultimo_id (int, optional): Retorno de `decodificar_cursor`. Defaults to None (primeira página).
+            campos (list[str], optional): Retorno de `campos_projecao`. Defaults to None (todas as colunas).
+
+        Returns:
+            tuple | None: Os bytes da página e o cursor da próxima (None se for a última), ou None.
+        """
+        if not self.habilitado or limite != self.limite or campos is not None:
+            return None
+
+        with self.trava:
+            atual = self.listagens.get(modelo.__tablename__)
+
+        if not self._valida(atual, versao_tabela(modelo.__tablename__)):
+            self.agendar(db, modelo)
+            return None
+
+        paginas = atual[1]
+        if paginas is None or ultimo_id not in paginas:
+            return None
+
+        with self.trava:
+            self.acertos += 1
+        return paginas[ultimo_id]
+
+    def estatisticas(self):
+        """Retorna os contadores das listagens.
+
+        Returns:
+            dict: Acertos, materializações, remontagens agendadas, falhas das remontagens, e as páginas e
+                bytes guardados de cada tabela.
+        """
+        with self.trava:
+            tabelas = {
+                tabela: {
+                    'versao': versao,
+                    'paginas': len(paginas) if paginas is not None else None,
+                    'bytes': sum(len(corpo) for corpo, _ in paginas.values()) if paginas is not None else None,
+                }
+                for tabela, (versao, paginas, _) in self.listagens.items()
+            }
+            return {
+                'habilitado': self.habilitado,
+                'serializador': 'orjson' if orjson is not None else 'json',
+                'acertos': self.acertos,
+                'materializacoes': self.materializacoes,
+                'maximo_bytes': self.maximo_bytes,
+                'ttl': self.ttl,
+                'remontando': sorted(self.remontando),
+                'falhas': dict(self.falhas),
+                'tabelas': tabelas,
+            }
+
+    def limpar(self):
+        with self.trava:
+            self.listagens.clear()
+
+
+LISTAGENS_MATERIALIZADAS = ListagensMaterializadas()
+
+
+def resposta_materializada(pagina, response: Response) -> Response:
+    """Cria a resposta com os bytes de uma página materializada.
+
+    Uma `Response` retornada pela rota não recebe os cabeçalhos definidos nas dependências
+    (ETag, Cache-Control), então eles são copiados de `response`.
+
+    Args:
+        pagina (tuple): Retorno de `ListagensMaterializadas.pagina`.
+        response (Response): A resposta da rota, com os cabeçalhos das dependências.
+
+    Returns:
+        Response: A resposta JSON com os bytes da página.
+    """
+    corpo, proximo_cursor = pagina
+    informar_proximo_cursor(response, proximo_cursor)
+
+    return Response(content=corpo, media_type='application/json', headers=dict(response.headers))
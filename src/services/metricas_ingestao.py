@@ -0,0 +1,324 @@
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.models.models_db import ExecucaoIngestao
+
+_medicao_atual = contextvars.ContextVar('medicao_atual', default=None)
+_tabela_atual = contextvars.ContextVar('tabela_atual', default=None)
+
+
+class MonitorMemoria:
+    """
+    Mede o pico de memória residente (RSS) do processo durante cada etapa em andamento.
+
+    Enquanto houver etapas em andamento, uma thread lê o RSS do processo (VmRSS, em /proc/self/status)
+    a cada `intervalo` segundos e repassa cada leitura a todas as etapas abertas; o RSS também é lido
+    no início e no fim de cada etapa. Nada é alterado no processo (o pico guardado pelo kernel não é
+    reiniciado), então a medição não interfere em outras etapas, threads ou requisições da API.
+    Alocações liberadas em menos de `intervalo` segundos podem não aparecer no pico. Em outras
+    plataformas a memória não é medida.
+
+    A memória é a do processo inteiro: etapas simultâneas contam também o que as outras
+    alocaram no mesmo período.
+    """
+
+    def __init__(self, caminho_status='/proc/self/status', intervalo=0.005):
+        self.caminho_status = caminho_status
+        self.intervalo = intervalo
+        # etapa em andamento -> [RSS no início, maior RSS desde então]
+        self.abertas = {}
+        self.amostrador = None
+        self.trava = threading.Lock()
+        self.disponivel = self._ler_rss() is not None
+
+    def _ler_rss(self):
+        """Retorna o RSS atual do processo, em bytes, ou None se ele não puder ser lido."""
+        try:
+            with open(self.caminho_status) as arquivo:
+                for linha in arquivo:
+                    if linha.startswith('VmRSS:'):
+                        return int(linha.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def _repassar(self, rss):
+        if rss is not None:
+            for medida in self.abertas.values():
+                medida[1] = max(medida[1], rss)
+
+    def _amostrar(self):
+        while True:
+            time.sleep(self.intervalo)
+            rss = self._ler_rss()
+            with self.trava:
+                # Sem etapas em andamento a thread termina; a próxima etapa inicia outra
+                if not self.abertas:
+                    self.amostrador = None
+                    return
+                self._repassar(rss)
+
+    def iniciar(self):
+        """Começa a medir uma etapa.
+
+        Returns:
+            object: Identificador da etapa, a ser informado em `finalizar`.
+        """
+        if not self.disponivel:
+            return None
+
+        rss = self._ler_rss()
+        if rss is None:
+            return None
+
+        with self.trava:
+            self._repassar(rss)
+            etapa = object()
+            self.abertas[etapa] = [rss, rss]
+
+            if self.amostrador is None:
+                self.amostrador = threading.Thread(target=self._amostrar, name='monitor-memoria', daemon=True)
+                self.amostrador.start()
+
+            return etapa
+
+    def finalizar(self, etapa):
+        """Termina a medição de uma etapa.
+
+        Args:
+            etapa (object): Retorno de `iniciar`.
+
+        Returns:
+            int | None: O pico de RSS durante a etapa, acima do RSS no seu início, em bytes, ou None
+                se a plataforma não permitir a medição.
+        """
+        if etapa is None:
+            return None
+
+        rss = self._ler_rss()
+        with self.trava:
+            self._repassar(rss)
+            inicio, pico = self.abertas.pop(etapa)
+
+        return max(pico - inicio, 0)
+
+
+MONITOR_MEMORIA = MonitorMemoria()
+
+
+class MedicaoIngestao:
+    """
+    Acumula as medições das etapas de uma carga do banco de dados.
+
+    As etapas são medidas por `medir_etapa` enquanto a medição estiver ativa (ver `ativar`) e
+    agregadas por etapa e tabela. Pode ser usada ao mesmo tempo por várias threads.
+
+    Attributes:
+        id (str): Identificador da carga.
+        iniciada_em (datetime): Início da carga (UTC).
+        etapas (dict): Medições agregadas por (etapa, tabela).
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.iniciada_em = datetime.utcnow()
+        self.etapas = {}
+        self.trava = threading.Lock()
+
+    def registrar(self, etapa, tabela, tempo_total, tempo_cpu, bytes=None, linhas_entrada=None,
+                  linhas_saida=None, pico_memoria_etapa=None, chamadas=1, conexoes=None):
+        """Soma uma ou mais execuções de uma etapa às medições da carga.
+
+        Args:
+            etapa (str): Nome da etapa.
+            tabela (str | None): Tabela à qual a etapa pertence.
+            tempo_total (float): Tempo decorrido, em segundos.
+            tempo_cpu (float): Tempo de CPU da thread, em segundos.
+            bytes (int, optional): Bytes processados. Defaults to None.
+            linhas_entrada (int, optional): Linhas recebidas. Defaults to None.
+            linhas_saida (int, optional): Linhas produzidas. Defaults to None.
+            pico_memoria_etapa (int, optional): Pico de memória (RSS) durante a etapa, acima da
+                memória no seu início (ver `MonitorMemoria`), em bytes. Defaults to None.
+            chamadas (int, optional): Execuções somadas de uma vez. Defaults to 1.
+            conexoes (int, optional): Conexões de rede abertas. Defaults to None.
+        """
+        with self.trava:
+            medida = self.etapas.setdefault((etapa, tabela), {
+                'etapa': etapa, 'tabela': tabela, 'chamadas': 0, 'tempo_total': 0.0, 'tempo_cpu': 0.0,
+                'bytes': 0, 'linhas_entrada': 0, 'linhas_saida': 0, 'pico_memoria_etapa': None,
+                'conexoes': 0,
+            })
+
+            medida['chamadas'] += chamadas
+            medida['tempo_total'] += tempo_total
+            medida['tempo_cpu'] += tempo_cpu
+            medida['bytes'] += int(bytes or 0)
+            medida['linhas_entrada'] += int(linhas_entrada or 0)
+            medida['linhas_saida'] += int(linhas_saida or 0)
+            if pico_memoria_etapa is not None:
+                medida['pico_memoria_etapa'] = max(medida['pico_memoria_etapa'] or 0, int(pico_memoria_etapa))
+            medida['conexoes'] += int(conexoes or 0)
+
+    def resumo(self):
+        """Lista as medições agregadas, na ordem em que as etapas foram executadas pela primeira vez.
+
+        Returns:
+            list[dict]: Uma medição por etapa e tabela.
+        """
+        with self.trava:
+            return [
+                {**medida, 'tempo_total': round(medida['tempo_total'], 6), 'tempo_cpu': round(medida['tempo_cpu'], 6)}
+                for medida in self.etapas.values()
+            ]
+
+    def salvar(self, db, status):
+        """Grava as medições da carga na tabela 'ingest_runs'.
+
+        Args:
+            db: Objeto de sessão do banco de dados.
+            status (str): Resultado da carga ('concluida' ou 'erro').
+        """
+        db.add_all([
+            ExecucaoIngestao(id_execucao=self.id, iniciada_em=self.iniciada_em, status=status, **medida)
+            for medida in self.resumo()
+        ])
+        db.commit()
+
+    @contextmanager
+    def ativar(self):
+        """Direciona para esta medição as etapas executadas no contexto atual (e nas tarefas criadas a partir dele)."""
+        token = _medicao_atual.set(self)
+        try:
+            yield self
+        finally:
+            _medicao_atual.reset(token)
+
+
+def medicao_atual():
+    """Retorna a medição ativa no contexto atual (ver `MedicaoIngestao.ativar`).
+
+    Returns:
+        MedicaoIngestao | None: A medição, ou None se nenhuma estiver ativa.
+    """
+    return _medicao_atual.get()
+
+
+@contextmanager
+def definir_tabela(tabela):
+    """Associa à tabela informada as etapas medidas dentro do bloco.
+
+    Args:
+        tabela (str): Nome da tabela.
+    """
+    token = _tabela_atual.set(tabela)
+    try:
+        yield
+    finally:
+        _tabela_atual.reset(token)
+
+
+@contextmanager
+def medir_etapa(etapa, bytes=None, linhas_entrada=None):
+    """Mede o tempo decorrido, o tempo de CPU e o pico de memória de um trecho de código.
+
+    Sem uma medição ativa (ver `MedicaoIngestao.ativar`) nada é registrado. O dicionário
+    retornado pode ser preenchido dentro do bloco com 'bytes', 'linhas_entrada' e 'linhas_saida'.
+
+    Args:
+        etapa (str): Nome da etapa.
+        bytes (int, optional): Bytes processados, se já conhecidos. Defaults to None.
+        linhas_entrada (int, optional): Linhas recebidas, se já conhecidas. Defaults to None.
+
+    Yields:
+        dict: As contagens da etapa.
+    """
+    contagens = {'bytes': bytes, 'linhas_entrada': linhas_entrada, 'linhas_saida': None}
+    medicao = _medicao_atual.get()
+
+    if medicao is None:
+        yield contagens
+        return
+
+    inicio = time.perf_counter()
+    inicio_cpu = time.thread_time()
+    etapa_memoria = MONITOR_MEMORIA.iniciar()
+
+    try:
+        yield contagens
+    finally:
+        medicao.registrar(
+            etapa,
+            _tabela_atual.get(),
+            tempo_total=time.perf_counter() - inicio,
+            tempo_cpu=time.thread_time() - inicio_cpu,
+            pico_memoria_etapa=MONITOR_MEMORIA.finalizar(etapa_memoria),
+            **contagens
+        )
+
+
+def submeter_no_contexto(executor, funcao, *args, **kwargs):
+    """Agenda uma função em um executor de threads mantendo a medição e a tabela do contexto atual.
+
+    Args:
+        executor (ThreadPoolExecutor): O executor.
+        funcao (Callable): A função a ser executada.
+        *args: Argumentos posicionais de `funcao`.
+        **kwargs: Argumentos nomeados de `funcao`.
+
+    Returns:
+        Future: O futuro com o resultado de `funcao`.
+    """
+    return executor.submit(contextvars.copy_context().run, funcao, *args, **kwargs)
+
+
+def listar_execucoes(db, limite=20):
+    """Lista as últimas cargas registradas na tabela 'ingest_runs', com as medições de cada etapa.
+
+    Args:
+        db: Objeto de sessão do banco de dados.
+        limite (int, optional): Quantidade máxima de cargas. Defaults to 20.
+
+    Returns:
+        list[dict]: Uma entrada por carga, da mais recente para a mais antiga.
+    """
+    ultimas = (
+        db.query(ExecucaoIngestao.id_execucao, ExecucaoIngestao.iniciada_em)
+        .distinct()
+        .order_by(ExecucaoIngestao.iniciada_em.desc())
+        .limit(limite)
+        .all()
+    )
+    ids = [id_execucao for id_execucao, _ in ultimas]
+
+    linhas = (
+        db.query(ExecucaoIngestao)
+        .filter(ExecucaoIngestao.id_execucao.in_(ids))
+        .order_by(ExecucaoIngestao.id)
+        .all()
+    )
+
+    execucoes = {
+        id_execucao: {'id': id_execucao, 'iniciada_em': iniciada_em, 'status': None, 'etapas': []}
+        for id_execucao, iniciada_em in ultimas
+    }
+    for linha in linhas:
+        execucao = execucoes[linha.id_execucao]
+        execucao['status'] = linha.status
+        execucao['etapas'].append({
+            'etapa': linha.etapa,
+            'tabela': linha.tabela,
+            'chamadas': linha.chamadas,
+            'tempo_total': linha.tempo_total,
+            'tempo_cpu': linha.tempo_cpu,
+            'bytes': linha.bytes,
+            'linhas_entrada': linha.linhas_entrada,
+            'linhas_saida': linha.linhas_saida,
+            'pico_memoria_etapa': linha.pico_memoria_etapa,
+            'conexoes': linha.conexoes,
+        })
+
+    return list(execucoes.values())
@@ -0,0 +1,103 @@
+import base64
+import binascii
+from typing import Annotated, Optional
+
+from fastapi import HTTPException, Query, Response, status
+
+from src.services.projecao import serializar_projecao
+
+
+LIMITE_PADRAO = 1000
+LIMITE_MAXIMO = 5000
+CABECALHO_PROXIMO_CURSOR = 'X-Proximo-Cursor'
+
+LimitePagina = Annotated[int, Query(
+    gt=0, le=LIMITE_MAXIMO, description=f'Quantidade máxima de linhas da página (até {LIMITE_MAXIMO}).'
+)]
+CursorPagina = Annotated[Optional[str], Query(
+    description=f'Cursor retornado no cabeçalho {CABECALHO_PROXIMO_CURSOR} da página anterior.'
+)]
+
+
+def codificar_cursor(ultimo_id: int) -> str:
+    """Gera o cursor que aponta para as linhas seguintes a um ID.
+
+    Args:
+        ultimo_id (int): O ID da última linha da página.
+
+    Returns:
+        str: O cursor, opaco para o cliente.
+    """
+    return base64.urlsafe_b64encode(str(ultimo_id).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Recupera o ID contido em um cursor gerado por `codificar_cursor`.
+
+    Args:
+        cursor (str | None): O cursor recebido na requisição.
+
+    Returns:
+        int | None: O ID da última linha da página anterior, ou None para a primeira página.
+
+    Raises:
+        HTTPException: Com status code 400 se o cursor for inválido.
+    """
+    if cursor is None:
+        return None
+
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cursor de paginação inválido')
+
+
+def consultar_pagina(db, modelo, limite: int, ultimo_id: Optional[int] = None, campos: Optional[list[str]] = None):
+    """Busca uma página de uma tabela ordenada pelo ID (paginação por keyset).
+
+    Cada página é obtida com `WHERE id > :ultimo_id ORDER BY id LIMIT :limite`, usando a chave
+    primária, de modo que o custo da consulta não cresce com a posição da página nem com a tabela.
+
+    Args:
+        db: Sessão do banco de dados.
+        modelo: O modelo ORM da tabela.
+        limite (int): Quantidade máxima de linhas da página.
+        ultimo_id (int, optional): Retorno de `decodificar_cursor` para o cursor da página anterior.
+            Defaults to None (primeira página).
+        campos (list[str], optional): Retorno de `campos_projecao`; o SELECT traz apenas essas colunas
+            (e o ID, usado no cursor). Defaults to None (objetos ORM completos).
+
+    Returns:
+        tuple: As linhas da página (dicionários, se houver `campos`) e o cursor da próxima página (None se esta for a última).
+    """
+    if campos is None:
+        query = db.query(modelo)
+    else:
+        query = db.query(modelo.id, *(getattr(modelo, campo) for campo in campos if campo != 'id'))
+
+    if ultimo_id is not None:
+        query = query.filter(modelo.id > ultimo_id)
+
+    # Uma linha a mais indica se existe uma próxima página
+    linhas = query.order_by(modelo.id).limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = codificar_cursor(linhas[-1].id)
+
+    if campos is not None:
+        linhas = [serializar_projecao(linha, campos) for linha in linhas]
+
+    return linhas, proximo_cursor
+
+
+def informar_proximo_cursor(response: Response, proximo_cursor: Optional[str]):
+    """Informa ao cliente, no cabeçalho X-Proximo-Cursor, o cursor da próxima página, se houver.
+
+    Args:
+        response (Response): A resposta da rota.
+        proximo_cursor (str | None): Retorno de `consultar_pagina`.
+    """
+    if proximo_cursor is not None:
+        response.headers[CABECALHO_PROXIMO_CURSOR] = proximo_cursor
@@ -0,0 +1,138 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from src.services.metricas_ingestao import definir_tabela, submeter_no_contexto
+
+
+MAXIMO_DOWNLOADS_SIMULTANEOS = 4
+
+
+def contexto_processos(modulos_preload):
+    """Escolhe o método de criação dos processos de transformação.
+
+    O 'forkserver' evita copiar, via fork, um processo que já possui threads de download
+    em execução. O servidor é iniciado uma única vez por processo, já com os módulos de
+    `modulos_preload` importados, e as cargas seguintes reaproveitam essa inicialização.
+    Em sistemas sem suporte a ele (ex: Windows) é usado o padrão da plataforma.
+
+    Args:
+        modulos_preload (list[str]): Módulos a serem importados pelo servidor de processos.
+
+    Returns:
+        multiprocessing.context.BaseContext | None: O contexto a ser usado pelo ProcessPoolExecutor.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context('forkserver')
+        contexto.set_forkserver_preload(modulos_preload)
+        return contexto
+
+    return None
+
+
+def agendar_preparacao(iniciador, link, arquivo, executor_processos):
+    """Agenda a leitura e transformação de um arquivo baixado no pool de processos.
+
+    Args:
+        iniciador: Objeto `Inicializacao` da tabela à qual o link pertence.
+        link (dict): Item de `lista_links` com a URL e a super categoria.
+        arquivo (dict): Retorno de `iniciador.baixar`.
+        executor_processos (ProcessPoolExecutor): Pool onde a transformação será executada.
+
+    Returns:
+        Future: Futuro com o resultado de `iniciador.preparar_dados`.
+    """
+    return executor_processos.submit(iniciador.preparar_dados, arquivo['conteudo'], link['super_categoria'])
+
+
+def baixar_e_agendar(iniciador, link, executor_processos):
+    """Faz o download de um link e, se o arquivo mudou, já agenda sua transformação.
+
+    Arquivos inalterados só são transformados se outro arquivo da mesma tabela tiver mudado.
+
+    Args:
+        iniciador: Objeto `Inicializacao` da tabela à qual o link pertence.
+        link (dict): Item de `lista_links` com a URL e a super categoria.
+        executor_processos (ProcessPoolExecutor): Pool onde a transformação será executada.
+
+    Returns:
+        tuple: O arquivo baixado (dict) e o futuro da transformação (ou None).
+    """
+    with definir_tabela(iniciador.nome_tabela):
+        arquivo = iniciador.baixar(link)
+
+    if not arquivo['alterado']:
+        return arquivo, None
+
+    return arquivo, agendar_preparacao(iniciador, link, arquivo, executor_processos)
+
+
+def insercoes_em_pipeline(iniciadores, db, max_downloads=MAXIMO_DOWNLOADS_SIMULTANEOS, max_processos=None,
+                          forcar=False):
+    """Carrega todas as tabelas sobrepondo downloads, transformações e inserções.
+
+    Todos os downloads são disparados de imediato em um pool limitado de threads; cada arquivo
+    baixado é lido e transformado (pandas) em um pool de processos, e a escrita no banco consome
+    os resultados à medida que ficam prontos. A escrita segue a ordem das tabelas e de seus links,
+    e cada tabela continua sendo limpa (TRUNCATE) imediatamente antes de receber seus dados, depois
+    que todos os seus arquivos foram baixados. Tabelas sem arquivos alterados não são recarregadas.
+
+    As etapas executadas no pool de processos (leitura e transformação) não entram nas medições
+    de `MedicaoIngestao`; os downloads e as inserções, sim.
+
+    Args:
+        iniciadores (list[Inicializacao]): Tabelas a serem carregadas, na ordem de escrita.
+        db: Sessão do banco de dados.
+        max_downloads (int, optional): Número máximo de downloads simultâneos. Defaults to MAXIMO_DOWNLOADS_SIMULTANEOS.
+        max_processos (int, optional): Número de processos de transformação. Defaults to None (número de CPUs).
+        forcar (bool, optional): Se True, recarrega as tabelas mesmo sem alterações. Defaults to False.
+
+    Returns:
+        dict: Resumo da carga de cada tabela (ver `Inicializacao.insercoes`).
+    """
+    executor_downloads = ThreadPoolExecutor(max_workers=max_downloads)
+    modulos_preload = sorted({type(iniciador).__module__ for iniciador in iniciadores})
+    executor_processos = ProcessPoolExecutor(max_workers=max_processos, mp_context=contexto_processos(modulos_preload))
+
+    resumos = {}
+
+    try:
+        for iniciador in iniciadores:
+            iniciador.reportar('baixando')
+
+        agendados = [
+            (iniciador, [
+                (link, submeter_no_contexto(executor_downloads, baixar_e_agendar, iniciador, link, executor_processos))
+                for link in iniciador.lista_links
+            ])
+            for iniciador in iniciadores
+        ]
+
+        for iniciador, links in agendados:
+            baixados = [(link, *download.result()) for link, download in links]
+            arquivos = [arquivo for _, arquivo, _ in baixados]
+
+            if not iniciador.precisa_recarregar(arquivos, forcar):
+                iniciador.reportar('inalterada')
+                resumos[iniciador.nome_tabela] = {'recarregada': False}
+                continue
+
+            iniciador.reportar('processando')
+
+            preparacoes = [
+                preparacao or agendar_preparacao(iniciador, link, arquivo, executor_processos)
+                for link, arquivo, preparacao in baixados
+            ]
+
+            with definir_tabela(iniciador.nome_tabela):
+                resumo = iniciador.carregar(db, (preparacao.result() for preparacao in preparacoes))
+                iniciador.confirmar(arquivos)
+            iniciador.reportar('concluida')
+
+            resumos[iniciador.nome_tabela] = {'recarregada': True, **resumo}
+
+    finally:
+        # Em caso de erro, descarta o trabalho que ainda não começou
+        executor_downloads.shutdown(cancel_futures=True)
+        executor_processos.shutdown(cancel_futures=True)
+
+    return resumos
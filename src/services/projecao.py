@@ -0,0 +1,89 @@
+from typing import Annotated, Optional
+
+from fastapi import HTTPException, Query, status
+
+
+CamposProjecao = Annotated[Optional[str], Query(
+    description='Colunas retornadas, separadas por vírgula (ex.: ano,valor_producao). Padrão: todas.'
+)]
+
+
+def campos_projecao(modelo, fields: Optional[str]) -> Optional[list[str]]:
+    """Valida as colunas pedidas em `fields` contra as colunas da tabela.
+
+    Args:
+        modelo: O modelo ORM da tabela.
+        fields (str | None): Nomes das colunas separados por vírgula.
+
+    Returns:
+        list[str] | None: As colunas, sem repetições e na ordem pedida, ou None para todas.
+
+    Raises:
+        HTTPException: Com status code 400 se alguma coluna não existir na tabela ou nenhuma for informada.
+    """
+    if fields is None:
+        return None
+
+    colunas = [coluna.name for coluna in modelo.__table__.columns]
+    campos = list(dict.fromkeys(campo.strip() for campo in fields.split(',') if campo.strip()))
+
+    invalidos = [campo for campo in campos if campo not in colunas]
+    if invalidos or not campos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Campos inválidos: {", ".join(invalidos) or fields!r}. Campos disponíveis: {", ".join(colunas)}'
+        )
+
+    return campos
+
+
+def projetar(query, modelo, campos):
+    """Restringe o SELECT da consulta às colunas pedidas.
+
+    Args:
+        query: A consulta sobre o modelo, já com os filtros.
+        modelo: O modelo ORM da tabela.
+        campos (list[str] | None): Retorno de `campos_projecao`.
+
+    Returns:
+        Query: A consulta que seleciona apenas as colunas, ou a própria consulta se `campos` for None.
+    """
+    if campos is None:
+        return query
+
+    return query.with_entities(*(getattr(modelo, campo) for campo in campos))
+
+
+def serializar_projecao(linha, campos):
+    """Converte uma linha de uma consulta projetada em um dicionário apenas com as colunas pedidas.
+
+    Args:
+        linha: Linha retornada por uma consulta de `projetar`, um objeto ORM ou None.
+        campos (list[str] | None): Retorno de `campos_projecao`.
+
+    Returns:
+        dict | None: A linha com as colunas pedidas, ou a própria linha se `campos` for None.
+    """
+    if campos is None or linha is None:
+        return linha
+
+    return {campo: linha._mapping[campo] for campo in campos}
+
+
+def listar_projecao(query, modelo, campos):
+    """Executa uma consulta retornando apenas as colunas pedidas de cada linha.
+
+    Args:
+        query: A consulta sobre o modelo, já com os filtros.
+        modelo: O modelo ORM da tabela.
+        campos (list[str] | None): Retorno de `campos_projecao`.
+
+    Returns:
+        list: Os objetos ORM, se `campos` for None, ou um dicionário por linha.
+    """
+    linhas = projetar(query, modelo, campos).all()
+
+    if campos is None:
+        return linhas
+
+    return [serializar_projecao(linha, campos) for linha in linhas]
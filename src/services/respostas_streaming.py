@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from typing import Annotated, Optional
+
+from fastapi import Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+TAMANHO_LOTE_STREAMING = 2000
+
+TIPO_NDJSON = 'application/x-ndjson'
+TIPO_CSV = 'text/csv'
+# Tipos que mantêm a resposta JSON paginada
+TIPOS_JSON = ('application/json', 'application/*', '*/*')
+
+CabecalhoAccept = Annotated[Optional[str], Header(
+    description=f'{TIPO_NDJSON} ou {TIPO_CSV} retornam a tabela inteira em streaming.'
+)]
+
+
+def valores(linha):
+    """Converte os valores Decimal das colunas `Float(50, 2)` em float, como na resposta JSON."""
+    return [float(valor) if isinstance(valor, Decimal) else valor for valor in linha]
+
+
+def serializar_ndjson(colunas, linhas, primeiro_lote):
+    """Serializa um lote de linhas como JSON, uma linha por objeto."""
+    return ''.join(
+        json.dumps(dict(zip(colunas, valores(linha))), ensure_ascii=False) + '\n' for linha in linhas
+    ).encode('utf-8')
+
+
+def serializar_csv(colunas, linhas, primeiro_lote):
+    """Serializa um lote de linhas como CSV; o primeiro lote leva o cabeçalho."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    if primeiro_lote:
+        escritor.writerow(colunas)
+    escritor.writerows(valores(linha) for linha in linhas)
+    return buffer.getvalue().encode('utf-8')
+
+
+SERIALIZADORES = {
+    TIPO_NDJSON: serializar_ndjson,
+    TIPO_CSV: serializar_csv,
+}
+
+
+def formato_streaming(accept: Optional[str]) -> Optional[str]:
+    """Identifica, pelo cabeçalho Accept, se o cliente pediu a tabela em streaming.
+
+    Os tipos são considerados na ordem em que o cliente os informou; o primeiro tipo reconhecido
+    decide o formato.
+
+    Args:
+        accept (str | None): O cabeçalho Accept da requisição.
+
+    Returns:
+        str | None: `application/x-ndjson` ou `text/csv`, ou None para a resposta JSON paginada.
+    """
+    for tipo in (accept or '').split(','):
+        tipo = tipo.split(';', 1)[0].strip().lower()
+        if tipo in SERIALIZADORES:
+            return tipo
+        if tipo in TIPOS_JSON:
+            return None
+
+    return None
+
+
+def gerar_lotes(db, modelo, formato, ultimo_id=None, campos=None, tamanho_lote=TAMANHO_LOTE_STREAMING):
+    """Lê a tabela em lotes e serializa cada lote assim que ele chega do banco.
+
+    A consulta usa `yield_per`, que no MySQL abre um cursor do lado do servidor (SSCursor do
+    pymysql): apenas um lote fica em memória por vez, sem montar objetos ORM. A leitura é feita
+    em uma sessão própria, ligada ao mesmo banco de `db`, que é encerrada ao final do streaming.
+
+    Args:
+        db: Sessão do banco de dados da requisição.
+        modelo: O modelo ORM da tabela.
+        formato (str): Retorno de `formato_streaming`.
+        ultimo_id (int, optional): Retorna apenas as linhas com ID maior. Defaults to None.
+        campos (list[str], optional): Retorno de `campos_projecao`. Defaults to None (todas as colunas).
+        tamanho_lote (int, optional): Linhas por lote. Defaults to TAMANHO_LOTE_STREAMING.
+
+    Yields:
+        bytes: Cada lote serializado.
+    """
+    serializar = SERIALIZADORES[formato]
+    colunas = campos or [coluna.name for coluna in modelo.__table__.columns]
+
+    query = select(*(modelo.__table__.c[coluna] for coluna in colunas)).order_by(modelo.id)
+    if ultimo_id is not None:
+        query = query.where(modelo.id > ultimo_id)
+
+    with Session(bind=db.get_bind()) as sessao:
+        resultado = sessao.execute(query.execution_options(yield_per=tamanho_lote))
+
+        primeiro_lote = True
+        for linhas in resultado.partitions():
+            yield serializar(colunas, linhas, primeiro_lote)
+            primeiro_lote = False
+
+        # Tabela vazia: o CSV ainda leva o cabeçalho
+        if primeiro_lote and formato == TIPO_CSV:
+            yield serializar(colunas, [], primeiro_lote)
+
+
+def resposta_streaming(db, modelo, formato, response: Response, ultimo_id=None, campos=None):
+    """Cria a resposta que envia a tabela inteira em streaming, no formato pedido.
+
+    Uma `Response` retornada pela rota não recebe os cabeçalhos definidos nas dependências
+    (ETag, Cache-Control), então eles são copiados de `response`.
+
+    Args:
+        db: Sessão do banco de dados da requisição.
+        modelo: O modelo ORM da tabela.
+        formato (str): Retorno de `formato_streaming`.
+        response (Response): A resposta da rota, com os cabeçalhos das dependências.
+        ultimo_id (int, optional): Retorna apenas as linhas com ID maior. Defaults to None.
+        campos (list[str], optional): Retorno de `campos_projecao`. Defaults to None (todas as colunas).
+
+    Returns:
+        StreamingResponse: A resposta com a tabela.
+    """
+    cabecalhos = dict(response.headers)
+    if formato == TIPO_CSV:
+        cabecalhos['Content-Disposition'] = f'attachment; filename="{modelo.__tablename__}.csv"'
+
+    return StreamingResponse(
+        gerar_lotes(db, modelo, formato, ultimo_id, campos),
+        media_type=f'{formato}; charset=utf-8',
+        headers=cabecalhos,
+    )
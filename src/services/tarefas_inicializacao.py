@@ -0,0 +1,173 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAXIMO_TAREFAS_REGISTRADAS = 50
+
+# Executor dedicado às cargas: uma carga por vez, fora do event loop do servidor
+EXECUTOR_TAREFAS = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inicializacao')
+
+
+class TarefaInicializacao:
+    """
+    Acompanha a execução de uma carga do banco de dados em segundo plano.
+
+    Os métodos podem ser chamados ao mesmo tempo pela thread da carga e pelas requisições
+    que consultam o andamento.
+
+    Attributes:
+        id (str): Identificador da tarefa.
+        status (str): 'pendente', 'executando', 'concluida' ou 'erro'.
+        tabelas (dict): Andamento por tabela ({'etapa', 'linhas', 'inicio', 'fim'}).
+        resultado (dict | None): Resumo da carga de cada tabela, quando concluída.
+        erro (str | None): Mensagem do erro, se a carga falhou.
+        medicao (MedicaoIngestao | None): Medições das etapas da carga, se houver.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'pendente'
+        self.tabelas = {}
+        self.resultado = None
+        self.erro = None
+        self.medicao = None
+        self.criada_em = time.time()
+        self.inicio = None
+        self.fim = None
+        self.trava = threading.Lock()
+
+    def atualizar(self, tabela, etapa=None, linhas=0):
+        """Registra o andamento da carga de uma tabela.
+
+        Args:
+            tabela (str): Nome da tabela.
+            etapa (str, optional): Nova etapa da tabela ('baixando', 'processando', 'concluida',
+                'inalterada' ou 'erro'). Defaults to None (mantém a etapa atual).
+            linhas (int, optional): Quantidade de linhas processadas desde a última atualização. Defaults to 0.
+        """
+        with self.trava:
+            andamento = self.tabelas.setdefault(
+                tabela, {'etapa': 'aguardando', 'linhas': 0, 'inicio': None, 'fim': None}
+            )
+
+            if etapa is not None:
+                andamento['etapa'] = etapa
+                if andamento['inicio'] is None:
+                    andamento['inicio'] = time.time()
+                if etapa in ('concluida', 'inalterada', 'erro'):
+                    andamento['fim'] = time.time()
+
+            andamento['linhas'] += linhas
+
+    def executar(self, funcao, *args, **kwargs):
+        """Executa a carga, registrando o início, o fim e o resultado ou erro da tarefa.
+
+        Args:
+            funcao (Callable): Função que realiza a carga e retorna o resumo por tabela.
+            *args: Argumentos posicionais de `funcao`.
+            **kwargs: Argumentos nomeados de `funcao`.
+        """
+        with self.trava:
+            self.status = 'executando'
+            self.inicio = time.time()
+
+        try:
+            resultado = funcao(*args, **kwargs)
+
+        except Exception as e:
+            print(e)
+            with self.trava:
+                for andamento in self.tabelas.values():
+                    if andamento['fim'] is None and andamento['inicio'] is not None:
+                        andamento['etapa'] = 'erro'
+                        andamento['fim'] = time.time()
+                self.status = 'erro'
+                self.erro = str(e)
+                self.fim = time.time()
+            return
+
+        with self.trava:
+            self.status = 'concluida'
+            self.resultado = resultado
+            self.fim = time.time()
+
+    def para_dict(self):
+        """Monta a representação da tarefa retornada pela API.
+
+        Returns:
+            dict: Status, andamento por tabela (com o tempo decorrido em segundos), medições das etapas,
+                resultado e erro.
+        """
+        agora = time.time()
+
+        def decorrido(inicio, fim):
+            if inicio is None:
+                return 0.0
+            return round((fim or agora) - inicio, 3)
+
+        with self.trava:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'tempo_decorrido': decorrido(self.inicio, self.fim),
+                'tabelas': {
+                    tabela: {
+                        'etapa': andamento['etapa'],
+                        'linhas': andamento['linhas'],
+                        'tempo_decorrido': decorrido(andamento['inicio'], andamento['fim']),
+                    }
+                    for tabela, andamento in self.tabelas.items()
+                },
+                'etapas': self.medicao.resumo() if self.medicao is not None else [],
+                'resultado': self.resultado,
+                'erro': self.erro,
+            }
+
+
+_tarefas = OrderedDict()
+_trava_tarefas = threading.Lock()
+
+
+def iniciar_tarefa(funcao, *args, executor=EXECUTOR_TAREFAS, **kwargs):
+    """Cria uma tarefa e agenda a carga no executor dedicado.
+
+    A tarefa é passada para `funcao` no argumento `tarefa`, para que ela informe o andamento.
+
+    Args:
+        funcao (Callable): Função que realiza a carga.
+        *args: Argumentos posicionais de `funcao`.
+        executor (Executor, optional): Executor onde a carga é executada. Defaults to EXECUTOR_TAREFAS.
+        **kwargs: Argumentos nomeados de `funcao`.
+
+    Returns:
+        TarefaInicializacao: A tarefa criada.
+    """
+    tarefa = TarefaInicializacao()
+
+    with _trava_tarefas:
+        _tarefas[tarefa.id] = tarefa
+
+        # Descarta as tarefas finalizadas mais antigas
+        finalizadas = [id_tarefa for id_tarefa, antiga in _tarefas.items() if antiga.status in ('concluida', 'erro')]
+        for id_tarefa in finalizadas[:max(0, len(_tarefas) - MAXIMO_TAREFAS_REGISTRADAS)]:
+            del _tarefas[id_tarefa]
+
+    executor.submit(tarefa.executar, funcao, *args, tarefa=tarefa, **kwargs)
+
+    return tarefa
+
+
+def obter_tarefa(id_tarefa):
+    """Busca uma tarefa pelo identificador.
+
+    Args:
+        id_tarefa (str): Identificador retornado por `iniciar_tarefa`.
+
+    Returns:
+        TarefaInicializacao | None: A tarefa, ou None se não existir.
+    """
+    with _trava_tarefas:
+        return _tarefas.get(id_tarefa)
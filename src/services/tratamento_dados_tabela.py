@@ -1,5 +1,12 @@
+import re
+
 import pandas as pd
 
+from src.services.metricas_ingestao import medir_etapa
+
+
+PADRAO_DIGITOS_PONTOS = re.compile(r'[\d.]+')
+
 
 def montar_json_result(elemento: dict, anos: list[str]) -> dict:
     """
@@ -25,6 +32,9 @@ def transformar_em_formato(json_dados: list[dict], nome_coluna: str) -> list[dic
     """
     Transforma uma lista de dicionários em um formato específico com categorias e subitens.
 
+    Mantida por compatibilidade: a carga das tabelas usa `agrupar_categorias`, que trabalha
+    diretamente sobre o DataFrame sem montar estruturas aninhadas.
+
     Args:
         json_dados (list[dict]): Lista de dicionários contendo dados de produtos ou categorias.
         nome_coluna (str): Nome da coluna que identifica o produto ou categoria.
@@ -33,28 +43,197 @@ def transformar_em_formato(json_dados: list[dict], nome_coluna: str) -> list[dic
         list[dict]: Lista de dicionários formatados com categorias e seus respectivos subitens.
     """
     result_json_formatado = []
-    categoria_atual = None
-    for item in json_dados:
-        if str(item[nome_coluna]).isupper() or str(item[nome_coluna]).upper() == 'SEM CLASSIFICACAO':
-            # Se o produto está em maiúsculo, é uma nova categoria
-            if categoria_atual:
-                # Se já havia uma categoria, adicionamos ela ao resultado
-                result_json_formatado.append(categoria_atual)
+    eh_categoria = mascara_categorias(pd.Series([item[nome_coluna] for item in json_dados], dtype=object))
 
-            # Inicializa uma nova categoria
+    for item, categoria in zip(json_dados, eh_categoria):
+        if categoria:
+            # Se o produto está em maiúsculo, é uma nova categoria
             categoria_atual = item.copy()
             categoria_atual[f'lista_{nome_coluna}'] = []
-        else:
+            result_json_formatado.append(categoria_atual)
+        elif result_json_formatado:
             # Adiciona o produto à lista de produtos da categoria atual
-            categoria_atual[f'lista_{nome_coluna}'].append(item)
-
-        # Adiciona última categoria ao resultado
-    if categoria_atual:
-        result_json_formatado.append(categoria_atual)
+            result_json_formatado[-1][f'lista_{nome_coluna}'].append(item)
 
     return result_json_formatado
 
 
+def mascara_categorias(nomes: pd.Series) -> pd.Series:
+    """
+    Identifica as linhas que são cabeçalhos de categoria (nome em maiúsculo ou 'Sem classificacao').
+
+    Args:
+        nomes (pd.Series): Os valores da coluna que identifica o produto ou categoria.
+
+    Returns:
+        pd.Series: Série booleana, True nas linhas de categoria.
+    """
+    nomes = nomes.astype(str)
+    return nomes.str.isupper() | nomes.str.upper().eq('SEM CLASSIFICACAO')
+
+
+def agrupar_categorias(df: pd.DataFrame, nome_coluna: str, coluna_categoria: str = 'categoria') -> pd.DataFrame:
+    """
+    Associa cada produto à categoria imediatamente acima dele e remove as linhas de categoria.
+
+    A soma acumulada da máscara de categorias numera os grupos, e cada produto recebe o
+    nome do cabeçalho do seu grupo. Produtos anteriores à primeira categoria são descartados.
+
+    Args:
+        df (pd.DataFrame): O DataFrame com categorias e produtos intercalados.
+        nome_coluna (str): Nome da coluna que identifica o produto ou categoria.
+        coluna_categoria (str, optional): Nome da coluna criada com a categoria. Defaults to 'categoria'.
+
+    Returns:
+        pd.DataFrame: Apenas as linhas de produtos, com a coluna de categoria na primeira posição.
+    """
+    eh_categoria = mascara_categorias(df[nome_coluna])
+    grupo = eh_categoria.cumsum()
+    rotulos = df.loc[eh_categoria, nome_coluna].to_numpy()
+    produtos = ~eh_categoria & (grupo > 0)
+
+    agrupado = df.loc[produtos]
+    agrupado.insert(0, coluna_categoria, rotulos[grupo[produtos].to_numpy() - 1])
+
+    return agrupado
+
+
+COLUNAS_VALOR = {
+    'producao': 'valor_producao',
+    'processamento': 'valor_processamento',
+    'comercializacao': 'litros_comercializacao',
+}
+
+
+def empilhar_anos(df: pd.DataFrame, colunas_indice: list[str], colunas_anos: list[str], nome_valor: str) -> pd.DataFrame:
+    """
+    Converte as colunas de anos de um DataFrame largo em linhas (formato longo).
+
+    As linhas resultantes seguem a ordem original: todos os anos de uma linha antes da próxima.
+
+    Args:
+        df (pd.DataFrame): O DataFrame no formato largo (uma coluna por ano).
+        colunas_indice (list[str]): Colunas que identificam cada linha (ex: categoria e nome).
+        colunas_anos (list[str]): Colunas de anos a serem convertidas em linhas.
+        nome_valor (str): Nome da coluna que receberá os valores.
+
+    Returns:
+        pd.DataFrame: DataFrame com as colunas de `colunas_indice`, 'ano' e `nome_valor`.
+    """
+    valores = df.set_index(colunas_indice)[colunas_anos]
+    valores.columns = pd.Index([str(ano) for ano in colunas_anos], name='ano')
+
+    return valores.stack(future_stack=True).reset_index(name=nome_valor)
+
+
+def formato_longo(
+        df: pd.DataFrame,
+        nome_tabela: str,
+        nome_coluna: str,
+        super_categoria: str = None
+) -> pd.DataFrame:
+    """
+    Converte o DataFrame de um arquivo da EMBRAPA (uma coluna por ano) em uma linha por produto e ano.
+
+    O resultado tem exatamente as colunas da tabela de destino (sem o id), pronto para a inserção em lote.
+
+    Args:
+        df (pd.DataFrame): O DataFrame já tratado, no formato largo.
+        nome_tabela (str): O nome da tabela de destino.
+        nome_coluna (str): Nome da coluna que identifica o produto, categoria ou país.
+        super_categoria (str, optional): Nome da super categoria do arquivo. Defaults to None.
+
+    Returns:
+        pd.DataFrame: O DataFrame no formato longo.
+    """
+    with medir_etapa('formato_longo', linhas_entrada=len(df)) as contagens:
+        colunas_dados = [coluna for coluna in df.columns if coluna not in ('id', nome_coluna)]
+
+        if nome_tabela == 'exportacao' or nome_tabela == 'importacao':
+            # Colunas '1970', '1971', ... trazem a quantidade e '1970.1', '1971.1', ... o valor
+            colunas_quantidade = [coluna for coluna in colunas_dados if '.' not in coluna]
+            colunas_valor = [coluna for coluna in colunas_dados if '.' in coluna]
+            quantidade_anos = min(len(colunas_quantidade), len(colunas_valor))
+
+            base = pd.DataFrame({'nome': df[nome_coluna].astype(str).str.strip()})
+            anos = colunas_quantidade[:quantidade_anos]
+
+            quantidades = empilhar_anos(
+                pd.concat([base, df[anos]], axis=1), ['nome'], anos, 'quantidade'
+            )
+            valores = df[colunas_valor[:quantidade_anos]].set_axis(anos, axis=1)
+            valores = empilhar_anos(pd.concat([base, valores], axis=1), ['nome'], anos, 'valor')
+
+            longo = pd.DataFrame({
+                'categoria': str(super_categoria).strip(),
+                'nome': quantidades['nome'],
+                'ano': quantidades['ano'],
+                'quantidade': pd.to_numeric(quantidades['quantidade']).astype('int64'),
+                'valor': pd.to_numeric(valores['valor']).astype('float64'),
+            })
+            contagens['linhas_saida'] = len(longo)
+            return longo
+
+        # Linhas em maiúsculo são categorias; os produtos abaixo delas pertencem a essa categoria
+        agrupado = agrupar_categorias(df[[nome_coluna] + colunas_dados], nome_coluna, coluna_categoria='_categoria')
+
+        base = pd.DataFrame({
+            'categoria': agrupado['_categoria'].astype(str).str.strip(),
+            'nome': agrupado[nome_coluna].astype(str).str.strip(),
+        })
+        nome_valor = COLUNAS_VALOR[nome_tabela]
+
+        longo = empilhar_anos(
+            pd.concat([base, agrupado[colunas_dados]], axis=1), ['categoria', 'nome'], colunas_dados, nome_valor
+        )
+        longo[nome_valor] = pd.to_numeric(longo[nome_valor]).astype('float64')
+
+        if nome_tabela == 'processamento':
+            longo = longo.rename(columns={'categoria': 'sub_categoria'})
+            longo.insert(0, 'categoria', str(super_categoria).strip())
+
+        contagens['linhas_saida'] = len(longo)
+
+    return longo
+
+
+def formato_longo_em_blocos(
+        blocos,
+        nome_tabela: str,
+        nome_coluna: str,
+        super_categoria: str = None
+):
+    """
+    Aplica `formato_longo` em cada bloco de linhas de um arquivo, mantendo a categoria entre os blocos.
+
+    Um produto no início de um bloco pertence à última categoria do bloco anterior; para isso,
+    essa categoria é repetida como primeira linha do bloco seguinte (e descartada pelo agrupamento).
+
+    Args:
+        blocos (Iterable[pd.DataFrame]): Blocos consecutivos do DataFrame já tratado, no formato largo.
+        nome_tabela (str): O nome da tabela de destino.
+        nome_coluna (str): Nome da coluna que identifica o produto, categoria ou país.
+        super_categoria (str, optional): Nome da super categoria do arquivo. Defaults to None.
+
+    Yields:
+        pd.DataFrame: O formato longo de cada bloco.
+    """
+    agrupa_categorias = nome_tabela not in ('exportacao', 'importacao')
+    categoria_atual = None
+
+    for df in blocos:
+        if agrupa_categorias:
+            if categoria_atual is not None:
+                cabecalho = pd.DataFrame([{nome_coluna: categoria_atual}], columns=df.columns)
+                df = pd.concat([cabecalho, df], ignore_index=True)
+
+            eh_categoria = mascara_categorias(df[nome_coluna])
+            if eh_categoria.any():
+                categoria_atual = df.loc[eh_categoria, nome_coluna].iloc[-1]
+
+        yield formato_longo(df, nome_tabela, nome_coluna, super_categoria)
+
+
 def dataframe_para_json(dataframe: pd.DataFrame) -> list[dict]:
     """
     Converte um DataFrame pandas em uma lista de dicionários JSON.
@@ -73,7 +252,8 @@ def trata_df_sem_colunas(
         df: pd.DataFrame,
         novas_colunas: list[str],
         coluna_eliminar: str,
-        coluna_principal: str
+        coluna_principal: str,
+        incluir_cabecalho: bool = True
 ) -> pd.DataFrame:
     """
     Processa um DataFrame, adicionando novas colunas com anos e formatando a coluna principal.
@@ -83,30 +263,30 @@ def trata_df_sem_colunas(
         novas_colunas (list[str]): Lista para armazenar os nomes das novas colunas (anos).
         coluna_eliminar (str): Nome da coluna a ser eliminada do DataFrame.
         coluna_principal (str): Nome da coluna principal a ser formatada.
+        incluir_cabecalho (bool, optional): Se True, a linha lida como título volta a ser a primeira
+            linha de dados. Use False nos blocos seguintes de um arquivo lido em partes. Defaults to True.
 
     Returns:
         pd.DataFrame: O DataFrame processado com as novas colunas e formatação.
         """
-    acumulador = 1970
-    range_colunas = len(df.columns) - 3
-    for i in range(range_colunas):
-        novas_colunas.append(str(acumulador + i))
-
-    # Criar um DataFrame vazio com as novas colunas
-    novo_df = pd.DataFrame(columns=novas_colunas)
+    with medir_etapa('trata_df_sem_colunas', linhas_entrada=len(df)) as contagens:
+        acumulador = 1970
+        range_colunas = len(df.columns) - 3
+        for i in range(range_colunas):
+            novas_colunas.append(str(acumulador + i))
 
-    valores_linha_1 = df.columns.tolist()
+        # O arquivo não tem cabeçalho: a linha lida como título volta a ser a primeira linha de dados
+        linhas_dados = df.set_axis(novas_colunas, axis=1).astype(object)
 
-    novo_df.loc[0] = valores_linha_1
-
-    for i in range(df.shape[0]):
-        if i == 0:
-            novo_df.loc[1] = df.loc[i].values
+        if incluir_cabecalho:
+            linha_cabecalho = pd.DataFrame([df.columns.tolist()], columns=novas_colunas, dtype=object)
+            novo_df = pd.concat([linha_cabecalho, linhas_dados], ignore_index=True)
         else:
-            novo_df.loc[i + 1] = df.loc[i].values
+            novo_df = linhas_dados.reset_index(drop=True)
+
+        novo_df = novo_df.drop(columns=[coluna_eliminar])
 
-    novo_df = novo_df.drop(columns=[coluna_eliminar])
+        novo_df[coluna_principal] = novo_df[coluna_principal].replace(PADRAO_DIGITOS_PONTOS, '', regex=True)
+        contagens['linhas_saida'] = len(novo_df)
 
-    novo_df[coluna_principal] = novo_df[coluna_principal].replace('\d+', '', regex=True)
-    novo_df[coluna_principal] = novo_df[coluna_principal].replace('\.', '', regex=True)
     return novo_df
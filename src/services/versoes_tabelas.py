@@ -0,0 +1,193 @@
+"""
+Versão dos dados de cada tabela, usada nos ETags e nas respostas condicionais (304) das rotas de leitura.
+
+As versões ficam na tabela `versoes_tabelas` do banco. A versão de uma tabela é incrementada na mesma
+transação de cada POST, PUT ou DELETE da rota da tabela, e ao final de cada carga (`Inicializacao.carregar`),
+inclusive das feitas pelo `python -m src.ingest` ou por outro worker da API. O ETag de uma leitura é
+derivado da versão, da URL e do cabeçalho Accept, de modo que um `If-None-Match` com o ETag atual é
+respondido com 304 sem consultar os dados.
+
+Cada processo guarda as versões na memória e as relê do banco, com uma única consulta para todas as
+tabelas, no máximo uma vez a cada `INTERVALO_VERSOES` segundos (variável de ambiente, padrão 1): uma
+alteração feita por outro processo é vista depois desse intervalo. As escritas do próprio processo
+passam a valer assim que a transação é confirmada.
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from src.models.models_db import VersaoTabela
+
+
+CACHE_CONTROL_PADRAO = os.environ.get('CACHE_CONTROL_TABELAS', 'no-cache')
+
+INTERVALO_VERSOES = float(os.environ.get('INTERVALO_VERSOES', 1))
+
+# Chave, em `Session.info`, das versões incrementadas na transação e ainda não confirmadas
+VERSOES_PENDENTES = 'versoes_pendentes'
+
+_versoes = {}
+_lidas_em = None
+_trava = threading.Lock()
+
+
+def versao_tabela(tabela: str) -> int:
+    """Retorna a versão dos dados de uma tabela conhecida por este processo.
+
+    Args:
+        tabela (str): Nome da tabela.
+
+    Returns:
+        int: A versão, começando em 0.
+    """
+    with _trava:
+        return _versoes.get(tabela, 0)
+
+
+def atualizar_versoes(db, forcar: bool = False) -> bool:
+    """Relê do banco as versões de todas as tabelas, se a última leitura tiver mais de `INTERVALO_VERSOES` segundos.
+
+    Args:
+        db: Sessão do banco de dados.
+        forcar (bool, optional): Se True, relê as versões mesmo dentro do intervalo. Defaults to False.
+
+    Returns:
+        bool: True se as versões foram relidas.
+    """
+    global _lidas_em
+
+    agora = time.monotonic()
+    with _trava:
+        if not forcar and _lidas_em is not None and agora - _lidas_em < INTERVALO_VERSOES:
+            return False
+        # Marcada antes da consulta, para que as requisições simultâneas não releiam todas ao mesmo tempo
+        _lidas_em = agora
+
+    versoes = db.execute(select(VersaoTabela.tabela, VersaoTabela.versao)).all()
+
+    with _trava:
+        for tabela, versao in versoes:
+            # Uma escrita confirmada durante a leitura pode já ter registrado uma versão mais nova
+            _versoes[tabela] = max(_versoes.get(tabela, 0), versao)
+
+    return True
+
+
+def incrementar_versao(tabela: str, db) -> int:
+    """Incrementa a versão de uma tabela na transação da sessão, invalidando os ETags emitidos até aqui.
+
+    A nova versão passa a valer neste processo no commit da sessão, e é descartada em um rollback.
+
+    Args:
+        tabela (str): Nome da tabela.
+        db: Sessão do banco de dados, na transação da escrita.
+
+    Returns:
+        int: A nova versão.
+    """
+    atualizacao = update(VersaoTabela).where(VersaoTabela.tabela == tabela).values(versao=VersaoTabela.versao + 1)
+    if db.execute(atualizacao).rowcount == 0:
+        db.execute(insert(VersaoTabela).values(tabela=tabela, versao=1))
+
+    versao = db.execute(select(VersaoTabela.versao).where(VersaoTabela.tabela == tabela)).scalar_one()
+    db.info.setdefault(VERSOES_PENDENTES, {})[tabela] = versao
+
+    return versao
+
+
+@event.listens_for(Session, 'after_commit')
+def confirmar_versoes(sessao):
+    pendentes = sessao.info.pop(VERSOES_PENDENTES, None)
+    if pendentes:
+        with _trava:
+            _versoes.update(pendentes)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def descartar_versoes(sessao, transacao):
+    # Depois do commit as versões já foram aplicadas; em um rollback (ou ao fechar a sessão) são descartadas
+    if transacao.parent is None:
+        sessao.info.pop(VERSOES_PENDENTES, None)
+
+
+def limpar_versoes():
+    """Esquece as versões guardadas na memória (ex.: ao trocar de banco); a próxima leitura as relê."""
+    global _lidas_em
+
+    with _trava:
+        _versoes.clear()
+        _lidas_em = None
+
+
+def gerar_etag(tabela: str, versao: int, request: Request) -> str:
+    """Gera o ETag de uma leitura a partir da versão da tabela, da URL e do cabeçalho Accept.
+
+    Args:
+        tabela (str): Nome da tabela.
+        versao (int): Retorno de `versao_tabela`.
+        request (Request): A requisição.
+
+    Returns:
+        str: O ETag, entre aspas.
+    """
+    parametros = sorted(request.query_params.multi_items())
+    chave = f'{request.url.path}?{parametros}|{request.headers.get("accept", "")}'
+    resumo = hashlib.sha1(chave.encode()).hexdigest()[:16]
+
+    return f'"{tabela}-{versao}-{resumo}"'
+
+
+def etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara o cabeçalho If-None-Match com um ETag (comparação fraca, como pede o RFC 9110).
+
+    Args:
+        if_none_match (str | None): O cabeçalho If-None-Match da requisição.
+        etag (str): O ETag atual.
+
+    Returns:
+        bool: True se algum dos ETags informados corresponder ao atual.
+    """
+    if not if_none_match:
+        return False
+
+    etags = [valor.strip() for valor in if_none_match.split(',')]
+    return '*' in etags or etag in (valor.removeprefix('W/') for valor in etags)
+
+
+def versionar(tabela: str, get_db, cache_control: Optional[str] = None):
+    """Cria a dependência que adiciona ETag e Cache-Control a uma rota de leitura da tabela.
+
+    Se o `If-None-Match` da requisição corresponder ao ETag atual, a rota não é executada e a
+    resposta é 304 Not Modified.
+
+    Args:
+        tabela (str): Nome da tabela lida pela rota.
+        get_db (Callable): A dependência que fornece a sessão do banco, usada para reler as versões.
+        cache_control (str, optional): Valor do Cache-Control da rota.
+            Defaults to None (variável `CACHE_CONTROL_<TABELA>` ou `CACHE_CONTROL_TABELAS`, e 'no-cache').
+
+    Returns:
+        Callable: A dependência, para uso em `dependencies=[Depends(...)]`.
+    """
+    cache_control = cache_control or os.environ.get(f'CACHE_CONTROL_{tabela.upper()}', CACHE_CONTROL_PADRAO)
+
+    def verificar_versao(request: Request, response: Response, db=Depends(get_db)):
+        atualizar_versoes(db)
+
+        # A versão é lida antes da consulta: se a tabela mudar durante a leitura, o ETag já nasce antigo
+        etag = gerar_etag(tabela, versao_tabela(tabela), request)
+        cabecalhos = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept'}
+
+        if etag_corresponde(request.headers.get('if-none-match'), etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+
+        response.headers.update(cabecalhos)
+        return etag
+
+    return verificar_versao
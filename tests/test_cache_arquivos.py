@@ -0,0 +1,150 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.dependencies.cache_arquivos import CacheArquivos
+from src.dependencies.importacao_dados import download_condicional
+from src.routes.inicializacao_banco import Inicializacao
+from src.services.pipeline_ingestao import insercoes_em_pipeline
+
+
+class ArquivosEmbrapaHandler(BaseHTTPRequestHandler):
+    """Serve arquivos CSV com ETag e responde 304 às requisições condicionais."""
+
+    arquivos = {}
+    requisicoes = []
+
+    def do_GET(self):
+        conteudo = self.arquivos[self.path]
+        etag = f'"{hash(conteudo)}"'
+        self.requisicoes.append((self.path, self.headers.get('If-None-Match')))
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Mon, 01 Jan 2024 00:00:00 GMT')
+        self.send_header('Content-Length', str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    ArquivosEmbrapaHandler.arquivos = {
+        '/Producao.csv': b'id;produto;1970\n1;VINHO DE MESA;10\n2;Tinto;5\n',
+        '/ExpVinho.csv': b'Id;Pais;1970;1970\n1;Alemanha;10;20\n',
+        '/ExpUva.csv': b'Id;Pais;1970;1970\n1;Chile;1;2\n',
+    }
+    ArquivosEmbrapaHandler.requisicoes = []
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ArquivosEmbrapaHandler)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{servidor.server_port}'
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def criar_iniciadores(url, cache):
+    producao = Inicializacao('producao', 'produto', None,
+                             [{'super_categoria': None, 'url': f'{url}/Producao.csv'}], ';', cache=cache)
+    exportacao = Inicializacao('exportacao', 'pais', None, [
+        {'super_categoria': 'Vinho_Mesa', 'url': f'{url}/ExpVinho.csv'},
+        {'super_categoria': 'Uva', 'url': f'{url}/ExpUva.csv'},
+    ], ';', cache=cache)
+    return [producao, exportacao]
+
+
+def carregar(url, cache, pipeline=False, forcar=False):
+    tabelas_limpas = []
+    inseridos = []
+
+    def inserir(db, registros, tabela, tamanho_lote):
+        inseridos.append((tabela, len(registros)))
+        return len(registros)
+
+    with patch('src.routes.inicializacao_banco.limpa_tabela', lambda db, tabela: tabelas_limpas.append(tabela)), \
+            patch('src.routes.inicializacao_banco.insercao_dados_em_lote', inserir):
+        iniciadores = criar_iniciadores(url, cache)
+        if pipeline:
+            insercoes_em_pipeline(iniciadores, db=MagicMock(), max_processos=1, forcar=forcar)
+        else:
+            for iniciador in iniciadores:
+                iniciador.insercoes(db=MagicMock(), forcar=forcar)
+    return tabelas_limpas, inseridos
+
+
+def test_download_condicional_usa_etag(servidor, tmp_path):
+    cache = CacheArquivos(tmp_path)
+    url = f'{servidor}/Producao.csv'
+
+    primeiro = download_condicional(url, cache)
+    assert primeiro['alterado'] is True
+    assert cache.ler(primeiro['sha256']) == primeiro['conteudo']
+
+    cache.registrar(url, primeiro['sha256'], etag=primeiro['etag'], last_modified=primeiro['last_modified'])
+    segundo = download_condicional(url, cache)
+
+    assert segundo['alterado'] is False
+    assert segundo['conteudo'] == primeiro['conteudo']
+    assert ArquivosEmbrapaHandler.requisicoes[-1] == ('/Producao.csv', primeiro['etag'])
+
+
+def test_download_condicional_mesmo_conteudo_sem_etag(servidor, tmp_path):
+    cache = CacheArquivos(tmp_path)
+    url = f'{servidor}/Producao.csv'
+    cache.registrar(url, cache.salvar(ArquivosEmbrapaHandler.arquivos['/Producao.csv']))
+
+    assert download_condicional(url, cache)['alterado'] is False
+
+
+def test_indice_persistido_entre_instancias(tmp_path):
+    cache = CacheArquivos(tmp_path)
+    sha256 = cache.salvar(b'conteudo')
+    cache.registrar('http://exemplo/arquivo.csv', sha256, etag='"1"')
+
+    outro = CacheArquivos(tmp_path)
+
+    assert outro.cabecalhos_condicionais('http://exemplo/arquivo.csv') == {'If-None-Match': '"1"'}
+    assert outro.cabecalhos_condicionais('http://exemplo/outro.csv') == {}
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_recarrega_apenas_tabelas_alteradas(servidor, tmp_path, pipeline):
+    cache = CacheArquivos(tmp_path)
+
+    assert carregar(servidor, cache, pipeline) == (
+        ['producao', 'exportacao'], [('producao', 1), ('exportacao', 1), ('exportacao', 1)]
+    )
+
+    # Nada mudou: nenhuma tabela é limpa ou recarregada
+    assert carregar(servidor, cache, pipeline) == ([], [])
+
+    # Um dos arquivos de exportação mudou: a tabela inteira é recarregada
+    ArquivosEmbrapaHandler.arquivos['/ExpUva.csv'] = b'Id;Pais;1970;1970\n1;Chile;1;2\n2;Peru;3;4\n'
+    assert carregar(servidor, cache, pipeline) == (
+        ['exportacao'], [('exportacao', 1), ('exportacao', 2)]
+    )
+
+    assert carregar(servidor, cache, pipeline, forcar=True)[0] == ['producao', 'exportacao']
+
+
+def test_carga_com_erro_nao_atualiza_indice(servidor, tmp_path):
+    cache = CacheArquivos(tmp_path)
+    producao = criar_iniciadores(servidor, cache)[0]
+
+    with patch('src.routes.inicializacao_banco.limpa_tabela', MagicMock()), \
+            patch('src.routes.inicializacao_banco.insercao_dados_em_lote', MagicMock(side_effect=RuntimeError)):
+        with pytest.raises(RuntimeError):
+            producao.insercoes(db=MagicMock())
+
+    assert cache.consultar(f'{servidor}/Producao.csv') is None
+    assert carregar(servidor, cache)[0] == ['producao', 'exportacao']
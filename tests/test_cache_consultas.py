@@ -0,0 +1,166 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.models import models_db as models
+from src.routes import inicializacao_banco, processamento, producao
+from src.routes.inicializacao_banco import Inicializacao
+from src.services import cache_consultas
+from src.services.authentication import get_current_user
+from src.services.cache_consultas import AUSENTE, CacheConsultas, normalizar
+from src.services.versoes_tabelas import versao_tabela
+from tests.test_paginacao import banco, criar_cliente, inserir  # noqa: F401
+from tests.test_versoes_tabelas import incrementar
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = CacheConsultas(ttl=60, maximo_linhas=100)
+    monkeypatch.setattr(cache_consultas, 'CACHE_CONSULTAS', cache)
+    for modulo in (producao, processamento, inicializacao_banco):
+        monkeypatch.setattr(modulo, 'CACHE_CONSULTAS', cache)
+    return cache
+
+
+def consultas_tabela(consultas, tabela):
+    return [sql for sql in consultas if f'FROM {tabela}' in sql]
+
+
+def test_normalizar():
+    class Filtros:
+        def dict(self):
+            return {'nome': 'Tinto', 'ano': None, 'categoria': 'VINHO'}
+
+    assert normalizar(limite=10, ultimo_id=None, campos=['ano']) == (('campos', ('ano',)), ('limite', 10))
+    assert normalizar(campos=None, limite=10) == normalizar(limite=10)
+    assert normalizar(filtros=Filtros()) == (('filtros', (('categoria', 'VINHO'), ('nome', 'Tinto'))),)
+
+
+def test_lru_por_linhas_e_ttl():
+    relogio = Relogio()
+    cache = CacheConsultas(ttl=10, maximo_linhas=5, relogio=relogio)
+    tabela = 'tabela_teste_lru'
+
+    cache.consultar(tabela, 'pagina', ('a',), lambda: ([1, 2], None))
+    cache.consultar(tabela, 'pagina', ('b',), lambda: ([1, 2], None))
+    cache.consultar(tabela, 'pagina', ('a',), lambda: pytest.fail('deveria vir do cache'))
+    cache.consultar(tabela, 'filtragem', ('c',), lambda: [1, 2])
+
+    # 'b' foi o menos usado e saiu para caber 'c'
+    assert [chave[3] for chave in cache.itens] == [('a',), ('c',)]
+    assert cache.total_linhas == 4
+
+    relogio.agora = 11
+    assert cache.obter((tabela, versao_tabela(tabela), 'pagina', ('a',))) is AUSENTE
+    assert (cache.acertos, cache.falhas) == (1, 4)
+
+    # Resultados maiores que o cache inteiro não são guardados
+    cache.consultar(tabela, 'filtragem', ('d',), lambda: list(range(6)))
+    assert ('d',) not in [chave[3] for chave in cache.itens]
+
+
+def test_resultado_vazio_fica_no_cache():
+    cache = CacheConsultas(ttl=10, maximo_linhas=5)
+    chamadas = []
+
+    for _ in range(3):
+        assert cache.consultar('tabela_teste_vazio', 'item', (('id', 9),), lambda: chamadas.append(1)) is None
+
+    assert len(chamadas) == 1
+
+
+def test_versao_nova_descarta_itens(banco):
+    _, sessao_local, _ = banco
+    cache = CacheConsultas(ttl=10, maximo_linhas=50)
+    tabela = 'tabela_teste_versao'
+
+    cache.consultar(tabela, 'filtragem', ('a',), lambda: [1, 2, 3])
+    cache.consultar('outra_tabela_teste', 'filtragem', ('a',), lambda: [1])
+    incrementar(sessao_local, tabela)
+
+    assert cache.consultar(tabela, 'filtragem', ('a',), lambda: [4]) == [4]
+    assert cache.total_linhas == 2
+    assert cache.descartes == 1
+
+
+def test_nao_guarda_resultado_de_versao_substituida(banco):
+    _, sessao_local, _ = banco
+    cache = CacheConsultas(ttl=10, maximo_linhas=50)
+    tabela = 'tabela_teste_corrida'
+
+    def consulta_durante_escrita():
+        incrementar(sessao_local, tabela)
+        return [1]
+
+    cache.consultar(tabela, 'filtragem', (), consulta_durante_escrita)
+
+    assert cache.itens == {}
+
+
+def test_rotas_usam_o_cache(banco, cache):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 30)
+    cliente = criar_cliente(producao, sessao_local)
+
+    for _ in range(3):
+        pagina = cliente.get('/producao', params={'limit': 10, 'fields': 'nome'})
+        item = cliente.get('/producao/5')
+        filtrados = cliente.post('/producao/filtragem', json={'nome': 'Item 3'})
+        ausente = cliente.get('/producao/99')
+
+    assert len(consultas_tabela(consultas, 'producao')) == 4
+    assert (cache.acertos, cache.falhas) == (8, 4)
+    assert pagina.json() == [{'nome': f'Item {i}'} for i in range(10)]
+    assert pagina.headers['x-proximo-cursor']
+    assert item.json()['nome'] == 'Item 4'
+    assert filtrados.json()[0]['id'] == 4
+    assert ausente.status_code == 404
+
+
+def test_escritas_e_cargas_invalidam(banco, cache):
+    _, sessao_local, _ = banco
+    inserir(sessao_local, models.Processamento, 3)
+    cliente = criar_cliente(processamento, sessao_local)
+
+    def nomes():
+        return [linha['nome'] for linha in cliente.get('/processamento').json()]
+
+    assert nomes() == ['Item 0', 'Item 1', 'Item 2']
+
+    cliente.post('/processamento', json={'categoria': 'VINHO', 'nome': 'Novo', 'ano': '1970'})
+    assert nomes()[-1] == 'Novo'
+
+    cliente.put('/processamento/1', json={'categoria': 'VINHO', 'nome': 'Alterado', 'ano': '1970'})
+    assert nomes()[0] == 'Alterado'
+
+    cliente.delete('/processamento/2')
+    assert nomes() == ['Alterado', 'Item 2', 'Novo']
+
+    # Uma carga pelo iniciador também invalida o cache da tabela
+    with sessao_local() as db:
+        Inicializacao('processamento', 'cultivar', None, [], ';').carregar(db, [])
+    assert nomes() == []
+
+
+def test_rota_de_estatisticas(cache):
+    cache.consultar('tabela_teste_rota', 'item', (), lambda: {'id': 1})
+    cache.consultar('tabela_teste_rota', 'item', (), lambda: {'id': 1})
+
+    app = FastAPI()
+    app.include_router(inicializacao_banco.router)
+    app.dependency_overrides[get_current_user] = lambda: {'username': 'teste', 'id': 1}
+
+    estatisticas = TestClient(app).get('/inicializacao/cache').json()
+
+    assert estatisticas['consultas']['acertos'] == 1
+    assert estatisticas['consultas']['falhas'] == 1
+    assert estatisticas['consultas']['taxa_acertos'] == 0.5
+    assert {'acertos', 'falhas', 'bytes'} <= set(estatisticas['compressao'])
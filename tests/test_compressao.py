@@ -0,0 +1,193 @@
+import gzip
+import json
+import threading
+import zlib
+
+import anyio
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from src.models import models_db as models
+from src.routes import exportacao
+from src.services import compressao
+from src.services.compressao import CacheCompressao, CompressaoMiddleware, escolher_codificacao
+from src.services.respostas_streaming import TIPO_NDJSON
+from tests.test_paginacao import banco, criar_cliente  # noqa: F401
+
+
+LINHAS = [{'id': i, 'categoria': 'VINHO DE MESA', 'nome': 'Alemanha', 'ano': '1970', 'valor': 1.5} for i in range(2000)]
+
+
+def criar_app(cache=None, **parametros):
+    app = FastAPI()
+    app.add_middleware(CompressaoMiddleware, cache=cache or CacheCompressao(), **parametros)
+
+    @app.get('/grande')
+    def grande():
+        return LINHAS
+
+    @app.get('/pequena')
+    def pequena():
+        return {'ok': True}
+
+    @app.get('/versionada')
+    def versionada(response: Response):
+        response.headers['ETag'] = '"producao-7"'
+        return LINHAS
+
+    @app.get('/imagem')
+    def imagem():
+        return Response(b'\x89PNG' * 1000, media_type='image/png')
+
+    return app
+
+
+@pytest.mark.parametrize('accept_encoding, disponiveis, esperado', [
+    (None, ['gzip'], None),
+    ('gzip, deflate', ['gzip'], 'gzip'),
+    ('gzip, br', ['zstd', 'br', 'gzip'], 'br'),
+    ('gzip, br, zstd', ['zstd', 'br', 'gzip'], 'zstd'),
+    ('gzip;q=1.0, br;q=0.5', ['br', 'gzip'], 'gzip'),
+    ('br', ['gzip'], None),
+    ('*', ['br', 'gzip'], 'br'),
+    ('*, br;q=0', ['br', 'gzip'], 'gzip'),
+    ('gzip;q=0', ['gzip'], None),
+    ('identity', ['gzip'], None),
+])
+def test_escolher_codificacao(accept_encoding, disponiveis, esperado):
+    assert escolher_codificacao(accept_encoding, disponiveis) == esperado
+
+
+@pytest.mark.parametrize('codificacao, modulo, descomprimir', [
+    ('gzip', None, gzip.decompress),
+    ('br', 'brotli', lambda corpo: __import__('brotli').decompress(corpo)),
+    ('zstd', 'zstandard', lambda corpo: __import__('zstandard').ZstdDecompressor().decompressobj().decompress(corpo)),
+])
+def test_comprimir_e_incremental(codificacao, modulo, descomprimir):
+    if modulo:
+        pytest.importorskip(modulo)
+    corpo = json.dumps(LINHAS).encode()
+
+    compressor = compressao.CompressorIncremental(codificacao)
+    incremental = b''.join(compressor.comprimir(corpo[i:i + 4096]) for i in range(0, len(corpo), 4096))
+    incremental += compressor.finalizar()
+
+    assert descomprimir(compressao.comprimir(corpo, codificacao)) == corpo
+    assert descomprimir(incremental) == corpo
+
+
+def test_comprime_resposta_grande():
+    cliente = TestClient(criar_app())
+
+    resposta = cliente.get('/grande', headers={'Accept-Encoding': 'gzip'})
+
+    assert resposta.headers['content-encoding'] == 'gzip'
+    assert resposta.headers['vary'] == 'Accept-Encoding'
+    assert resposta.json() == LINHAS
+    assert int(resposta.headers['content-length']) < len(json.dumps(LINHAS)) / 10
+
+
+@pytest.mark.parametrize('rota, cabecalhos', [
+    ('/pequena', {'Accept-Encoding': 'gzip'}),
+    ('/imagem', {'Accept-Encoding': 'gzip'}),
+    ('/grande', {'Accept-Encoding': 'identity'}),
+])
+def test_sem_compressao(rota, cabecalhos):
+    resposta = TestClient(criar_app()).get(rota, headers=cabecalhos)
+
+    assert resposta.status_code == 200
+    assert 'content-encoding' not in resposta.headers
+
+
+def test_streaming_comprimido_por_bloco():
+    async def aplicacao(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', TIPO_NDJSON.encode())]})
+        for indice, linha in enumerate(LINHAS):
+            await send({
+                'type': 'http.response.body',
+                'body': json.dumps(linha).encode() + b'\n',
+                'more_body': indice < len(LINHAS) - 1,
+            })
+
+    mensagens = []
+
+    async def enviar(mensagem):
+        mensagens.append(mensagem)
+
+    scope = {'type': 'http', 'path': '/streaming', 'query_string': b'', 'headers': [(b'accept-encoding', b'gzip')]}
+    anyio.run(CompressaoMiddleware(aplicacao, cache=CacheCompressao()), scope, None, enviar)
+
+    cabecalhos = dict(mensagens[0]['headers'])
+    assert cabecalhos[b'content-encoding'] == b'gzip'
+    assert b'content-length' not in cabecalhos
+
+    # Cada linha é enviada ao cliente assim que é gerada, e o todo é um gzip válido
+    blocos = [mensagem['body'] for mensagem in mensagens[1:]]
+    assert len(blocos) == len(LINHAS)
+    assert json.loads(zlib.decompressobj(31).decompress(blocos[0])) == LINHAS[0]
+    assert [json.loads(linha) for linha in gzip.decompress(b''.join(blocos)).splitlines()] == LINHAS
+    assert mensagens[-1]['more_body'] is False
+
+
+def test_cache_da_resposta_versionada(monkeypatch):
+    chamadas = []
+    original = compressao.comprimir
+    monkeypatch.setattr(compressao, 'comprimir', lambda *args: chamadas.append(args[1]) or original(*args))
+    cache = CacheCompressao()
+    cliente = TestClient(criar_app(cache))
+
+    respostas = [cliente.get('/versionada', headers={'Accept-Encoding': 'gzip'}) for _ in range(3)]
+    cliente.get('/grande', headers={'Accept-Encoding': 'gzip'})
+    cliente.get('/grande', headers={'Accept-Encoding': 'gzip'})
+
+    assert all(resposta.json() == LINHAS for resposta in respostas)
+    assert respostas[0].headers['etag'] == 'W/"producao-7"'
+    # A resposta versionada é comprimida uma vez; a sem ETag, a cada requisição
+    assert chamadas == ['gzip'] * 3
+    assert (cache.acertos, cache.falhas) == (2, 1)
+
+
+def test_cache_descarta_menos_usados():
+    cache = CacheCompressao(maximo_bytes=10)
+
+    cache.guardar('a', b'12345')
+    cache.guardar('b', b'12345')
+    cache.obter('a')
+    cache.guardar('c', b'123')
+
+    assert list(cache.itens) == ['a', 'c']
+    assert cache.total_bytes == 8
+
+
+def test_comprime_fora_do_event_loop(monkeypatch):
+    threads = []
+    original = compressao.comprimir
+    monkeypatch.setattr(
+        compressao, 'comprimir', lambda *args: threads.append(threading.current_thread().name) or original(*args)
+    )
+    cliente = TestClient(criar_app(limite_no_loop=1024, tamanho_minimo=10))
+
+    cliente.get('/grande', headers={'Accept-Encoding': 'gzip'})
+    cliente.get('/pequena', headers={'Accept-Encoding': 'gzip'})
+
+    # A resposta grande é comprimida em uma thread de trabalho; a pequena, no próprio loop
+    assert threads[0] != threads[1]
+    assert 'AnyIO' in threads[0] or 'worker' in threads[0].lower()
+
+
+def test_rota_da_tabela_comprimida(banco):
+    _, sessao_local, _ = banco
+    with sessao_local() as db:
+        db.add_all([
+            models.Exportacao(categoria='VINHO', nome='Alemanha', ano=str(1970 + i % 50), quantidade=i, valor=i)
+            for i in range(500)
+        ])
+        db.commit()
+    cliente = criar_cliente(exportacao, sessao_local)
+    cliente.app.add_middleware(CompressaoMiddleware, cache=CacheCompressao())
+
+    resposta = cliente.get('/exportacao', headers={'Accept-Encoding': 'gzip'})
+
+    assert resposta.headers['content-encoding'] == 'gzip'
+    assert len(resposta.json()) == 500
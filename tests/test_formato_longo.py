@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from src.services.funcionalidades_banco import gerar_registros
+from src.services.tratamento_dados_tabela import agrupar_categorias
+from src.services.tratamento_dados_tabela import dataframe_para_json
+from src.services.tratamento_dados_tabela import formato_longo
+from src.services.tratamento_dados_tabela import transformar_em_formato
+
+
+def df_produtos(coluna):
+    return pd.DataFrame({
+        'id': [1, 2, 3, 4, 5, 6],
+        coluna: ['TINTAS', ' Bordo', 'Isabel ', 'Sem classificacao', 'Outros', 'BRANCAS'],
+        '1970': [300, 100, 200, 0, 7, 0],
+        '1971': [400.5, 150, 250.5, 0, 8, 0],
+    })
+
+
+def df_paises():
+    return pd.DataFrame({
+        'id': [1, 2],
+        'pais': ['Alemanha ', 'Argentina'],
+        '1970': [10, 0],
+        '1970.1': [20.5, 0],
+        '1971': [30, 5],
+        '1971.1': [40.5, 7.25],
+    })
+
+
+def caminho_antigo(df, tabela, coluna, super_categoria):
+    if tabela in ('exportacao', 'importacao'):
+        dict_final = dataframe_para_json(df)
+    else:
+        dict_final = transformar_em_formato(dataframe_para_json(df), coluna)
+    return list(gerar_registros(dict_final, coluna, tabela, super_categoria))
+
+
+@pytest.mark.parametrize('tabela, coluna, super_categoria', [
+    ('producao', 'produto', None),
+    ('processamento', 'cultivar', 'Viniferas'),
+    ('comercializacao', 'produto', None),
+    ('exportacao', 'pais', 'Vinho_Mesa'),
+    ('importacao', 'pais', 'Espumante'),
+])
+def test_formato_longo_igual_caminho_antigo(tabela, coluna, super_categoria):
+    df = df_paises() if tabela in ('exportacao', 'importacao') else df_produtos(coluna)
+
+    esperado = caminho_antigo(df.copy(), tabela, coluna, super_categoria)
+    longo = formato_longo(df, tabela, coluna, super_categoria)
+
+    assert longo.to_dict(orient='records') == esperado
+
+
+def test_formato_longo_colunas_producao():
+    longo = formato_longo(df_produtos('produto'), 'producao', 'produto')
+
+    assert list(longo.columns) == ['categoria', 'nome', 'ano', 'valor_producao']
+    assert longo['categoria'].tolist() == ['TINTAS'] * 4 + ['Sem classificacao'] * 2
+    assert longo['nome'].tolist() == ['Bordo', 'Bordo', 'Isabel', 'Isabel', 'Outros', 'Outros']
+    assert longo['ano'].tolist() == ['1970', '1971'] * 3
+
+
+def test_formato_longo_colunas_exportacao():
+    longo = formato_longo(df_paises(), 'exportacao', 'pais', 'Vinho_Mesa')
+
+    assert list(longo.columns) == ['categoria', 'nome', 'ano', 'quantidade', 'valor']
+    assert longo['quantidade'].dtype == 'int64'
+    assert longo.iloc[1].to_dict() == {'categoria': 'Vinho_Mesa', 'nome': 'Alemanha', 'ano': '1971',
+                                       'quantidade': 30, 'valor': 40.5}
+
+
+def test_formato_longo_ignora_produtos_sem_categoria():
+    df = pd.DataFrame({'id': [1, 2], 'produto': ['Tinto', 'VINHO'], '1970': [1, 2]})
+
+    assert formato_longo(df, 'producao', 'produto').empty
+
+
+def test_agrupar_categorias():
+    agrupado = agrupar_categorias(df_produtos('produto'), 'produto')
+
+    assert list(agrupado.columns) == ['categoria', 'id', 'produto', '1970', '1971']
+    assert agrupado['id'].tolist() == [2, 3, 5]
+    assert agrupado['categoria'].tolist() == ['TINTAS', 'TINTAS', 'Sem classificacao']
+
+
+def test_transformar_em_formato_compatibilidade():
+    json_dados = dataframe_para_json(df_produtos('produto'))
+    resultado = transformar_em_formato(json_dados, 'produto')
+
+    assert [categoria['produto'] for categoria in resultado] == ['TINTAS', 'Sem classificacao', 'BRANCAS']
+    assert [len(categoria['lista_produto']) for categoria in resultado] == [2, 1, 0]
+    assert resultado[0]['lista_produto'][0] is json_dados[1]
@@ -0,0 +1,307 @@
+import io
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pymysql
+import pytest
+
+from sqlalchemy import create_engine, event, inspect, select, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import sessionmaker
+
+from src.dependencies.database import Base
+from src.models.models_db import Producao
+from src.services.funcionalidades_banco import MODELOS_TABELAS
+from src.services.funcionalidades_banco import carga_diferencial
+from src.services.funcionalidades_banco import carga_staging
+from src.services.funcionalidades_banco import escrever_tsv
+from src.services.funcionalidades_banco import insercao_load_data
+from src.services.funcionalidades_banco import load_data_disponivel
+from src.services.funcionalidades_banco import gerar_registros
+from src.services.funcionalidades_banco import insercao_dados
+from src.services.funcionalidades_banco import insercao_dados_em_lote
+
+
+def dados_exemplo(tabela):
+    if tabela in ('exportacao', 'importacao'):
+        dict_final = [
+            {'id': 1, 'pais': 'Alemanha ', '1970': 10, '1970.1': 20.5, '1971': 30, '1971.1': 40.5},
+            {'id': 2, 'pais': 'Argentina', '1970': 0, '1970.1': 0.0, '1971': 5, '1971.1': 7.25},
+        ]
+        return dict_final, 'pais', 'Vinho_Mesa'
+
+    coluna = 'cultivar' if tabela == 'processamento' else 'produto'
+    dict_final = [
+        {'id': 1, coluna: 'TINTAS', '1970': 300, '1971': 400, f'lista_{coluna}': [
+            {'id': 2, coluna: 'Bordo', '1970': 100, '1971': 150},
+            {'id': 3, coluna: 'Isabel', '1970': 200, '1971': 250},
+        ]},
+        {'id': 4, coluna: 'BRANCAS', '1970': 10, '1971': 0, f'lista_{coluna}': [
+            {'id': 5, coluna: 'Niagara', '1970': 10, '1971': 0},
+        ]},
+    ]
+    return dict_final, coluna, 'Viniferas'
+
+
+@pytest.fixture
+def sessao():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield db
+    db.close()
+
+
+def linhas_tabela(db, tabela):
+    modelo = MODELOS_TABELAS[tabela]
+    colunas = [coluna for coluna in modelo.__table__.columns if coluna.name != 'id']
+    return [tuple(linha) for linha in db.execute(select(*colunas).order_by(modelo.id)).all()]
+
+
+@pytest.mark.parametrize('tabela', list(MODELOS_TABELAS))
+def test_insercao_em_lote_igual_insercao_orm(tabela):
+    engine_orm = create_engine('sqlite://')
+    engine_lote = create_engine('sqlite://')
+    for engine in (engine_orm, engine_lote):
+        Base.metadata.create_all(bind=engine)
+
+    db_orm = sessionmaker(bind=engine_orm)()
+    dict_final, coluna, super_categoria = dados_exemplo(tabela)
+    insercao_dados(db_orm, dict_final, coluna, tabela, super_categoria)
+
+    db_lote = sessionmaker(bind=engine_lote)()
+    dict_final, coluna, super_categoria = dados_exemplo(tabela)
+    registros = gerar_registros(dict_final, coluna, tabela, super_categoria)
+    total = insercao_dados_em_lote(db_lote, registros, tabela, tamanho_lote=2)
+
+    esperado = linhas_tabela(db_orm, tabela)
+    assert total == len(esperado) > 0
+    assert linhas_tabela(db_lote, tabela) == esperado
+
+
+def test_gerar_registros_exportacao():
+    dict_final, coluna, super_categoria = dados_exemplo('exportacao')
+    registros = list(gerar_registros(dict_final, coluna, 'exportacao', super_categoria))
+
+    assert registros[0] == {'categoria': 'Vinho_Mesa', 'nome': 'Alemanha', 'ano': '1970', 'quantidade': 10,
+                            'valor': 20.5}
+    assert registros[-1] == {'categoria': 'Vinho_Mesa', 'nome': 'Argentina', 'ano': '1971', 'quantidade': 5,
+                             'valor': 7.25}
+
+
+def test_insercao_em_lote_respeita_tamanho_lote(sessao):
+    execucoes = []
+
+    @event.listens_for(sessao.get_bind(), 'before_cursor_execute')
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT'):
+            execucoes.append(len(parameters) if executemany else 1)
+
+    registros = [{'categoria': 'VINHO', 'nome': f'Produto {i}', 'ano': '1970', 'valor_producao': float(i)}
+                 for i in range(25)]
+
+    total = insercao_dados_em_lote(sessao, registros, 'producao', tamanho_lote=10)
+
+    assert total == 25
+    assert execucoes == [10, 10, 5]
+    assert len(linhas_tabela(sessao, 'producao')) == 25
+
+
+def test_insercao_em_lote_desfaz_transacao_em_erro(sessao):
+    registros = [
+        {'categoria': 'VINHO', 'nome': 'Tinto', 'ano': '1970', 'valor_producao': 1.0},
+        {'categoria': 'VINHO', 'nome': 'Branco', 'ano': '1970', 'valor_producao': object()},
+    ]
+
+    with pytest.raises(Exception):
+        insercao_dados_em_lote(sessao, registros, 'producao', tamanho_lote=1)
+
+    assert linhas_tabela(sessao, 'producao') == []
+
+
+def registros_producao(valores):
+    return pd.DataFrame(
+        [{'categoria': 'VINHO', 'nome': nome, 'ano': ano, 'valor_producao': valor} for nome, ano, valor in valores]
+    )
+
+
+def test_carga_diferencial_aplica_apenas_diferencas(sessao):
+    inicial = registros_producao([('Tinto', '1970', 1.0), ('Branco', '1970', 2.0), ('Rosado', '1970', 3.0),
+                                  ('Tinto', '1971', 4.0), ('Tinto', '1971', 5.0)])
+
+    assert carga_diferencial(sessao, inicial, 'producao') == {
+        'inseridas': 5, 'atualizadas': 0, 'removidas': 0, 'inalteradas': 0
+    }
+    ids_iniciais = dict(zip(linhas_tabela(sessao, 'producao'), sessao.scalars(select(Producao.id)).all()))
+
+    # Rosado sai, Branco muda de valor, Suco entra e a segunda ocorrência repetida de Tinto 1971 muda
+    novo = registros_producao([('Tinto', '1970', 1.0), ('Branco', '1970', 2.5), ('Tinto', '1971', 4.0),
+                               ('Tinto', '1971', 6.0), ('Suco', '1970', 7.0)])
+    eventos = []
+
+    @event.listens_for(sessao.get_bind(), 'before_cursor_execute')
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        eventos.append(statement.split()[0])
+
+    assert carga_diferencial(sessao, novo, 'producao', tamanho_lote=1) == {
+        'inseridas': 1, 'atualizadas': 2, 'removidas': 1, 'inalteradas': 2
+    }
+    assert 'DELETE' in eventos and not any('TRUNCATE' in evento for evento in eventos)
+
+    linhas = linhas_tabela(sessao, 'producao')
+    assert sorted(linhas) == sorted(novo.itertuples(index=False, name=None))
+
+    # Linhas inalteradas mantêm o id original
+    ids = dict(zip(linhas, sessao.scalars(select(Producao.id).order_by(Producao.id)).all()))
+    assert ids[('VINHO', 'Tinto', '1970', 1.0)] == ids_iniciais[('VINHO', 'Tinto', '1970', 1.0)]
+
+    assert carga_diferencial(sessao, novo, 'producao') == {
+        'inseridas': 0, 'atualizadas': 0, 'removidas': 0, 'inalteradas': 5
+    }
+
+
+def test_carga_diferencial_tabela_com_sub_categoria(sessao):
+    inicial = pd.DataFrame([
+        {'categoria': 'Viniferas', 'sub_categoria': 'TINTAS', 'nome': 'Bordo', 'ano': '1970',
+         'valor_processamento': 1.0},
+        {'categoria': 'Viniferas', 'sub_categoria': 'BRANCAS', 'nome': 'Bordo', 'ano': '1970',
+         'valor_processamento': 1.0},
+    ])
+    carga_diferencial(sessao, inicial, 'processamento')
+
+    novo = inicial.copy()
+    novo.loc[1, 'valor_processamento'] = 9.0
+
+    assert carga_diferencial(sessao, novo, 'processamento') == {
+        'inseridas': 0, 'atualizadas': 1, 'removidas': 0, 'inalteradas': 1
+    }
+    assert linhas_tabela(sessao, 'processamento') == list(novo.itertuples(index=False, name=None))
+
+
+def test_carga_diferencial_desfaz_transacao_em_erro(sessao):
+    carga_diferencial(sessao, registros_producao([('Tinto', '1970', 1.0)]), 'producao')
+
+    novo = registros_producao([('Branco', '1970', object())])
+    with pytest.raises(Exception):
+        carga_diferencial(sessao, novo, 'producao')
+
+    assert linhas_tabela(sessao, 'producao') == [('VINHO', 'Tinto', '1970', 1.0)]
+
+
+def test_carga_staging_troca_tabela_sem_expor_carga_parcial(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "banco.db"}')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    leitor = create_engine(f'sqlite:///{tmp_path / "banco.db"}')
+
+    antigos = [{'categoria': 'VINHO', 'nome': f'Antigo {i}', 'ano': '1970', 'valor_producao': 1.0} for i in range(3)]
+    insercao_dados_em_lote(db, antigos, 'producao')
+
+    lidos_durante_carga = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def ler_durante_carga(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT'):
+            with leitor.connect() as conexao:
+                lidos_durante_carga.append(conexao.execute(text('SELECT COUNT(*) FROM producao')).scalar())
+
+    novos = [{'categoria': 'VINHO', 'nome': f'Novo {i}', 'ano': '1970', 'valor_producao': 2.0} for i in range(25)]
+    assert carga_staging(db, iter(novos), 'producao', tamanho_lote=10) == 25
+
+    assert lidos_durante_carga == [3, 3, 3]
+    assert linhas_tabela(db, 'producao') == [tuple(registro.values()) for registro in novos]
+
+    inspetor = inspect(engine)
+    assert not [nome for nome in inspetor.get_table_names() if nome.startswith('producao__')]
+    assert [indice['column_names'] for indice in inspetor.get_indexes('producao')] == [['id']]
+
+    # Uma segunda troca reutiliza o nome original do índice, liberado com a tabela anterior
+    assert carga_staging(db, antigos, 'producao') == 3
+    assert linhas_tabela(db, 'producao') == [tuple(registro.values()) for registro in antigos]
+
+
+def test_carga_staging_com_erro_mantem_dados_anteriores(sessao):
+    antigos = [{'categoria': 'VINHO', 'nome': 'Tinto', 'ano': '1970', 'valor_producao': 1.0}]
+    insercao_dados_em_lote(sessao, antigos, 'producao')
+
+    novos = [
+        {'categoria': 'VINHO', 'nome': 'Branco', 'ano': '1970', 'valor_producao': 2.0},
+        {'categoria': 'VINHO', 'nome': 'Rosado', 'ano': '1970', 'valor_producao': object()},
+    ]
+    with pytest.raises(Exception):
+        carga_staging(sessao, novos, 'producao', tamanho_lote=1)
+
+    assert linhas_tabela(sessao, 'producao') == [('VINHO', 'Tinto', '1970', 1.0)]
+    assert 'producao__staging' not in inspect(sessao.get_bind()).get_table_names()
+
+
+def test_escrever_tsv_escapa_valores():
+    arquivo = io.StringIO()
+    registros = [
+        {'categoria': 'VINHO', 'nome': 'Tinto\tSeco', 'ano': '1970', 'valor_producao': 1.5},
+        {'categoria': None, 'nome': 'C:\\barra\nnova linha', 'ano': '1971', 'valor_producao': float('nan')},
+    ]
+
+    assert escrever_tsv(arquivo, registros, ['categoria', 'nome', 'ano', 'valor_producao']) == 2
+    assert arquivo.getvalue() == (
+        'VINHO\tTinto\\tSeco\t1970\t1.5\n'
+        '\\N\tC:\\\\barra\\nnova linha\t1971\t\\N\n'
+    )
+
+
+def test_insercao_load_data_sem_mysql_usa_insercao_em_lote(sessao):
+    registros = [{'categoria': 'VINHO', 'nome': f'Produto {i}', 'ano': '1970', 'valor_producao': float(i)}
+                 for i in range(5)]
+
+    assert not load_data_disponivel(sessao)
+    assert insercao_load_data(sessao, iter(registros), 'producao', tamanho_lote=2) == 5
+    assert linhas_tabela(sessao, 'producao') == [tuple(registro.values()) for registro in registros]
+
+
+def sessao_mysql(local_infile):
+    # Conexão real do pymysql, sem conectar ao servidor
+    db = MagicMock()
+    db.connection.return_value.dialect = mysql.dialect()
+    db.connection.return_value.connection.dbapi_connection = pymysql.connections.Connection(
+        defer_connect=True, local_infile=local_infile
+    )
+    return db
+
+
+@pytest.mark.parametrize('local_infile', [True, False])
+def test_load_data_disponivel_conforme_o_cliente(local_infile):
+    db = sessao_mysql(local_infile)
+    db.execute.return_value.scalar.return_value = 1
+
+    assert load_data_disponivel(db) is local_infile
+
+
+def test_load_data_disponivel_exige_o_servidor():
+    db = sessao_mysql(True)
+    db.execute.return_value.scalar.return_value = 0
+
+    assert not load_data_disponivel(db)
+
+
+def test_insercao_load_data_envia_arquivo_tsv():
+    db = sessao_mysql(True)
+    db.get_bind.return_value.dialect = mysql.dialect()
+    comandos = []
+
+    def executar(comando, parametros=None):
+        sql = str(comando)
+        if sql.startswith('LOAD DATA'):
+            with open(parametros['caminho'], encoding='utf-8') as arquivo:
+                comandos.append((sql, arquivo.read()))
+        return MagicMock(scalar=MagicMock(return_value=1))
+
+    db.execute.side_effect = executar
+    registros = [{'categoria': 'Vinho_Mesa', 'nome': 'Alemanha', 'ano': '1970', 'quantidade': 10, 'valor': 20.5}]
+
+    assert insercao_load_data(db, registros, 'exportacao') == 1
+
+    sql, conteudo = comandos[0]
+    assert sql.startswith('LOAD DATA LOCAL INFILE :caminho INTO TABLE exportacao')
+    assert sql.endswith('(categoria, nome, ano, quantidade, valor)')
+    assert conteudo == 'Vinho_Mesa\tAlemanha\t1970\t10\t20.5\n'
+    db.commit.assert_called_once()
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from src.dependencies.importacao_dados import corrigir_caracteres
+from src.dependencies.importacao_dados import corrigir_mojibake
+from src.dependencies.importacao_dados import leitura_bytes
+from src.dependencies.importacao_dados import normalizar_texto
+from src.dependencies.importacao_dados import normalizar_textos
+
+
+def duplamente_codificado(texto):
+    return texto.encode('utf-8').decode('latin-1').encode('utf-8')
+
+
+def test_corrigir_mojibake_texto_inteiro():
+    assert corrigir_mojibake('ExportaÃ§Ã£o de Ã¢mbar') == 'Exportação de âmbar'
+
+
+def test_corrigir_mojibake_texto_misto():
+    # 'SÃO' é um texto correto: só as sequências conhecidas são corrigidas
+    assert corrigir_mojibake('SÃO PAULO - ExportaÃ§Ã£o') == 'SÃO PAULO - Exportação'
+
+
+def test_corrigir_caracteres_aplica_substituicoes():
+    assert corrigir_caracteres('Ã¢mbar') == 'ambar'
+    assert corrigir_caracteres(10) == 10
+
+
+def test_normalizar_textos_apenas_colunas_de_texto():
+    df = pd.DataFrame({'produto': ['Suco de uva', 'Vinho Fino de Mesa (Vinífera)', 'Suco de uva'],
+                       '1970': [1.5, 2.5, 3.5],
+                       'misto': ['Ímpar', 0, 'Ímpar']})
+
+    resultado = normalizar_textos(df.copy())
+
+    assert resultado['produto'].tolist() == ['Suco de uva', 'Vinho Fino de Mesa (Vinifera)', 'Suco de uva']
+    assert resultado['misto'].tolist() == ['Impar', 0, 'Impar']
+    assert resultado['1970'].dtype == 'float64'
+    assert resultado.equals(df.map(corrigir_caracteres))
+
+
+def test_normalizar_texto_memoriza_valores_distintos():
+    normalizar_texto.cache_clear()
+    normalizar_textos(pd.DataFrame({'pais': ['África do Sul', 'Alemanha'] * 1000}))
+
+    informacoes = normalizar_texto.cache_info()
+    assert informacoes.misses == 2
+    assert informacoes.currsize == 2
+
+
+def test_leitura_bytes_corrige_arquivo_duplamente_codificado():
+    conteudo = duplamente_codificado('Id;País;1970;1970\n1;África do Sul;10;20\n2;Espanha;;5\n')
+
+    df = leitura_bytes(conteudo, separador=';', nome_tabela='exportacao')
+
+    assert list(df.columns) == ['id', 'pais', '1970', '1970.1']
+    assert df['pais'].tolist() == ['Africa do Sul', 'Espanha']
+    assert df['1970'].tolist() == [10, 0]
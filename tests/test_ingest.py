@@ -0,0 +1,99 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from src.ingest import criar_sessao, executar, ler_manifesto, main
+from src.models.models_db import Exportacao, Producao
+
+
+CSV_PRODUCAO = (
+    'id;produto;1970;1971\n'
+    '1;VINHO DE MESA;100;200\n'
+    '2;Tinto;50;60\n'
+    '3;Branco;50;140\n'
+).encode()
+
+CSV_EXPORTACAO = (
+    'Id;País;1970;1970;1971;1971\n'
+    '1;Alemanha;10;20.5;30;40.5\n'
+    '2;Argentina;0;0;5;7.25\n'
+).encode()
+
+
+@pytest.fixture
+def diretorio(tmp_path):
+    (tmp_path / 'Producao.csv').write_bytes(CSV_PRODUCAO)
+    (tmp_path / 'ExpVinho.csv').write_bytes(CSV_EXPORTACAO)
+    (tmp_path / 'ExpUva.csv').write_bytes(CSV_EXPORTACAO)
+
+    manifesto = [
+        {'nome_tabela': 'producao', 'nome_coluna': 'produto', 'drop_table': None, 'separador': ';',
+         'lista_links': [{'super_categoria': None, 'url': 'http://exemplo/download/Producao.csv'}]},
+        {'nome_tabela': 'exportacao', 'nome_coluna': 'pais', 'drop_table': None, 'separador': ';',
+         'lista_links': [{'super_categoria': 'Vinho_Mesa', 'arquivo': 'ExpVinho.csv'},
+                         {'super_categoria': 'Uva', 'arquivo': 'ExpUva.csv'}]},
+    ]
+    (tmp_path / 'manifesto.json').write_text(json.dumps(manifesto), encoding='utf-8')
+    return tmp_path
+
+
+def contar(url, modelo):
+    engine = create_engine(url)
+    with engine.connect() as conexao:
+        return conexao.execute(select(func.count()).select_from(modelo)).scalar()
+
+
+def test_ler_manifesto_resolve_arquivos(diretorio):
+    manifesto = ler_manifesto(diretorio)
+
+    assert [link['arquivo'] for link in manifesto[0]['lista_links']] == [str(diretorio / 'Producao.csv')]
+    assert [tabela['nome_tabela'] for tabela in ler_manifesto(diretorio, tabelas=['exportacao'])] == ['exportacao']
+
+    with pytest.raises(ValueError):
+        ler_manifesto(diretorio, tabelas=['desconhecida'])
+
+    (diretorio / 'ExpUva.csv').unlink()
+    with pytest.raises(FileNotFoundError):
+        ler_manifesto(diretorio)
+
+
+@pytest.mark.parametrize('modo', ['truncate', 'staging'])
+def test_carga_local_sem_rede(diretorio, tmp_path, modo):
+    url = f'sqlite:///{tmp_path / "embrapa.db"}'
+    sessao_local, _ = criar_sessao(url)
+
+    for _ in range(2):
+        resumos, medicao = executar(ler_manifesto(diretorio), sessao_local, tamanho_lote=2, modo=modo)
+
+    assert resumos == {
+        'producao': {'recarregada': True, 'modo': modo, 'inseridas': 4},
+        'exportacao': {'recarregada': True, 'modo': modo, 'inseridas': 8},
+    }
+    assert contar(url, Producao) == 4
+    assert contar(url, Exportacao) == 8
+
+    etapas = {(medida['etapa'], medida['tabela']) for medida in medicao.resumo()}
+    assert {('total', None), ('leitura_arquivo', 'producao'), ('leitura_arquivo', 'exportacao')} <= etapas
+
+
+def test_main_pipeline(diretorio, tmp_path, capsys):
+    url = f'sqlite:///{tmp_path / "embrapa.db"}'
+
+    codigo = main([str(diretorio), '--url', url, '--pipeline', '--processos', '1', '--tabelas', 'exportacao',
+                   '--salvar-medicoes'])
+
+    saida = capsys.readouterr().out
+    assert codigo == 0
+    assert 'exportacao: modo=truncate, inseridas=8' in saida
+    assert 'leitura_arquivo' in saida
+    assert contar(url, Producao) == 0
+    assert contar(url, Exportacao) == 8
+
+
+def test_main_recusa_diferencial_com_orcamento(diretorio, capsys):
+    with pytest.raises(SystemExit) as erro:
+        main([str(diretorio), '--modo', 'diferencial', '--orcamento-memoria-mb', '64'])
+
+    assert erro.value.code == 2
+    assert 'diferencial' in capsys.readouterr().err
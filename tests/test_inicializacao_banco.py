@@ -33,4 +33,4 @@ def test_get_db():
 @patch('src.services.funcionalidades_banco.insercao_dados', MagicMock())
 def test_total_processamento():
     response = client.get("/inicializacao", headers=headers)
-    assert response.status_code == 201
+    assert response.status_code == 202
@@ -0,0 +1,115 @@
+import tracemalloc
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.routes.inicializacao_banco import Inicializacao
+
+
+def csv_producao(repeticoes, quantidade_anos=54):
+    # Mesmo formato do arquivo de produção da EMBRAPA (~90 linhas), repetido `repeticoes` vezes
+    gerador = np.random.default_rng(0)
+    anos = ';'.join(str(1970 + i) for i in range(quantidade_anos))
+    linhas = [f'id;produto;{anos}']
+
+    for r in range(repeticoes):
+        for c in range(8):
+            nomes = [f'CATEGORIA {r}-{c}'] + [f'Produto Ã§ {r}-{c}-{p}' for p in range(10)]
+            for nome in nomes:
+                valores = ';'.join(map(str, gerador.integers(0, 10_000_000, quantidade_anos)))
+                linhas.append(f'{len(linhas)};{nome};{valores}')
+
+    return ('\n'.join(linhas) + '\n').encode()
+
+
+CSV_COMERCIALIZACAO = (
+    '1;VINHO DE MESA;VINHO DE MESA;10;20\n'
+    '2;vm_Tinto;Tinto;5;6\n'
+    '3;vm_Branco;Branco;5;14\n'
+    '4;ESPUMANTES;ESPUMANTES;1;2\n'
+    '5;es_Moscatel;Moscatel;1;2\n'
+).encode()
+
+CSV_PROCESSAMENTO = (
+    'id\tcontrol\tcultivar\t1970\t1971\n'
+    '1\tTINTAS\tTINTAS\t10\tnd\n'
+    '2\tti_Bordo\tBordo\t5\t*\n'
+    '3\tBRANCAS\tBRANCAS\t3\t4\n'
+    '4\tbr_Niagara\tNiagara\t3\t4\n'
+).encode()
+
+CSV_EXPORTACAO = (
+    'Id;País;1970;1970;1971;1971\n'
+    '1;Alemanha;10;20.5;30;40.5\n'
+    '2;Argentina;0;0;5;7.25\n'
+    '3;Áustria;1;2;3;4\n'
+).encode()
+
+
+def carregar(iniciador, conteudo, guardar=True):
+    inseridos = []
+
+    def inserir(db, registros, tabela, tamanho_lote):
+        if guardar:
+            inseridos.append(pd.DataFrame(registros))
+        return len(registros)
+
+    with patch('src.routes.inicializacao_banco.limpa_tabela', lambda db, tabela: None), \
+            patch('src.routes.inicializacao_banco.insercao_dados_em_lote', inserir), \
+            patch.object(Inicializacao, 'registrar_versao', lambda self, db: None), \
+            patch.object(Inicializacao, 'baixar',
+                         lambda self, link: {'url': link['url'], 'conteudo': conteudo, 'alterado': True}):
+        resumo = iniciador.insercoes(db=None)
+
+    return resumo, inseridos
+
+
+@pytest.mark.parametrize('nome_tabela, nome_coluna, drop_column, separador, conteudo', [
+    ('producao', 'produto', None, ';', csv_producao(1)),
+    ('comercializacao', 'produto', None, ';', CSV_COMERCIALIZACAO),
+    ('processamento', 'cultivar', 'control', '\t', CSV_PROCESSAMENTO),
+    ('exportacao', 'pais', None, ';', CSV_EXPORTACAO),
+])
+def test_leitura_em_blocos_igual_leitura_completa(nome_tabela, nome_coluna, drop_column, separador, conteudo):
+    def iniciador(orcamento_memoria):
+        return Inicializacao(nome_tabela, nome_coluna, drop_column,
+                             [{'super_categoria': 'Viniferas', 'url': 'arquivo.csv'}], separador,
+                             orcamento_memoria=orcamento_memoria)
+
+    _, completo = carregar(iniciador(None), conteudo)
+    # Orçamento mínimo: uma linha do arquivo por bloco
+    _, em_blocos = carregar(iniciador(1), conteudo)
+
+    assert len(completo) == 1
+    assert len(em_blocos) > 1
+    assert pd.concat(em_blocos, ignore_index=True).equals(completo[0])
+
+
+def test_leitura_em_blocos_respeita_orcamento_de_memoria():
+    # Arquivo 50 vezes maior que o arquivo de produção da EMBRAPA
+    conteudo = csv_producao(50)
+    orcamento_memoria = 8 * 1024 * 1024
+
+    def pico_memoria(orcamento):
+        iniciador = Inicializacao('producao', 'produto', None, [{'super_categoria': None, 'url': 'producao.csv'}],
+                                  ';', orcamento_memoria=orcamento)
+        tracemalloc.start()
+        try:
+            resumo, _ = carregar(iniciador, conteudo, guardar=False)
+            return resumo, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    resumo_completo, pico_completo = pico_memoria(None)
+    resumo_em_blocos, pico_em_blocos = pico_memoria(orcamento_memoria)
+
+    assert resumo_em_blocos == resumo_completo
+    assert pico_completo > orcamento_memoria
+    assert pico_em_blocos < orcamento_memoria
+
+
+def test_modo_diferencial_recusa_orcamento_de_memoria():
+    with pytest.raises(ValueError, match='diferencial'):
+        Inicializacao('producao', 'produto', None, [], ';', modo_carga='diferencial', orcamento_memoria=1024)
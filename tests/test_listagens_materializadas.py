@@ -0,0 +1,227 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from src.models import models_db as models
+from src.routes import exportacao, inicializacao_banco, producao
+from src.services import listagens_materializadas
+from src.services.listagens_materializadas import ListagensMaterializadas, serializar_json
+from src.services.paginacao import codificar_cursor
+from tests.test_cache_consultas import Relogio
+from tests.test_paginacao import ExecutorManual, banco, criar_cliente, inserir  # noqa: F401
+from tests.test_versoes_tabelas import incrementar
+
+
+@pytest.fixture
+def listagens(monkeypatch):
+    listagens = ListagensMaterializadas(limite=10, executor=ExecutorManual())
+    for modulo in (producao, exportacao, inicializacao_banco):
+        monkeypatch.setattr(modulo, 'LISTAGENS_MATERIALIZADAS', listagens)
+    return listagens
+
+
+def montar(cliente, rota, listagens):
+    """Faz a primeira leitura, que agenda a montagem da listagem, e executa a montagem."""
+    resposta = cliente.get(rota, params={'limit': 10})
+    listagens.executor.executar()
+    return resposta
+
+
+def inserir_com_valores(sessao_local, quantidade):
+    with sessao_local() as db:
+        db.add_all([
+            models.Producao(categoria='VINHO', nome=f'Uva Niágara {i}', ano='1970', valor_producao=i * 1.25)
+            for i in range(quantidade)
+        ])
+        db.commit()
+
+
+def percorrer(cliente, rota, limite):
+    paginas, params = [], {'limit': limite}
+    while True:
+        resposta = cliente.get(rota, params=params)
+        paginas.append(resposta)
+        if 'x-proximo-cursor' not in resposta.headers:
+            return paginas
+        params['after'] = resposta.headers['x-proximo-cursor']
+
+
+def test_serializar_json_sem_orjson(monkeypatch):
+    valor = [{'nome': 'Açaí', 'valor': Decimal('12.50'), 'ano': None}]
+    com_orjson = serializar_json(valor)
+
+    monkeypatch.setattr(listagens_materializadas, 'orjson', None)
+
+    assert serializar_json(valor) == com_orjson == '[{"nome":"Açaí","valor":12.5,"ano":null}]'.encode()
+
+
+@pytest.mark.parametrize('quantidade', [0, 10, 25])
+def test_mesmo_conteudo_da_consulta(banco, listagens, monkeypatch, quantidade):
+    _, sessao_local, _ = banco
+    inserir_com_valores(sessao_local, quantidade)
+    cliente = criar_cliente(producao, sessao_local)
+    montar(cliente, '/producao', listagens)
+
+    materializadas = percorrer(cliente, '/producao', 10)
+    assert listagens.acertos == len(materializadas)
+
+    monkeypatch.setattr(producao, 'LISTAGENS_MATERIALIZADAS', ListagensMaterializadas(maximo_bytes=0))
+    consultadas = percorrer(cliente, '/producao', 10)
+
+    assert [pagina.json() for pagina in materializadas] == [pagina.json() for pagina in consultadas]
+    assert ([pagina.headers.get('x-proximo-cursor') for pagina in materializadas]
+            == [pagina.headers.get('x-proximo-cursor') for pagina in consultadas])
+    assert materializadas[0].headers['content-type'] == 'application/json'
+
+
+def test_leituras_nao_consultam_o_banco(banco, listagens):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 15)
+    cliente = criar_cliente(producao, sessao_local)
+    montar(cliente, '/producao', listagens)
+
+    primeira = cliente.get('/producao', params={'limit': 10})
+    consultas.clear()
+    for _ in range(3):
+        resposta = cliente.get('/producao', params={'limit': 10})
+        seguinte = cliente.get('/producao', params={'limit': 10, 'after': resposta.headers['x-proximo-cursor']})
+
+    assert consultas == []
+    assert listagens.materializacoes == 1
+    assert resposta.content == primeira.content
+    assert [linha['id'] for linha in seguinte.json()] == list(range(11, 16))
+    assert resposta.headers['etag'] and resposta.headers['cache-control'] == 'no-cache'
+
+    # O ETag copiado para a resposta continua permitindo o 304
+    condicional = cliente.get('/producao', params={'limit': 10}, headers={'If-None-Match': resposta.headers['etag']})
+    assert condicional.status_code == 304
+
+
+def test_escrita_remonta_a_listagem_em_segundo_plano(banco, listagens):
+    _, sessao_local, _ = banco
+    inserir(sessao_local, models.Exportacao, 3)
+    cliente = criar_cliente(exportacao, sessao_local)
+
+    assert len(montar(cliente, '/exportacao', listagens).json()) == 3
+    assert len(cliente.get('/exportacao', params={'limit': 10}).json()) == 3
+    assert listagens.acertos == 1
+
+    cliente.post('/exportacao', json={'categoria': 'VINHO', 'nome': 'Chile', 'ano': '1970', 'quantidade': 1})
+
+    # Até a remontagem terminar, as leituras são consultadas normalmente, e ela é agendada uma única vez
+    for _ in range(2):
+        nomes = [linha['nome'] for linha in cliente.get('/exportacao', params={'limit': 10}).json()]
+        assert nomes[-1] == 'Chile'
+    assert listagens.acertos == 1
+    assert len(listagens.executor.tarefas) == 1
+    assert listagens.estatisticas()['remontando'] == ['exportacao']
+
+    listagens.executor.executar()
+    nomes = [linha['nome'] for linha in cliente.get('/exportacao', params={'limit': 10}).json()]
+
+    assert nomes[-1] == 'Chile'
+    assert listagens.acertos == 2
+    assert listagens.materializacoes == 2
+    assert listagens.estatisticas()['remontando'] == []
+
+
+def test_listagem_vencida_e_remontada(banco, monkeypatch):
+    _, sessao_local, _ = banco
+    inserir(sessao_local, models.Producao, 3)
+    relogio = Relogio()
+    listagens = ListagensMaterializadas(limite=10, ttl=60, relogio=relogio, executor=ExecutorManual())
+    monkeypatch.setattr(producao, 'LISTAGENS_MATERIALIZADAS', listagens)
+    cliente = criar_cliente(producao, sessao_local)
+    montar(cliente, '/producao', listagens)
+
+    # Uma alteração que não passa pelas versões (ex.: feita direto no banco)
+    with sessao_local() as db:
+        db.query(models.Producao).filter(models.Producao.id == 1).update({'nome': 'Alterado'})
+        db.commit()
+
+    relogio.agora = 59
+    assert cliente.get('/producao', params={'limit': 10}).json()[0]['nome'] == 'Item 0'
+
+    relogio.agora = 61
+    montar(cliente, '/producao', listagens)
+
+    assert cliente.get('/producao', params={'limit': 10}).json()[0]['nome'] == 'Alterado'
+    assert listagens.materializacoes == 2
+
+
+def test_falha_na_remontagem_permite_novo_agendamento(banco, listagens, caplog):
+    _, sessao_local, _ = banco
+    cliente = criar_cliente(producao, sessao_local)
+
+    def falhar(db, modelo):
+        raise RuntimeError('conexão perdida')
+
+    listagens._serializar = falhar
+    montar(cliente, '/producao', listagens)
+    del listagens._serializar
+
+    estatisticas = listagens.estatisticas()
+    assert estatisticas['remontando'] == []
+    assert estatisticas['falhas'] == {'producao': 'RuntimeError: conexão perdida'}
+    assert 'producao' in caplog.text and 'RuntimeError: conexão perdida' in caplog.text
+
+    montar(cliente, '/producao', listagens)
+    assert listagens.materializacoes == 1
+    assert listagens.estatisticas()['falhas'] == {}
+
+
+def test_paginas_fora_da_listagem_padrao(banco, listagens):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 15)
+    cliente = criar_cliente(producao, sessao_local)
+    montar(cliente, '/producao', listagens)
+    cliente.get('/producao', params={'limit': 10})
+    consultas.clear()
+
+    deslocada = cliente.get('/producao', params={'limit': 10, 'after': codificar_cursor(3)})
+    outro_limite = cliente.get('/producao', params={'limit': 5})
+    projetada = cliente.get('/producao', params={'limit': 10, 'fields': 'nome'})
+
+    assert [linha['id'] for linha in deslocada.json()] == list(range(4, 14))
+    assert len(outro_limite.json()) == 5
+    assert projetada.json()[0] == {'nome': 'Item 0'}
+    assert len(consultas) == 3
+    assert listagens.acertos == 1
+
+
+def test_listagem_maior_que_o_limite_de_bytes(banco, monkeypatch):
+    _, sessao_local, _ = banco
+    inserir(sessao_local, models.Producao, 15)
+    listagens = ListagensMaterializadas(limite=10, maximo_bytes=500, executor=ExecutorManual())
+    monkeypatch.setattr(producao, 'LISTAGENS_MATERIALIZADAS', listagens)
+    cliente = criar_cliente(producao, sessao_local)
+
+    assert len(montar(cliente, '/producao', listagens).json()) == 10
+    assert listagens.estatisticas()['tabelas']['producao']['paginas'] is None
+    assert listagens.acertos == 0
+
+    # A tentativa não se repete a cada leitura da mesma versão
+    cliente.get('/producao', params={'limit': 10})
+    assert listagens.executor.tarefas == []
+    assert listagens.materializacoes == 1
+
+
+def test_carga_materializa_as_tabelas(banco, listagens):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 12)
+    incrementar(sessao_local, 'producao')
+
+    with sessao_local() as db:
+        inicializacao_banco.materializar_listagens(db, ['producao', 'exportacao'])
+
+    consultas.clear()
+    resposta = criar_cliente(producao, sessao_local).get('/producao', params={'limit': 10})
+
+    # Apenas as versões das tabelas são lidas do banco
+    assert [consulta for consulta in consultas if 'versoes_tabelas' not in consulta] == []
+    assert len(resposta.json()) == 10
+    estatisticas = listagens.estatisticas()['tabelas']
+    assert estatisticas['producao']['paginas'] == 2
+    assert estatisticas['exportacao']['bytes'] == len(b'[]')
+    assert json.loads(resposta.content)[0]['nome'] == 'Item 0'
@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.dependencies.database import Base
+from src.services.metricas_ingestao import MONITOR_MEMORIA, MedicaoIngestao, MonitorMemoria
+from src.services.metricas_ingestao import definir_tabela
+from src.services.metricas_ingestao import listar_execucoes
+from src.services.metricas_ingestao import medir_etapa
+from src.services.metricas_ingestao import submeter_no_contexto
+from src.services.tratamento_dados_tabela import formato_longo
+
+
+def test_medir_etapa_sem_medicao_ativa_nao_registra():
+    medicao = MedicaoIngestao()
+
+    with medir_etapa('leitura_bytes', bytes=10) as contagens:
+        contagens['linhas_saida'] = 1
+
+    assert medicao.resumo() == []
+
+
+def test_medicao_agrega_etapas_por_tabela_e_entre_threads():
+    medicao = MedicaoIngestao()
+    df = pd.DataFrame({'id': [1, 2, 3], 'produto': ['TINTAS', 'Bordo', 'Isabel'], '1970': [3, 1, 2],
+                       '1971': [6, 2, 4]})
+
+    def baixar():
+        with medir_etapa('download_tabela') as contagens:
+            contagens['bytes'] = 100
+
+    with medicao.ativar(), ThreadPoolExecutor(max_workers=2) as executor:
+        with definir_tabela('producao'):
+            formato_longo(df, 'producao', 'produto')
+            formato_longo(df, 'producao', 'produto')
+            downloads = [submeter_no_contexto(executor, baixar) for _ in range(3)]
+
+        # Sem copiar o contexto, a thread não enxerga a medição ativa
+        executor.submit(baixar).result()
+        for download in downloads:
+            download.result()
+
+    etapas = {(medida['etapa'], medida['tabela']): medida for medida in medicao.resumo()}
+
+    assert set(etapas) == {('formato_longo', 'producao'), ('download_tabela', 'producao')}
+    assert etapas['formato_longo', 'producao']['chamadas'] == 2
+    assert etapas['formato_longo', 'producao']['linhas_entrada'] == 6
+    assert etapas['formato_longo', 'producao']['linhas_saida'] == 8
+    assert etapas['download_tabela', 'producao']['bytes'] == 300
+    assert etapas['formato_longo', 'producao']['tempo_total'] > 0
+    assert (etapas['formato_longo', 'producao']['pico_memoria_etapa'] is not None) is MONITOR_MEMORIA.disponivel
+
+
+def test_salvar_e_listar_execucoes():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    for status_carga in ('concluida', 'erro'):
+        medicao = MedicaoIngestao()
+        with medicao.ativar():
+            with medir_etapa('total'):
+                with definir_tabela('producao'), medir_etapa('leitura_bytes', bytes=50) as contagens:
+                    contagens['linhas_saida'] = 5
+        medicao.salvar(db, status_carga)
+
+    execucoes = listar_execucoes(db, limite=1)
+
+    assert len(execucoes) == 1
+    assert execucoes[0]['status'] == 'erro'
+    assert [(etapa['etapa'], etapa['tabela']) for etapa in execucoes[0]['etapas']] == [
+        ('leitura_bytes', 'producao'), ('total', None)
+    ]
+    assert execucoes[0]['etapas'][0]['bytes'] == 50
+    assert len(listar_execucoes(db)) == 2
+
+
+def pico_do_processo():
+    with open('/proc/self/status') as arquivo:
+        return next(int(linha.split()[1]) for linha in arquivo if linha.startswith('VmHWM:'))
+
+
+@pytest.mark.skipif(not MONITOR_MEMORIA.disponivel, reason='Medição de memória disponível apenas no Linux')
+def test_pico_de_memoria_por_etapa():
+    medicao = MedicaoIngestao()
+    tamanho = 64 * 1024 * 1024
+
+    # Um pico anterior às etapas, maior que o delas
+    dados = np.ones(2 * tamanho, dtype=np.uint8)
+    del dados
+    pico_anterior = pico_do_processo()
+
+    with medicao.ativar():
+        with medir_etapa('total'):
+            with medir_etapa('leitura_bytes'):
+                dados = np.ones(tamanho, dtype=np.uint8)
+                # Mantido por algumas leituras do RSS
+                time.sleep(MONITOR_MEMORIA.intervalo * 10)
+                del dados
+
+            # O pico da etapa anterior não aparece nas seguintes
+            with medir_etapa('formato_longo'):
+                dados = bytearray(1024)
+
+    picos = {medida['etapa']: medida['pico_memoria_etapa'] for medida in medicao.resumo()}
+
+    assert picos['leitura_bytes'] >= tamanho * 0.9
+    assert picos['formato_longo'] < tamanho / 4
+    # A etapa externa inclui o pico das etapas internas
+    assert picos['total'] >= picos['leitura_bytes']
+    # O pico guardado pelo kernel para o processo não é reiniciado pela medição
+    assert pico_do_processo() >= pico_anterior
+
+
+def test_sem_suporte_a_memoria_nao_registra_pico(tmp_path):
+    monitor = MonitorMemoria(caminho_status=str(tmp_path / 'inexistente' / 'status'))
+
+    assert not monitor.disponivel
+    assert monitor.finalizar(monitor.iniciar()) is None
@@ -0,0 +1,152 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.dependencies.database import Base
+from src.models import models_db as models
+from src.routes import comercializacao, exportacao, importacao, processamento, producao
+from src.services.authentication import get_current_user
+from src.services.cache_consultas import CACHE_CONSULTAS
+from src.services.listagens_materializadas import LISTAGENS_MATERIALIZADAS
+from src.services import versoes_tabelas
+from src.services.paginacao import CABECALHO_PROXIMO_CURSOR, LIMITE_MAXIMO, codificar_cursor, decodificar_cursor
+
+
+ROTAS = [
+    (producao, models.Producao, 'producao'),
+    (processamento, models.Processamento, 'processamento'),
+    (comercializacao, models.Comercializacao, 'comercializacao'),
+    (importacao, models.Importacao, 'importacao'),
+    (exportacao, models.Exportacao, 'exportacao'),
+]
+
+
+class ExecutorManual:
+    """Guarda as tarefas recebidas, que só são executadas quando o teste chama `executar`."""
+
+    def __init__(self):
+        self.tarefas = []
+
+    def submit(self, funcao, *args):
+        self.tarefas.append((funcao, args))
+
+    def executar(self):
+        while self.tarefas:
+            funcao, args = self.tarefas.pop(0)
+            funcao(*args)
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    sessao_local = sessionmaker(bind=engine)
+
+    consultas = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: consultas.append(args[2]))
+
+    # Cada teste usa um banco novo, com as versões das tabelas começando do zero; elas são lidas do
+    # banco uma única vez por teste, para que as leituras seguintes não façam consultas
+    versoes_tabelas.limpar_versoes()
+    monkeypatch.setattr(versoes_tabelas, 'INTERVALO_VERSOES', float('inf'))
+    CACHE_CONSULTAS.limpar()
+    LISTAGENS_MATERIALIZADAS.limpar()
+    # As listagens materializadas são testadas em test_listagens_materializadas; aqui as remontagens nunca rodam
+    monkeypatch.setattr(LISTAGENS_MATERIALIZADAS, 'executor', ExecutorManual())
+
+    yield engine, sessao_local, consultas
+
+
+def criar_cliente(modulo, sessao_local):
+    def get_db():
+        db = sessao_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(modulo.router)
+    app.dependency_overrides[get_current_user] = lambda: {'username': 'teste', 'id': 1}
+    app.dependency_overrides[modulo.get_db] = get_db
+    return TestClient(app)
+
+
+def inserir(sessao_local, modelo, quantidade):
+    with sessao_local() as db:
+        db.add_all([modelo(categoria='VINHO', nome=f'Item {i}', ano='1970') for i in range(quantidade)])
+        db.commit()
+
+
+def test_cursor_ida_e_volta():
+    for ultimo_id in (1, 999, 123456789):
+        assert decodificar_cursor(codificar_cursor(ultimo_id)) == ultimo_id
+    assert decodificar_cursor(None) is None
+
+
+@pytest.mark.parametrize('modulo, modelo, rota', ROTAS)
+def test_percorre_todas_as_paginas(banco, modulo, modelo, rota):
+    _, sessao_local, _ = banco
+    inserir(sessao_local, modelo, 25)
+    cliente = criar_cliente(modulo, sessao_local)
+
+    ids, paginas, params = [], 0, {'limit': 10}
+    while True:
+        resposta = cliente.get(f'/{rota}', params=params)
+        assert resposta.status_code == 200
+        ids.extend(linha['id'] for linha in resposta.json())
+        paginas += 1
+        if CABECALHO_PROXIMO_CURSOR not in resposta.headers:
+            break
+        params['after'] = resposta.headers[CABECALHO_PROXIMO_CURSOR]
+
+    assert paginas == 3
+    assert ids == list(range(1, 26))
+
+
+def test_ultima_pagina_completa_nao_informa_cursor(banco):
+    _, sessao_local, _ = banco
+    inserir(sessao_local, models.Producao, 10)
+    cliente = criar_cliente(producao, sessao_local)
+
+    resposta = cliente.get('/producao', params={'limit': 10})
+
+    assert len(resposta.json()) == 10
+    assert CABECALHO_PROXIMO_CURSOR not in resposta.headers
+
+
+def test_pagina_usa_chave_primaria(banco):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 30)
+    cliente = criar_cliente(producao, sessao_local)
+    consultas.clear()
+
+    resposta = cliente.get('/producao', params={'limit': 5, 'after': codificar_cursor(20)})
+
+    assert [linha['id'] for linha in resposta.json()] == [21, 22, 23, 24, 25]
+    consulta = [sql for sql in consultas if 'FROM producao' in sql][-1]
+    assert 'producao.id > ?' in consulta
+    assert 'ORDER BY producao.id' in consulta
+    assert 'LIMIT ?' in consulta
+
+
+@pytest.mark.parametrize('limite', [0, -1, LIMITE_MAXIMO + 1])
+def test_limite_fora_do_intervalo(banco, limite):
+    _, sessao_local, _ = banco
+    cliente = criar_cliente(producao, sessao_local)
+
+    assert cliente.get('/producao', params={'limit': limite}).status_code == 422
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'YWJj', ''])
+def test_cursor_invalido(banco, cursor):
+    _, sessao_local, _ = banco
+    cliente = criar_cliente(producao, sessao_local)
+
+    resposta = cliente.get('/producao', params={'after': cursor})
+
+    assert resposta.status_code == 400
+    assert resposta.json() == {'detail': 'Cursor de paginação inválido'}
@@ -0,0 +1,158 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from src.dependencies.database import Base
+from src.models.models_db import Exportacao, Producao
+from src.routes.inicializacao_banco import Inicializacao
+from src.services.pipeline_ingestao import insercoes_em_pipeline
+
+
+CSV_PRODUCAO = (
+    'id;produto;1970;1971\n'
+    '1;VINHO DE MESA;100;200\n'
+    '2;Tinto;50;60\n'
+    '3;Branco;50;140\n'
+).encode()
+
+CSV_EXPORTACAO = (
+    'Id;País;1970;1970;1971;1971\n'
+    '1;Alemanha;10;20.5;30;40.5\n'
+    '2;Argentina;0;0;5;7.25\n'
+).encode()
+
+
+def criar_iniciadores():
+    producao = Inicializacao(
+        nome_tabela='producao',
+        nome_coluna='produto',
+        drop_column=None,
+        lista_links=[{'super_categoria': None, 'url': 'producao.csv'}],
+        separador=';'
+    )
+    exportacao = Inicializacao(
+        nome_tabela='exportacao',
+        nome_coluna='pais',
+        drop_column=None,
+        lista_links=[
+            {'super_categoria': 'Vinho_Mesa', 'url': 'exportacao_1.csv'},
+            {'super_categoria': 'Espumantes', 'url': 'exportacao_2.csv'},
+            {'super_categoria': 'Uva', 'url': 'exportacao_3.csv'},
+        ],
+        separador=';'
+    )
+    return [producao, exportacao]
+
+
+def baixar_com_latencia(latencias):
+    def baixar(self, link):
+        time.sleep(latencias.get(link['url'], 0))
+        conteudo = CSV_PRODUCAO if self.nome_tabela == 'producao' else CSV_EXPORTACAO
+        return {'url': link['url'], 'conteudo': conteudo, 'alterado': True}
+    return baixar
+
+
+def executar(funcao_carga, latencias):
+    eventos = []
+    limpa = MagicMock(side_effect=lambda db, tabela: eventos.append(('limpa', tabela, None, None)))
+
+    def inserir(db, registros, tabela, tamanho_lote):
+        registros = list(registros)
+        eventos.append(('insere', tabela, registros[0]['categoria'], registros))
+        return len(registros)
+
+    insere = MagicMock(side_effect=inserir)
+
+    with patch('src.routes.inicializacao_banco.limpa_tabela', limpa), \
+            patch('src.routes.inicializacao_banco.insercao_dados_em_lote', insere), \
+            patch.object(Inicializacao, 'baixar', baixar_com_latencia(latencias)):
+        inicio = time.perf_counter()
+        funcao_carga(criar_iniciadores())
+        duracao = time.perf_counter() - inicio
+
+    return eventos, duracao
+
+
+def carga_sequencial(iniciadores):
+    for iniciador in iniciadores:
+        iniciador.insercoes(db=MagicMock())
+
+
+def test_pipeline_mantem_ordem_e_resultado_da_carga_sequencial():
+    # O primeiro link de exportacao é o mais lento: a escrita deve esperar por ele
+    latencias = {'exportacao_1.csv': 0.3, 'exportacao_2.csv': 0.0, 'exportacao_3.csv': 0.1}
+
+    eventos_sequencial, _ = executar(carga_sequencial, {})
+    eventos_pipeline, _ = executar(
+        lambda iniciadores: insercoes_em_pipeline(iniciadores, db=MagicMock(), max_processos=2), latencias
+    )
+
+    assert [evento[:3] for evento in eventos_pipeline] == [
+        ('limpa', 'producao', None),
+        ('insere', 'producao', 'VINHO DE MESA'),
+        ('limpa', 'exportacao', None),
+        ('insere', 'exportacao', 'Vinho_Mesa'),
+        ('insere', 'exportacao', 'Espumantes'),
+        ('insere', 'exportacao', 'Uva'),
+    ]
+    assert eventos_pipeline == eventos_sequencial
+
+
+def test_pipeline_sobrepoe_downloads():
+    latencias = {'producao.csv': 0.5, 'exportacao_1.csv': 0.5, 'exportacao_2.csv': 0.5, 'exportacao_3.csv': 0.5}
+
+    def pipeline(iniciadores):
+        insercoes_em_pipeline(iniciadores, db=MagicMock(), max_downloads=4, max_processos=2)
+
+    # A primeira carga inicia o servidor de processos, reaproveitado nas seguintes
+    executar(pipeline, {})
+
+    _, duracao_sequencial = executar(carga_sequencial, latencias)
+    _, duracao_pipeline = executar(pipeline, latencias)
+
+    assert duracao_sequencial >= 2.0
+    assert duracao_pipeline < duracao_sequencial / 1.5
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_modos_de_carga_geram_mesmo_conteudo(pipeline):
+    engines = {modo: create_engine('sqlite://') for modo in ('truncate', 'diferencial', 'staging')}
+    resumos = {}
+
+    for modo, engine in engines.items():
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        iniciadores = criar_iniciadores()
+        for iniciador in iniciadores:
+            iniciador.modo_carga = modo
+
+        with patch('src.routes.inicializacao_banco.limpa_tabela', MagicMock()), \
+                patch.object(Inicializacao, 'baixar', baixar_com_latencia({})):
+            if pipeline:
+                resumos[modo] = insercoes_em_pipeline(iniciadores, db=db, max_processos=1)
+            else:
+                resumos[modo] = {iniciador.nome_tabela: iniciador.insercoes(db=db) for iniciador in iniciadores}
+
+        if modo == 'diferencial':
+            # Recarregar os mesmos dados não altera nenhuma linha
+            with patch.object(Inicializacao, 'baixar', baixar_com_latencia({})):
+                segunda_carga = iniciadores[1].insercoes(db=db)
+
+    assert resumos['truncate']['exportacao'] == {'recarregada': True, 'modo': 'truncate', 'inseridas': 12}
+    assert resumos['diferencial']['exportacao'] == {
+        'recarregada': True, 'modo': 'diferencial', 'inseridas': 12, 'atualizadas': 0, 'removidas': 0,
+        'inalteradas': 0
+    }
+    assert resumos['staging']['exportacao'] == {'recarregada': True, 'modo': 'staging', 'inseridas': 12}
+    assert segunda_carga['inalteradas'] == 12
+
+    for modelo in (Producao, Exportacao):
+        colunas = [coluna for coluna in modelo.__table__.columns if coluna.name != 'id']
+        conteudos = [
+            sessionmaker(bind=engine)().execute(select(*colunas).order_by(modelo.id)).all()
+            for engine in engines.values()
+        ]
+        assert conteudos[0] == conteudos[1] == conteudos[2]
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from src.models import models_db as models
+from src.routes import processamento, producao
+from src.services.paginacao import CABECALHO_PROXIMO_CURSOR
+from src.services.respostas_streaming import TIPO_CSV, TIPO_NDJSON
+from tests.test_paginacao import ROTAS, banco, criar_cliente, inserir  # noqa: F401
+
+
+def inserir_producao(sessao_local):
+    with sessao_local() as db:
+        db.add_all([
+            models.Producao(categoria='VINHO DE MESA', nome=f'Item {i}', ano=str(1970 + i % 2), valor_producao=i)
+            for i in range(6)
+        ])
+        db.commit()
+
+
+def consultas_producao(consultas):
+    return [sql for sql in consultas if 'FROM producao' in sql]
+
+
+@pytest.mark.parametrize('modulo, modelo, rota', ROTAS)
+def test_listagem_projetada(banco, modulo, modelo, rota):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, modelo, 5)
+    cliente = criar_cliente(modulo, sessao_local)
+    consultas.clear()
+
+    resposta = cliente.get(f'/{rota}', params={'fields': 'ano,nome'})
+
+    assert resposta.json() == [{'ano': '1970', 'nome': f'Item {i}'} for i in range(5)]
+    # Apenas as colunas pedidas, e o ID usado no cursor, são lidas do banco
+    consulta = consultas[-1]
+    assert f'{rota}.categoria' not in consulta
+    assert f'{rota}.id' in consulta
+
+
+def test_listagem_projetada_mantem_cursor(banco):
+    _, sessao_local, _ = banco
+    inserir_producao(sessao_local)
+    cliente = criar_cliente(producao, sessao_local)
+
+    primeira = cliente.get('/producao', params={'fields': 'valor_producao', 'limit': 4})
+    segunda = cliente.get('/producao', params={
+        'fields': 'valor_producao', 'limit': 4, 'after': primeira.headers[CABECALHO_PROXIMO_CURSOR]
+    })
+
+    assert primeira.json() == [{'valor_producao': float(i)} for i in range(4)]
+    assert segunda.json() == [{'valor_producao': 4.0}, {'valor_producao': 5.0}]
+    assert CABECALHO_PROXIMO_CURSOR not in segunda.headers
+
+
+def test_item_projetado(banco):
+    _, sessao_local, consultas = banco
+    inserir_producao(sessao_local)
+    cliente = criar_cliente(producao, sessao_local)
+    consultas.clear()
+
+    assert cliente.get('/producao/3', params={'fields': 'id,valor_producao'}).json() == {'id': 3, 'valor_producao': 2.0}
+    assert 'producao.nome' not in consultas_producao(consultas)[-1]
+    assert cliente.get('/producao/99', params={'fields': 'ano'}).status_code == 404
+    assert cliente.get('/producao/3').json()['nome'] == 'Item 2'
+
+
+def test_filtragem_projetada(banco):
+    _, sessao_local, consultas = banco
+    inserir_producao(sessao_local)
+    cliente = criar_cliente(producao, sessao_local)
+    consultas.clear()
+
+    resposta = cliente.post('/producao/filtragem', params={'fields': 'ano, valor_producao,ano'}, json={'ano': '1971'})
+
+    assert resposta.json() == [{'ano': '1971', 'valor_producao': float(i)} for i in (1, 3, 5)]
+    consulta = consultas_producao(consultas)[-1]
+    assert 'producao.nome' not in consulta and 'producao.id' not in consulta.split('WHERE')[0]
+
+
+def test_streaming_projetado(banco):
+    _, sessao_local, _ = banco
+    inserir_producao(sessao_local)
+    cliente = criar_cliente(producao, sessao_local)
+
+    ndjson = cliente.get('/producao', params={'fields': 'nome'}, headers={'Accept': TIPO_NDJSON})
+    csv = cliente.get('/producao', params={'fields': 'ano,id'}, headers={'Accept': TIPO_CSV})
+
+    assert [json.loads(linha) for linha in ndjson.text.splitlines()] == [{'nome': f'Item {i}'} for i in range(6)]
+    assert csv.text.splitlines()[:3] == ['ano,id', '1970,1', '1971,2']
+
+
+@pytest.mark.parametrize('rota, metodo', [
+    ('/processamento', 'get'), ('/processamento/1', 'get'), ('/processamento/filtragem', 'post')
+])
+@pytest.mark.parametrize('fields', ['ano,valor_producao', '', ' , '])
+def test_campos_invalidos(banco, rota, metodo, fields):
+    _, sessao_local, _ = banco
+    cliente = criar_cliente(processamento, sessao_local)
+
+    resposta = cliente.request(metodo, rota, params={'fields': fields}, json={} if metodo == 'post' else None)
+
+    assert resposta.status_code == 400
+    assert 'sub_categoria' in resposta.json()['detail']
@@ -0,0 +1,249 @@
+import gzip
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from src.dependencies.database import Base
+from src.dependencies.importacao_dados import download_tabela
+from src.dependencies.requisicao_embrapa import HistoricoLatencias, PrazoCargaExcedido
+from src.dependencies.requisicao_embrapa import buscar, definir_prazo, requisitar_com_hedge, usar_sessao
+from src.dependencies.web_scraping import encontrar_urls_csv_concorrente
+from src.services.metricas_ingestao import MedicaoIngestao, submeter_no_contexto
+from src.models.models_db import Producao
+from src.routes.inicializacao_banco import Inicializacao
+
+
+CSV_PRODUCAO = b'id;produto;1970\n1;VINHO DE MESA;10\n2;Tinto;5\n'
+
+
+class EmbrapaInstavelHandler(BaseHTTPRequestHandler):
+    """Simula respostas lentas, travadas, com erro 5xx ou enviadas aos poucos."""
+
+    requisicoes = []
+    trava = threading.Lock()
+
+    def do_GET(self):
+        caminho = urlparse(self.path)
+        parametros = parse_qs(caminho.query)
+
+        with self.trava:
+            self.requisicoes.append(caminho.path)
+            ordem = self.requisicoes.count(caminho.path)
+
+        if caminho.path == '/trava':
+            time.sleep(5)
+            return
+
+        if caminho.path == '/falha':
+            # Responde 503 nas primeiras `vezes` requisições
+            if ordem <= int(parametros['vezes'][0]):
+                self.responder(503, b'indisponivel')
+                return
+
+        if caminho.path == '/primeira_lenta' and ordem == 1:
+            time.sleep(1)
+
+        if caminho.path == '/aos_poucos':
+            self.send_response(200)
+            self.send_header('Content-Length', '1000')
+            self.end_headers()
+            for _ in range(20):
+                self.wfile.write(b'x' * 10)
+                self.wfile.flush()
+                time.sleep(0.1)
+            return
+
+        if caminho.path == '/inexistente':
+            self.responder(404, b'nao encontrado')
+            return
+
+        self.responder(200, CSV_PRODUCAO)
+
+    def responder(self, status, corpo):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class EmbrapaKeepAliveHandler(BaseHTTPRequestHandler):
+    """Mantém as conexões abertas (HTTP/1.1) e comprime as respostas quando o cliente aceita gzip."""
+
+    protocol_version = 'HTTP/1.1'
+    corpo = b'<html><a href="download/Producao.csv">DOWNLOAD</a></html>' + CSV_PRODUCAO * 200
+
+    def do_GET(self):
+        corpo = self.corpo
+        self.send_response(200)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            corpo = gzip.compress(corpo)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor(handler):
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    return servidor
+
+
+@pytest.fixture
+def servidor():
+    EmbrapaInstavelHandler.requisicoes = []
+    servidor = iniciar_servidor(EmbrapaInstavelHandler)
+    yield f'http://127.0.0.1:{servidor.server_port}'
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def servidor_keep_alive():
+    servidor = iniciar_servidor(EmbrapaKeepAliveHandler)
+    yield f'http://127.0.0.1:{servidor.server_port}'
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_repete_respostas_5xx(servidor):
+    resposta = buscar(f'{servidor}/falha?vezes=2', espera_inicial=0.01)
+
+    assert resposta.status_code == 200
+    assert resposta.content == CSV_PRODUCAO
+    assert EmbrapaInstavelHandler.requisicoes.count('/falha') == 3
+
+
+def test_desiste_apos_tentativas(servidor):
+    resposta = buscar(f'{servidor}/falha?vezes=5', tentativas=2, espera_inicial=0.01)
+
+    assert resposta.status_code == 503
+    assert EmbrapaInstavelHandler.requisicoes.count('/falha') == 2
+    # Os atributos da resposta do requests continuam acessíveis
+    with pytest.raises(requests.exceptions.HTTPError):
+        resposta.raise_for_status()
+
+    with pytest.raises(ConnectionError):
+        download_tabela(f'{servidor}/inexistente')
+    assert EmbrapaInstavelHandler.requisicoes.count('/inexistente') == 1
+
+
+def test_timeout_de_leitura_em_resposta_travada(servidor):
+    inicio = time.perf_counter()
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        buscar(f'{servidor}/trava', tentativas=2, espera_inicial=0.01, timeout_leitura=0.2)
+
+    assert time.perf_counter() - inicio < 1.5
+    assert EmbrapaInstavelHandler.requisicoes.count('/trava') == 2
+
+
+def test_hedge_apos_p95(servidor):
+    historico = HistoricoLatencias()
+    for _ in range(20):
+        historico.registrar(0.05)
+
+    inicio = time.perf_counter()
+    resposta = requisitar_com_hedge(f'{servidor}/primeira_lenta', historico=historico)
+
+    assert time.perf_counter() - inicio < 0.8
+    assert resposta.content == CSV_PRODUCAO
+    assert EmbrapaInstavelHandler.requisicoes.count('/primeira_lenta') == 2
+
+
+def test_hedge_sem_amostras_faz_uma_requisicao(servidor):
+    assert requisitar_com_hedge(f'{servidor}/ok', historico=HistoricoLatencias()).content == CSV_PRODUCAO
+    assert EmbrapaInstavelHandler.requisicoes == ['/ok']
+
+
+@pytest.mark.parametrize('caminho', ['/trava', '/aos_poucos', '/falha?vezes=100'])
+def test_prazo_interrompe_requisicao(servidor, caminho):
+    inicio = time.perf_counter()
+
+    with definir_prazo(0.5), pytest.raises(PrazoCargaExcedido):
+        buscar(f'{servidor}{caminho}', tentativas=100, espera_inicial=0.05)
+
+    assert time.perf_counter() - inicio < 1.5
+
+
+def test_prazo_nas_paginas_concorrentes(servidor):
+    categorias = {'02': None, '03': ['01', '02']}
+
+    inicio = time.perf_counter()
+
+    with definir_prazo(0.5), pytest.raises(PrazoCargaExcedido):
+        encontrar_urls_csv_concorrente(f'{servidor}/trava', categorias)
+
+    assert time.perf_counter() - inicio < 1.5
+
+
+def test_prazo_mantem_dados_da_tabela(servidor, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "embrapa.db"}')
+    Base.metadata.create_all(bind=engine)
+    sessao_local = sessionmaker(bind=engine)
+
+    def iniciador(caminho):
+        links = [{'super_categoria': None, 'url': f'{servidor}{caminho}'}]
+        return Inicializacao('producao', 'produto', None, links, ';')
+
+    def contar():
+        with engine.connect() as conexao:
+            return conexao.execute(select(func.count()).select_from(Producao)).scalar()
+
+    with sessao_local() as db:
+        iniciador('/ok').insercoes(db)
+    assert contar() == 1
+
+    with sessao_local() as db, definir_prazo(0.5), pytest.raises(PrazoCargaExcedido):
+        iniciador('/trava').insercoes(db)
+    assert contar() == 1
+
+
+def test_sessao_reaproveita_conexoes(servidor_keep_alive):
+    medicao = MedicaoIngestao()
+
+    with medicao.ativar(), usar_sessao() as sessao:
+        conteudos = [download_tabela(f'{servidor_keep_alive}/Arquivo{i}.csv') for i in range(5)]
+        encontrar_urls_csv_concorrente(f'{servidor_keep_alive}/index.php', {'02': None, '03': ['01', '02']})
+
+    assert conteudos == [EmbrapaKeepAliveHandler.corpo] * 5
+    assert sessao.requisicoes == 8
+    # Uma conexão para os downloads e ao menos uma para as páginas buscadas em paralelo
+    assert 2 <= sessao.conexoes() <= 4
+    # As respostas foram transferidas comprimidas
+    assert sessao.bytes_transferidos < len(EmbrapaKeepAliveHandler.corpo)
+
+    etapas = {medida['etapa']: medida for medida in medicao.resumo()}
+    assert etapas['requisicoes_http']['chamadas'] == 8
+    assert etapas['requisicoes_http']['conexoes'] == sessao.conexoes()
+    assert etapas['requisicoes_http']['bytes'] == sessao.bytes_transferidos
+
+
+def test_sessao_entre_threads(servidor_keep_alive):
+    with usar_sessao() as sessao, ThreadPoolExecutor(max_workers=4) as executor:
+        downloads = [
+            submeter_no_contexto(executor, download_tabela, f'{servidor_keep_alive}/Arquivo{i}.csv') for i in range(20)
+        ]
+        conteudos = [download.result() for download in downloads]
+
+    assert conteudos == [EmbrapaKeepAliveHandler.corpo] * 20
+    assert sessao.requisicoes == 20
+    assert 1 <= sessao.conexoes() <= 4
+
+    # Fora de uma carga as requisições não usam a sessão
+    assert buscar(f'{servidor_keep_alive}/Arquivo.csv').content == EmbrapaKeepAliveHandler.corpo
+    assert sessao.requisicoes == 20
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+
+import pytest
+
+from src.models import models_db as models
+from src.routes import exportacao, producao
+from src.services.paginacao import codificar_cursor
+from src.services.respostas_streaming import TIPO_CSV, TIPO_NDJSON, formato_streaming, gerar_lotes
+from tests.test_paginacao import ROTAS, banco, criar_cliente, inserir  # noqa: F401
+
+
+@pytest.mark.parametrize('accept, esperado', [
+    (None, None),
+    ('*/*', None),
+    ('application/json', None),
+    ('application/x-ndjson', TIPO_NDJSON),
+    ('text/csv; charset=utf-8', TIPO_CSV),
+    ('application/json, text/csv', None),
+    ('text/html, text/csv;q=0.9, */*;q=0.1', TIPO_CSV),
+])
+def test_formato_pelo_accept(accept, esperado):
+    assert formato_streaming(accept) == esperado
+
+
+@pytest.mark.parametrize('modulo, modelo, rota', ROTAS)
+def test_ndjson_retorna_tabela_inteira(banco, modulo, modelo, rota):
+    _, sessao_local, _ = banco
+    inserir(sessao_local, modelo, 25)
+    cliente = criar_cliente(modulo, sessao_local)
+
+    # O limite da paginação não se aplica ao streaming
+    resposta = cliente.get(f'/{rota}', params={'limit': 10}, headers={'Accept': TIPO_NDJSON})
+
+    assert resposta.status_code == 200
+    assert resposta.headers['content-type'].startswith(TIPO_NDJSON)
+    # Os cabeçalhos da dependência `versionar` acompanham a resposta em streaming
+    assert resposta.headers['etag'].startswith(f'"{rota}-')
+    assert resposta.headers['cache-control'] == 'no-cache'
+    assert resposta.headers['vary'] == 'Accept'
+    linhas = [json.loads(linha) for linha in resposta.text.splitlines()]
+    assert [linha['id'] for linha in linhas] == list(range(1, 26))
+    assert linhas[0]['nome'] == 'Item 0'
+    assert set(linhas[0]) == {coluna.name for coluna in modelo.__table__.columns}
+
+
+def test_csv_com_cabecalho_e_cursor(banco):
+    _, sessao_local, _ = banco
+    with sessao_local() as db:
+        db.add_all([
+            models.Exportacao(categoria='VINHO', nome=f'País, {i}', ano='1970', quantidade=i, valor=i * 1.5)
+            for i in range(5)
+        ])
+        db.commit()
+    cliente = criar_cliente(exportacao, sessao_local)
+
+    resposta = cliente.get('/exportacao', params={'after': codificar_cursor(2)}, headers={'Accept': TIPO_CSV})
+
+    assert resposta.headers['content-type'].startswith(TIPO_CSV)
+    assert resposta.headers['content-disposition'] == 'attachment; filename="exportacao.csv"'
+    assert resposta.headers['etag'].startswith('"exportacao-')
+    assert resposta.headers['cache-control'] == 'no-cache'
+    assert cliente.get('/exportacao', params={'after': codificar_cursor(2)},
+                       headers={'Accept': TIPO_CSV, 'If-None-Match': resposta.headers['etag']}).status_code == 304
+    linhas = list(csv.reader(io.StringIO(resposta.text)))
+    assert linhas[0] == ['id', 'categoria', 'nome', 'ano', 'quantidade', 'valor']
+    assert linhas[1:] == [['3', 'VINHO', 'País, 2', '1970', '2', '3.0'], ['4', 'VINHO', 'País, 3', '1970', '3', '4.5'],
+                          ['5', 'VINHO', 'País, 4', '1970', '4', '6.0']]
+
+
+def test_csv_de_tabela_vazia(banco):
+    _, sessao_local, _ = banco
+    cliente = criar_cliente(producao, sessao_local)
+
+    resposta = cliente.get('/producao', headers={'Accept': TIPO_CSV})
+
+    assert resposta.text == 'id,categoria,nome,ano,valor_producao\n'
+
+
+def test_cursor_invalido_no_streaming(banco):
+    _, sessao_local, _ = banco
+    cliente = criar_cliente(producao, sessao_local)
+
+    assert cliente.get('/producao', params={'after': '!!!'}, headers={'Accept': TIPO_NDJSON}).status_code == 400
+
+
+def test_lotes_serializados_sob_demanda(banco):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 25)
+    consultas.clear()
+
+    with sessao_local() as db:
+        lotes = gerar_lotes(db, models.Producao, TIPO_NDJSON, tamanho_lote=10)
+        # Nada é lido antes do primeiro lote ser pedido
+        assert consultas == []
+
+        primeiro = next(lotes)
+        assert len(primeiro.splitlines()) == 10
+        assert [len(lote.splitlines()) for lote in lotes] == [10, 5]
+
+    assert len([sql for sql in consultas if 'FROM producao' in sql]) == 1
@@ -0,0 +1,131 @@
+import threading
+import time
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.dependencies.database import Base
+from src.models.models_db import Producao
+from src.routes import inicializacao_banco
+from src.routes.inicializacao_banco import Inicializacao
+from src.services.authentication import get_current_user
+from src.services.tarefas_inicializacao import TarefaInicializacao
+
+
+CSV_PRODUCAO = (
+    'id;produto;1970;1971\n'
+    '1;VINHO DE MESA;100;200\n'
+    '2;Tinto;50;60\n'
+    '3;Branco;50;140\n'
+).encode()
+
+LISTA_INSERCAO = [{
+    'nome_tabela': 'producao',
+    'nome_coluna': 'produto',
+    'drop_table': None,
+    'lista_links': [{'super_categoria': None, 'url': 'producao.csv'}],
+    'separador': ';',
+}]
+
+
+def criar_cliente():
+    app = FastAPI()
+    app.include_router(inicializacao_banco.router)
+    app.dependency_overrides[get_current_user] = lambda: {'username': 'teste', 'id': 1}
+    return TestClient(app)
+
+
+def aguardar_fim(cliente, id_tarefa, limite=10):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        corpo = cliente.get(f'/inicializacao/{id_tarefa}').json()
+        if corpo['status'] in ('concluida', 'erro'):
+            return corpo
+        time.sleep(0.02)
+    raise TimeoutError(id_tarefa)
+
+
+def test_tarefa_registra_andamento_e_erro():
+    tarefa = TarefaInicializacao()
+
+    def carga(tarefa):
+        tarefa.atualizar('producao', etapa='baixando')
+        tarefa.atualizar('producao', etapa='processando', linhas=10)
+        tarefa.atualizar('producao', linhas=5)
+        tarefa.atualizar('exportacao')
+        raise RuntimeError('falha no banco')
+
+    tarefa.executar(carga, tarefa=tarefa)
+    estado = tarefa.para_dict()
+
+    assert estado['status'] == 'erro'
+    assert estado['erro'] == 'falha no banco'
+    assert estado['tabelas']['producao']['etapa'] == 'erro'
+    assert estado['tabelas']['producao']['linhas'] == 15
+    assert estado['tabelas']['exportacao'] == {'etapa': 'aguardando', 'linhas': 0, 'tempo_decorrido': 0.0}
+
+
+def test_inicializacao_em_segundo_plano():
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    liberar_download = threading.Event()
+
+    def baixar(self, link):
+        liberar_download.wait(5)
+        return {'url': link['url'], 'conteudo': CSV_PRODUCAO, 'alterado': True}
+
+    cliente = criar_cliente()
+
+    with patch.object(inicializacao_banco, 'encontrar_urls_csv_concorrente', lambda url_base, categorias, **kwargs: {}), \
+            patch.object(inicializacao_banco, 'criar_lista_json', lambda urls: LISTA_INSERCAO), \
+            patch.object(inicializacao_banco, 'SessionLocal', sessionmaker(bind=engine)), \
+            patch.object(inicializacao_banco, 'limpa_tabela', lambda db, tabela: None), \
+            patch.object(Inicializacao, 'baixar', baixar):
+        resposta = cliente.get('/inicializacao', params={'modo': 'staging'})
+        assert resposta.status_code == 202
+        id_tarefa = resposta.json()['id']
+
+        # Enquanto a carga está parada no download, o servidor continua respondendo
+        inicio = time.perf_counter()
+        andamento = cliente.get(f'/inicializacao/{id_tarefa}').json()
+        assert time.perf_counter() - inicio < 1
+        assert andamento['status'] in ('pendente', 'executando')
+
+        liberar_download.set()
+        final = aguardar_fim(cliente, id_tarefa)
+        execucoes = cliente.get('/inicializacao/execucoes').json()
+
+    assert final['status'] == 'concluida'
+    assert final['tabelas']['producao']['etapa'] == 'concluida'
+    assert final['tabelas']['producao']['linhas'] == 4
+    assert final['resultado'] == {'producao': {'recarregada': True, 'modo': 'staging', 'inseridas': 4}}
+
+    with sessionmaker(bind=engine)() as db:
+        assert db.scalar(select(func.count()).select_from(Producao)) == 4
+
+    etapas = {(etapa['etapa'], etapa['tabela']): etapa for etapa in final['etapas']}
+    assert etapas['leitura_bytes', 'producao']['bytes'] == len(CSV_PRODUCAO)
+    assert etapas['leitura_bytes', 'producao']['linhas_saida'] == 3
+    assert etapas['formato_longo', 'producao']['linhas_saida'] == 4
+    assert etapas['carga_staging', 'producao']['linhas_saida'] == 4
+    assert etapas['total', None]['tempo_total'] >= etapas['carga_staging', 'producao']['tempo_total']
+
+    assert len(execucoes) == 1
+    assert execucoes[0]['status'] == 'concluida'
+    assert sorted(etapa['etapa'] for etapa in execucoes[0]['etapas']) == sorted(etapa for etapa, _ in etapas)
+
+
+def test_status_de_tarefa_inexistente():
+    assert criar_cliente().get('/inicializacao/nao-existe').status_code == 404
+
+
+def test_diferencial_com_orcamento_de_memoria_e_recusado():
+    with patch.object(inicializacao_banco, 'iniciar_tarefa') as iniciar_tarefa:
+        resposta = criar_cliente().get('/inicializacao', params={'modo': 'diferencial', 'orcamento_memoria_mb': 64})
+
+    assert resposta.status_code == 400
+    iniciar_tarefa.assert_not_called()
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.services.tratamento_dados_tabela import trata_df_sem_colunas
+
+
+def trata_df_sem_colunas_linha_a_linha(df, novas_colunas, coluna_eliminar, coluna_principal):
+    # Implementação anterior, mantida como referência do resultado esperado
+    for i in range(len(df.columns) - 3):
+        novas_colunas.append(str(1970 + i))
+
+    novo_df = pd.DataFrame(columns=novas_colunas)
+    novo_df.loc[0] = df.columns.tolist()
+    for i in range(df.shape[0]):
+        novo_df.loc[i + 1] = df.loc[i].values
+
+    novo_df = novo_df.drop(columns=[coluna_eliminar])
+    novo_df[coluna_principal] = novo_df[coluna_principal].replace(r'\d+', '', regex=True)
+    novo_df[coluna_principal] = novo_df[coluna_principal].replace(r'\.', '', regex=True)
+    return novo_df
+
+
+def df_comercializacao(quantidade_linhas, quantidade_anos=3):
+    # Arquivo sem cabeçalho: a primeira linha de dados é lida como título das colunas
+    colunas = ['1', 'VINHO DE MESA', 'VINHO DE MESA.1'] + [str(100 + i) for i in range(quantidade_anos)]
+    indices = np.arange(quantidade_linhas)
+    dados = {
+        colunas[0]: indices + 2,
+        colunas[1]: ['vm_Tinto'] * quantidade_linhas,
+        colunas[2]: pd.Series(indices).map(lambda i: f'Tinto {i}.'),
+    }
+    for j, coluna in enumerate(colunas[3:]):
+        dados[coluna] = indices * (j + 1)
+    return pd.DataFrame(dados)
+
+
+def executar(df):
+    return trata_df_sem_colunas(df=df, novas_colunas=['id', 'produto_lixo', 'produto'],
+                                coluna_eliminar='produto_lixo', coluna_principal='produto')
+
+
+def test_trata_df_sem_colunas_igual_implementacao_linha_a_linha():
+    df = df_comercializacao(50)
+
+    novas_colunas = ['id', 'produto_lixo', 'produto']
+    resultado = trata_df_sem_colunas(df.copy(), novas_colunas, 'produto_lixo', 'produto')
+    esperado = trata_df_sem_colunas_linha_a_linha(df.copy(), ['id', 'produto_lixo', 'produto'],
+                                                  'produto_lixo', 'produto')
+
+    assert novas_colunas == ['id', 'produto_lixo', 'produto', '1970', '1971', '1972']
+    assert list(resultado.columns) == ['id', 'produto', '1970', '1971', '1972']
+    assert resultado.astype(str).equals(esperado.astype(str))
+    assert resultado.loc[0, 'produto'] == 'VINHO DE MESA'
+    assert resultado.loc[11, 'produto'] == 'Tinto '
+
+
+def test_trata_df_sem_colunas_tempo_linear():
+    tempos = {}
+    for quantidade_linhas in (1_000, 10_000, 100_000, 1_000_000):
+        df = df_comercializacao(quantidade_linhas)
+        inicio = time.perf_counter()
+        resultado = executar(df)
+        tempos[quantidade_linhas] = time.perf_counter() - inicio
+        assert len(resultado) == quantidade_linhas + 1
+
+    # Com crescimento quadrático, cada aumento de 10x nas linhas custaria ~100x no tempo
+    assert tempos[100_000] / tempos[10_000] < 20
+    assert tempos[1_000_000] / tempos[100_000] < 20
@@ -0,0 +1,222 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from src.models import models_db as models
+from src.routes import importacao, producao
+from src.routes.inicializacao_banco import Inicializacao
+from src.services import versoes_tabelas
+from src.services.compressao import CacheCompressao, CompressaoMiddleware
+from src.services.versoes_tabelas import etag_corresponde, incrementar_versao, versao_tabela, versionar
+from tests.test_paginacao import banco, criar_cliente, inserir  # noqa: F401
+
+
+def incrementar(sessao_local, tabela):
+    with sessao_local() as db:
+        versao = incrementar_versao(tabela, db)
+        db.commit()
+    return versao
+
+
+@pytest.mark.parametrize('if_none_match, esperado', [
+    (None, False),
+    ('"a"', True),
+    ('W/"a"', True),
+    ('"b", W/"a"', True),
+    ('*', True),
+    ('"b"', False),
+])
+def test_etag_corresponde(if_none_match, esperado):
+    assert etag_corresponde(if_none_match, '"a"') is esperado
+
+
+@pytest.mark.parametrize('rota', ['/producao', '/producao/2'])
+def test_304_sem_consultar_o_banco(banco, rota):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 3)
+    cliente = criar_cliente(producao, sessao_local)
+
+    primeira = cliente.get(rota)
+    etag = primeira.headers['etag']
+    consultas.clear()
+
+    segunda = cliente.get(rota, headers={'If-None-Match': etag})
+
+    assert primeira.status_code == 200
+    assert primeira.headers['cache-control'] == 'no-cache'
+    assert segunda.status_code == 304
+    assert segunda.content == b''
+    assert segunda.headers['etag'] == etag
+    assert consultas == []
+
+
+def test_304_no_streaming(banco):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 3)
+    cliente = criar_cliente(producao, sessao_local)
+
+    json_etag = cliente.get('/producao').headers['etag']
+    primeira = cliente.get('/producao', headers={'Accept': 'application/x-ndjson'})
+    consultas.clear()
+    segunda = cliente.get('/producao', headers={'Accept': 'application/x-ndjson',
+                                                'If-None-Match': primeira.headers['etag']})
+
+    assert primeira.status_code == 200 and len(primeira.text.splitlines()) == 3
+    # O Accept faz parte do ETag: o NDJSON não revalida a resposta JSON
+    assert primeira.headers['etag'] != json_etag
+    assert primeira.headers['cache-control'] == 'no-cache'
+    assert primeira.headers['vary'] == 'Accept'
+    assert segunda.status_code == 304
+    assert consultas == []
+
+
+def test_etag_depende_dos_parametros(banco):
+    _, sessao_local, _ = banco
+    cliente = criar_cliente(producao, sessao_local)
+
+    etags = {
+        cliente.get('/producao').headers['etag'],
+        cliente.get('/producao', params={'limit': 10}).headers['etag'],
+        cliente.get('/producao', params={'fields': 'ano'}).headers['etag'],
+        cliente.get('/producao/1').headers.get('etag'),
+    }
+
+    assert len(etags) == 4
+    # A ordem dos parâmetros não muda o ETag
+    assert (cliente.get('/producao', params=[('limit', 5), ('fields', 'ano')]).headers['etag']
+            == cliente.get('/producao', params=[('fields', 'ano'), ('limit', 5)]).headers['etag'])
+
+
+def test_escritas_invalidam_o_etag(banco):
+    _, sessao_local, _ = banco
+    inserir(sessao_local, models.Importacao, 2)
+    cliente = criar_cliente(importacao, sessao_local)
+
+    def condicional(etag):
+        return cliente.get('/importacao', headers={'If-None-Match': etag})
+
+    etag = cliente.get('/importacao').headers['etag']
+    assert condicional(etag).status_code == 304
+
+    cliente.post('/importacao', json={'categoria': 'VINHO', 'nome': 'Chile', 'ano': '1970', 'quantidade': 1})
+    resposta = condicional(etag)
+    assert resposta.status_code == 200 and len(resposta.json()) == 3
+
+    etag = resposta.headers['etag']
+    cliente.put('/importacao/1', json={'categoria': 'VINHO', 'nome': 'Peru', 'ano': '1970'})
+    resposta = condicional(etag)
+    assert resposta.status_code == 200 and resposta.json()[0]['nome'] == 'Peru'
+
+    etag = resposta.headers['etag']
+    cliente.delete('/importacao/1')
+    assert condicional(etag).status_code == 200
+
+    # Uma escrita rejeitada não altera a versão
+    versao = versao_tabela('importacao')
+    assert cliente.delete('/importacao/99').status_code == 404
+    assert versao_tabela('importacao') == versao
+
+
+def test_carga_incrementa_versao(banco):
+    _, sessao_local, _ = banco
+    iniciador = Inicializacao('producao', 'produto', None, [], ';')
+    versao = versao_tabela('producao')
+
+    with sessao_local() as db:
+        iniciador.carregar(db, [])
+        assert versao_tabela('producao') == versao + 1
+
+        def falha():
+            raise RuntimeError('arquivo corrompido')
+            yield
+
+        with pytest.raises(RuntimeError):
+            iniciador.carregar(db, falha())
+        assert versao_tabela('producao') == versao + 2
+
+
+def test_cache_control_por_rota(banco, monkeypatch):
+    _, sessao_local, _ = banco
+    monkeypatch.setenv('CACHE_CONTROL_PRODUCAO', 'private, max-age=30')
+
+    def get_db():
+        with sessao_local() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get('/padrao', dependencies=[Depends(versionar('exportacao', get_db))])
+    def padrao():
+        return {}
+
+    @app.get('/tabela', dependencies=[Depends(versionar('producao', get_db))])
+    def tabela():
+        return {}
+
+    @app.get('/rota', dependencies=[Depends(versionar('producao', get_db, cache_control='public, max-age=300'))])
+    def rota():
+        return {}
+
+    cliente = TestClient(app)
+
+    assert cliente.get('/padrao').headers['cache-control'] == 'no-cache'
+    assert cliente.get('/tabela').headers['cache-control'] == 'private, max-age=30'
+    assert cliente.get('/rota').headers['cache-control'] == 'public, max-age=300'
+
+
+def test_304_com_compressao(banco):
+    _, sessao_local, consultas = banco
+    inserir(sessao_local, models.Producao, 200)
+    cliente = criar_cliente(producao, sessao_local)
+    cliente.app.add_middleware(CompressaoMiddleware, cache=CacheCompressao())
+
+    primeira = cliente.get('/producao', headers={'Accept-Encoding': 'gzip'})
+    consultas.clear()
+    segunda = cliente.get('/producao', headers={'Accept-Encoding': 'gzip', 'If-None-Match': primeira.headers['etag']})
+
+    assert primeira.headers['content-encoding'] == 'gzip'
+    assert primeira.headers['etag'].startswith('W/"producao-')
+    assert primeira.headers['vary'] == 'Accept, Accept-Encoding'
+    assert segunda.status_code == 304
+    assert consultas == []
+
+    incrementar(sessao_local, 'producao')
+    assert cliente.get('/producao', headers={'If-None-Match': primeira.headers['etag']}).status_code == 200
+
+
+def test_versao_alterada_por_outro_processo(banco, monkeypatch):
+    engine, sessao_local, _ = banco
+    inserir(sessao_local, models.Producao, 3)
+    incrementar(sessao_local, 'producao')
+    cliente = criar_cliente(producao, sessao_local)
+    etag = cliente.get('/producao').headers['etag']
+
+    # Outro processo (ex.: `python -m src.ingest`) grava a versão direto no banco
+    with engine.begin() as conexao:
+        conexao.execute(update(models.VersaoTabela).values(versao=models.VersaoTabela.versao + 1))
+
+    # Dentro do intervalo, a versão guardada na memória continua valendo
+    assert cliente.get('/producao', headers={'If-None-Match': etag}).status_code == 304
+
+    monkeypatch.setattr(versoes_tabelas, 'INTERVALO_VERSOES', 0)
+    resposta = cliente.get('/producao', headers={'If-None-Match': etag})
+
+    assert resposta.status_code == 200
+    assert resposta.headers['etag'] != etag
+    assert versao_tabela('producao') == 2
+
+
+def test_versao_persistida_e_descartada_no_rollback(banco):
+    _, sessao_local, _ = banco
+
+    assert incrementar(sessao_local, 'exportacao') == 1
+    assert incrementar(sessao_local, 'exportacao') == 2
+
+    with sessao_local() as db:
+        assert incrementar_versao('exportacao', db) == 3
+        db.rollback()
+
+    assert versao_tabela('exportacao') == 2
+    with sessao_local() as db:
+        assert db.get(models.VersaoTabela, 'exportacao').versao == 2
@@ -0,0 +1,193 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.dependencies import web_scraping
+from src.dependencies.cache_arquivos import CacheUrlsCsv
+from src.dependencies.web_scraping import criar_lista_json
+from src.dependencies.web_scraping import encontrar_urls_csv
+from src.dependencies.web_scraping import encontrar_urls_csv_concorrente
+
+
+CATEGORIAS = {
+    "02": None,
+    "03": ["01", "02", "03", "04"],
+    "04": None,
+    "05": ["01", "02", "03", "04", "05"],
+    "06": ["01", "02", "03", "04"]
+}
+
+
+class PaginaEmbrapaHandler(BaseHTTPRequestHandler):
+    """Simula as páginas da EMBRAPA com uma latência diferente para cada página."""
+
+    latencias = {}
+    versoes = {}
+    sem_links = set()
+    falhas = set()
+    requisicoes = []
+
+    def do_GET(self):
+        parametros = parse_qs(urlparse(self.path).query)
+        opcao = parametros['opcao'][0].replace('opt_', '')
+        subopcao = parametros.get('subopcao', ['subopt_00'])[0].replace('subopt_', '')
+
+        self.requisicoes.append((opcao, subopcao))
+        time.sleep(self.latencias.get((opcao, subopcao), 0))
+
+        versao = self.versoes.get((opcao, subopcao), '')
+        link = f'<a href="download/Tabela_{opcao}_{subopcao}{versao}.csv">DOWNLOAD</a>'
+        if (opcao, subopcao) in self.sem_links:
+            link = ''
+        corpo = (
+            '<html><body>'
+            '<table><tr><td>Produto</td><td>1.000</td></tr></table>'
+            '<a href="index.php">Inicio</a>'
+            f'{link}'
+            '</body></html>'
+        ).encode()
+
+        self.send_response(404 if (opcao, subopcao) in self.falhas else 200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorEmbrapa(ThreadingHTTPServer):
+    # Aceita as 15 conexões simultâneas sem SYNs descartados (a fila padrão é de 5)
+    request_queue_size = 64
+
+
+@pytest.fixture
+def servidor_embrapa():
+    servidor = ServidorEmbrapa(('127.0.0.1', 0), PaginaEmbrapaHandler)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{servidor.server_port}/index.php'
+    servidor.shutdown()
+    servidor.server_close()
+    PaginaEmbrapaHandler.latencias = {}
+    PaginaEmbrapaHandler.versoes = {}
+    PaginaEmbrapaHandler.sem_links = set()
+    PaginaEmbrapaHandler.falhas = set()
+    PaginaEmbrapaHandler.requisicoes = []
+
+
+def test_encontrar_urls_csv_concorrente_mesmo_formato(servidor_embrapa):
+    sequencial = encontrar_urls_csv(servidor_embrapa, CATEGORIAS)
+    concorrente = encontrar_urls_csv_concorrente(servidor_embrapa, CATEGORIAS)
+
+    assert concorrente == sequencial
+    assert list(concorrente) == list(CATEGORIAS)
+    assert concorrente['02'] == ['http://vitibrasil.cnpuv.embrapa.br/download/Tabela_02_00.csv']
+    assert list(concorrente['05']) == CATEGORIAS['05']
+    assert criar_lista_json(concorrente) == criar_lista_json(sequencial)
+
+
+def test_encontrar_urls_csv_concorrente_tempo_da_pagina_mais_lenta(servidor_embrapa):
+    # 15 páginas com latências entre 0.1s e 0.3s: soma de ~3s, página mais lenta de 0.3s
+    paginas = [(categoria, subcategoria or '00')
+               for categoria, subcategorias in CATEGORIAS.items()
+               for subcategoria in (subcategorias or [None])]
+    PaginaEmbrapaHandler.latencias = {
+        pagina: 0.1 + 0.2 * indice / (len(paginas) - 1) for indice, pagina in enumerate(paginas)
+    }
+    pagina_mais_lenta = max(PaginaEmbrapaHandler.latencias.values())
+    soma_latencias = sum(PaginaEmbrapaHandler.latencias.values())
+
+    inicio = time.perf_counter()
+    resultado = encontrar_urls_csv_concorrente(servidor_embrapa, CATEGORIAS, max_conexoes=len(paginas))
+    duracao = time.perf_counter() - inicio
+
+    assert len(resultado) == len(CATEGORIAS)
+    assert duracao < pagina_mais_lenta * 2
+    assert duracao < soma_latencias / 4
+
+
+def test_encontrar_urls_csv_concorrente_limita_conexoes(servidor_embrapa):
+    PaginaEmbrapaHandler.latencias = {
+        (categoria, subcategoria or '00'): 0.1
+        for categoria, subcategorias in CATEGORIAS.items()
+        for subcategoria in (subcategorias or [None])
+    }
+
+    inicio = time.perf_counter()
+    encontrar_urls_csv_concorrente(servidor_embrapa, CATEGORIAS, max_conexoes=5)
+    duracao = time.perf_counter() - inicio
+
+    # 15 páginas em lotes de no máximo 5 requisições simultâneas
+    assert duracao >= 0.3
+
+
+def test_extrair_urls_csv_apenas_links():
+    conteudo = (
+        '<html><head><script>var a = "<a href=\'falso.csv\'>";</script></head><body>'
+        '<table><tr><td><a href="download/Producao.csv">DOWNLOAD</a></td></tr></table>'
+        '<a href="http://outro.site/Arquivo.csv">Externo</a><a>Sem link</a><a href="index.php">Inicio</a>'
+        '</body></html>'
+    ).encode()
+
+    assert web_scraping.extrair_urls_csv(conteudo, 'http://site/') == [
+        'http://site/download/Producao.csv', 'http://outro.site/Arquivo.csv'
+    ]
+
+
+@pytest.mark.parametrize('concorrente', [False, True])
+def test_cache_urls_reaproveita_paginas_inalteradas(servidor_embrapa, tmp_path, concorrente):
+    def encontrar(cache):
+        if concorrente:
+            return encontrar_urls_csv_concorrente(servidor_embrapa, CATEGORIAS, cache=cache)
+        return encontrar_urls_csv(servidor_embrapa, CATEGORIAS, cache=cache)
+
+    caminho = tmp_path / 'urls_csv.json'
+    extrair = patch.object(web_scraping, 'extrair_urls_csv', wraps=web_scraping.extrair_urls_csv)
+
+    with extrair as extrair_urls_csv:
+        primeira = encontrar(CacheUrlsCsv(caminho))
+        assert extrair_urls_csv.call_count == 15
+        assert len(PaginaEmbrapaHandler.requisicoes) == 15
+
+        # Dentro da validade nenhuma página é buscada, mesmo em uma nova instância
+        assert encontrar(CacheUrlsCsv(caminho)) == primeira
+        assert len(PaginaEmbrapaHandler.requisicoes) == 15
+
+        # Expirado: as páginas são buscadas, mas só a que mudou é lida novamente
+        PaginaEmbrapaHandler.versoes[('05', '02')] = '_v2'
+        atualizada = encontrar(CacheUrlsCsv(caminho, validade=0))
+        assert len(PaginaEmbrapaHandler.requisicoes) == 30
+        assert extrair_urls_csv.call_count == 16
+
+    assert atualizada['05']['02'] == ['http://vitibrasil.cnpuv.embrapa.br/download/Tabela_05_02_v2.csv']
+    assert {**atualizada, '05': {**atualizada['05'], '02': primeira['05']['02']}} == primeira
+    assert atualizada == encontrar_urls_csv(servidor_embrapa, CATEGORIAS)
+
+
+@pytest.mark.parametrize('concorrente', [False, True])
+@pytest.mark.parametrize('problema', ['falhas', 'sem_links'])
+def test_cache_urls_nao_grava_paginas_incompletas(servidor_embrapa, tmp_path, concorrente, problema):
+    def encontrar(cache):
+        if concorrente:
+            return encontrar_urls_csv_concorrente(servidor_embrapa, CATEGORIAS, cache=cache)
+        return encontrar_urls_csv(servidor_embrapa, CATEGORIAS, cache=cache)
+
+    caminho = tmp_path / 'urls_csv.json'
+    getattr(PaginaEmbrapaHandler, problema).add(('05', '02'))
+
+    assert encontrar(CacheUrlsCsv(caminho))['05']['02'] == []
+    assert not caminho.exists()
+
+    # Na próxima carga todas as páginas são buscadas novamente
+    getattr(PaginaEmbrapaHandler, problema).clear()
+    urls = encontrar(CacheUrlsCsv(caminho))
+
+    assert len(PaginaEmbrapaHandler.requisicoes) == 30
+    assert urls['05']['02'] == ['http://vitibrasil.cnpuv.embrapa.br/download/Tabela_05_02.csv']
+    assert caminho.exists()